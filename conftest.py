@@ -1,6 +1,21 @@
 import pytest
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start every test with an empty cache so cached IDs never leak between tests."""
+    from django.core.cache import cache
+    from posts import local_cache, ratelimit
+
+    cache.clear()
+    local_cache.cache.clear()
+    ratelimit.local_buckets.clear()
+    yield
+    cache.clear()
+    local_cache.cache.clear()
+    ratelimit.local_buckets.clear()
+
+
 @pytest.fixture
 def user(db, django_user_model):
     """Create a test user using the django_user_model fixture.
@@ -51,3 +66,13 @@ def graphql_client():
     from socialfeed.schema import schema
 
     return Client(schema)
+
+
+@pytest.fixture
+def graphql_request(rf):
+    """An anonymous request to pass as context, so request-scoped loaders are shared."""
+    from django.contrib.auth.models import AnonymousUser
+
+    request = rf.post("/graphql/")
+    request.user = AnonymousUser()
+    return request
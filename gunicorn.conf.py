@@ -0,0 +1,17 @@
+"""
+Gunicorn settings loaded automatically from the working directory.
+
+Workers export Prometheus metrics to PROMETHEUS_MULTIPROC_DIR (see
+posts/metrics.py); a dead worker's live samples are dropped here.
+"""
+
+import os
+
+
+def child_exit(server, worker):
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        return
+
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,43 +1,94 @@
-from locust import HttpUser, task, between
+from locust import HttpUser, tag, task, between
+import os
 import random
 
+# Set to /graphql/async/ to load the async endpoint (serve it with SERVER_MODE=asgi)
+GRAPHQL_PATH = os.getenv("GRAPHQL_PATH", "/graphql/")
+
+# Anonymous users running only the read tasks (`--tags read`). Skips sign-up,
+# whose password hashing otherwise dominates CPU on small load-test hosts.
+READ_ONLY = os.getenv("LOCUST_READ_ONLY") == "1"
+
 
 class GraphQLUser(HttpUser):
     wait_time = between(1, 3)
 
     def on_start(self):
+        self.headers = {}
+        if READ_ONLY:
+            return
+
         username = f"loadtest_{random.randint(1000, 9999)}"
-        payload = {
-            "query": f"""
+        payload = {"query": f"""
             mutation {{
               register(username: "{username}", email: "{username}@test.com", password: "testpass123") {{
                 token
               }}
             }}
-            """
-        }
-        res = self.client.post("/graphql/", json=payload)
+            """}
+        res = self.client.post(GRAPHQL_PATH, json=payload)
         try:
             token = res.json()["data"]["register"]["token"]
-            self.headers = {"Authorization": f"Bearer {token}"}
+            self.headers = {"Authorization": f"JWT {token}"}
         except Exception:
             self.headers = {}
 
+        # Follow a few seeded users so the home feed has content
+        for uid in random.sample(range(1, 21), k=5):
+            self.client.post(
+                GRAPHQL_PATH,
+                headers=self.headers,
+                json={
+                    "query": f'mutation {{ followUser(userId: "{uid}") {{ following }} }}'
+                },
+                name="followUser",
+            )
+
+    @tag("read")
     @task(3)
     def view_posts(self):
         self.client.post(
-            "/graphql/",
+            GRAPHQL_PATH,
             json={"query": "query { posts(page:1, perPage:10) { id content } }"},
         )
 
+    @tag("read")
     @task(2)
     def view_post(self):
         pid = random.randint(1, 20)
         self.client.post(
-            "/graphql/",
+            GRAPHQL_PATH,
             json={"query": f'query {{ post(id: "{pid}") {{ id content }} }}'},
         )
 
+    @tag("read")
+    @task(2)
+    def view_dashboard(self):
+        # Independent top-level fields: resolved concurrently by the async view
+        pid = random.randint(1, 20)
+        uid = random.randint(1, 20)
+        self.client.post(
+            GRAPHQL_PATH,
+            json={"query": f"""
+                    query {{
+                        posts(page:1, perPage:10) {{ id content likesCount }}
+                        post(id: "{pid}") {{ id content }}
+                        user(id: "{uid}") {{ username }}
+                    }}
+                """},
+            name="dashboard",
+        )
+
+    @task(2)
+    def view_home_feed(self):
+        self.client.post(
+            GRAPHQL_PATH,
+            headers=self.headers,
+            json={
+                "query": "query { homeFeed(first:10) { edges { node { id content } } } }"
+            },
+        )
+
     @task(1)
     def create_post(self):
         # build content separately to avoid overly long single line
@@ -46,7 +97,7 @@ class GraphQLUser(HttpUser):
             'mutation { createPost(content: "' + content_text + '") { post { id } } }'
         )
         self.client.post(
-            "/graphql/",
+            GRAPHQL_PATH,
             headers=self.headers,
             json={"query": query},
         )
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class PostsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "posts"
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import tracing
+
+        connection_created.connect(tracing.install_sql_wrapper)
@@ -0,0 +1,72 @@
+"""
+Async access to the default Redis cache.
+
+Keys and payloads are built exactly as django-redis builds them, so entries
+are shared with the sync `cache` API; only the I/O is non-blocking. Clients
+(and their connection pools) are bound to an event loop, so one is kept per
+loop.
+"""
+
+import asyncio
+import weakref
+
+from django.conf import settings
+from django.core.cache import cache
+from redis import asyncio as aioredis
+
+_clients = weakref.WeakKeyDictionary()
+
+
+def client():
+    """The async Redis client for the running event loop"""
+    loop = asyncio.get_running_loop()
+    if loop not in _clients:
+        config = settings.CACHES["default"]
+        options = config.get("OPTIONS", {})
+        _clients[loop] = aioredis.from_url(
+            config["LOCATION"],
+            socket_timeout=options.get("SOCKET_TIMEOUT"),
+            socket_connect_timeout=options.get("SOCKET_CONNECT_TIMEOUT"),
+        )
+    return _clients[loop]
+
+
+def _decode(value):
+    return None if value is None else cache.client.decode(value)
+
+
+async def get(key):
+    return _decode(await client().get(cache.make_key(key)))
+
+
+async def get_many(keys):
+    """Fetch several keys with one MGET, as a {key: value} dict of the found ones"""
+    values = await client().mget([cache.make_key(key) for key in keys])
+    return {
+        key: _decode(value) for key, value in zip(keys, values) if value is not None
+    }
+
+
+async def set(key, value, timeout):
+    await client().set(cache.make_key(key), cache.client.encode(value), ex=timeout)
+
+
+async def set_many(values, timeout):
+    """SET several keys in one pipelined round-trip"""
+    async with client().pipeline(transaction=False) as pipe:
+        for key, value in values.items():
+            pipe.set(cache.make_key(key), cache.client.encode(value), ex=timeout)
+        await pipe.execute()
+
+
+async def add(key, value, timeout):
+    """SET NX: store value only if key is absent; returns whether it was stored"""
+    return bool(
+        await client().set(
+            cache.make_key(key), cache.client.encode(value), ex=timeout, nx=True
+        )
+    )
+
+
+async def delete(key):
+    await client().delete(cache.make_key(key))
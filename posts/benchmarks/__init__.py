@@ -0,0 +1,55 @@
+"""
+Benchmarks for the feed hot paths.
+
+Run one with `python manage.py benchmark <name>`. Each benchmark builds its
+own data inside a transaction that is rolled back afterwards, so it is safe to
+point at a development database.
+"""
+
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.db import transaction
+
+
+class _Rollback(Exception):
+    pass
+
+
+@contextmanager
+def scratch_data():
+    """Run a block inside a transaction that is always rolled back"""
+    try:
+        with transaction.atomic():
+            yield
+            raise _Rollback
+    except _Rollback:
+        pass
+
+
+def measure(func, iterations=50, warmup=3):
+    """Call `func` repeatedly and return latency percentiles in milliseconds"""
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+
+    samples.sort()
+    return {
+        "median_ms": statistics.median(samples),
+        "p95_ms": samples[int(len(samples) * 0.95) - 1],
+        "p99_ms": samples[int(len(samples) * 0.99) - 1],
+    }
+
+
+def format_row(label, stats):
+    """Render one result line"""
+    return (
+        f"{label:<40} median={stats['median_ms']:8.3f}ms "
+        f"p95={stats['p95_ms']:8.3f}ms p99={stats['p99_ms']:8.3f}ms"
+    )
@@ -0,0 +1,103 @@
+"""100 single mutations vs one bulk mutation of 100 items.
+
+Sizes are items per batch. Rate limits are bypassed (a single client may not
+send 100 likes a minute), and the Redis counter and ranking updates, which
+run on commit, are not part of the timings: the scratch transaction never
+commits.
+"""
+
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from posts import ratelimit
+from posts.models import Post
+from socialfeed.schema import schema
+
+from . import format_row, measure, scratch_data
+
+DEFAULT_SIZES = [100]
+
+LIKE = "mutation($id: ID!) { likePost(postId: $id) { liked } }"
+LIKE_POSTS = "mutation($ids: [ID!]!) { likePosts(postIds: $ids) { liked } }"
+CREATE = "mutation($content: String!) { createPost(content: $content) { post { id } } }"
+CREATE_POSTS = """
+    mutation($inputs: [PostInput!]!) { createPosts(inputs: $inputs) { posts { id } } }
+"""
+
+
+@contextmanager
+def _open_rate_limits():
+    consume = ratelimit.consume
+    ratelimit.consume = lambda *args, **kwargs: None
+    try:
+        yield
+    finally:
+        ratelimit.consume = consume
+
+
+def _execute(query, variables, user):
+    request = RequestFactory().post("/graphql/")
+    request.user = user
+    result = schema.execute(query, variables=variables, context_value=request)
+    if result.errors:
+        raise result.errors[0]
+
+
+def _report(command, label, func, iterations):
+    """Time `func` and count the statements of one call"""
+    stats = measure(func, iterations)
+    with CaptureQueriesContext(connection) as queries:
+        func()
+    command.stdout.write(f"{format_row(label, stats)} statements={len(queries)}")
+
+
+def run(command, sizes, iterations):
+    with scratch_data(), _open_rate_limits():
+        for size in sorted(sizes):
+            author = User.objects.create_user(username=f"bench_bulk_{size}")
+            post_ids = [
+                post.id
+                for post in Post.objects.bulk_create(
+                    [Post(author=author, content="bulk post") for _ in range(size)]
+                )
+            ]
+            # Every call likes as a new user, so no like is a no-op
+            likers = iter(
+                User.objects.bulk_create(
+                    [
+                        User(username=f"bench_bulk_{size}_{n}")
+                        for n in range(4 * (iterations + 4))
+                    ]
+                )
+            )
+            command.stdout.write(f"items={size}")
+
+            def single_likes():
+                liker = next(likers)
+                for post_id in post_ids:
+                    _execute(LIKE, {"id": post_id}, liker)
+
+            _report(command, f"  likePost x{size}", single_likes, iterations)
+            _report(
+                command,
+                f"  likePosts({size})",
+                lambda: _execute(LIKE_POSTS, {"ids": post_ids}, next(likers)),
+                iterations,
+            )
+
+            def single_creates():
+                for _ in range(size):
+                    _execute(CREATE, {"content": "hello"}, author)
+
+            inputs = [{"content": "hello"}] * size
+            _report(command, f"  createPost x{size}", single_creates, iterations)
+            _report(
+                command,
+                f"  createPosts({size})",
+                lambda: _execute(CREATE_POSTS, {"inputs": inputs}, author),
+                iterations,
+            )
@@ -0,0 +1,58 @@
+"""Pattern-delete vs generation-bump invalidation as the keyspace grows."""
+
+import time
+
+from django.core.cache import cache
+from django_redis import get_redis_connection
+
+from posts.cache_utils import CacheManager
+
+from . import format_row, measure
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+# Share of the keyspace that holds cached post lists
+LIST_KEY_RATIO = 0.05
+BENCH_PREFIX = "bench_invalidation"
+CHUNK_SIZE = 10_000
+
+
+def _fill(client, size):
+    """Write `size` keys, a few of them matching the posts_list pattern"""
+    list_every = int(1 / LIST_KEY_RATIO)
+    for start in range(0, size, CHUNK_SIZE):
+        pipe = client.pipeline(transaction=False)
+        for i in range(start, min(start + CHUNK_SIZE, size)):
+            kind = CacheManager.POSTS_LIST_PREFIX if i % list_every == 0 else "post"
+            pipe.set(cache.make_key(f"{BENCH_PREFIX}:{kind}:{i}"), b"x", ex=600)
+        pipe.execute()
+
+
+def _clear(client):
+    pipe = client.pipeline(transaction=False)
+    pattern = cache.make_key(f"{BENCH_PREFIX}:*")
+    for key in client.scan_iter(match=pattern, count=CHUNK_SIZE):
+        pipe.unlink(key)
+    pipe.execute()
+
+
+def run(command, sizes, iterations):
+    client = get_redis_connection("default")
+
+    for size in sizes:
+        _fill(client, size)
+        command.stdout.write(f"keys={size}")
+
+        # delete_pattern has to SCAN the whole keyspace, so run it once
+        start = time.perf_counter()
+        deleted = cache.delete_pattern(
+            f"{BENCH_PREFIX}:*{CacheManager.POSTS_LIST_PREFIX}*"
+        )
+        elapsed = (time.perf_counter() - start) * 1000
+        label = f"delete_pattern ({deleted} keys)"
+        command.stdout.write(f"  {label:<38} {elapsed:10.3f}ms")
+
+        stats = measure(CacheManager.invalidate_posts_lists, iterations)
+        command.stdout.write(format_row("  generation bump (feed)", stats))
+
+        _clear(client)
@@ -0,0 +1,174 @@
+"""Cached post payloads: pickle vs the compact encoding, with and without zstd.
+
+Sizes are numbers of cached posts in the working set. Each codec writes that
+many post entries (as CacheManager.set_post stores them) under a scratch key
+prefix, reports the Redis memory they take, and deletes them again.
+"""
+
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+from django_redis import get_redis_connection
+from django_redis.compressors.identity import IdentityCompressor
+from django_redis.serializers.pickle import PickleSerializer
+
+from posts.cache_serializer import CompactSerializer, ZstdCompressor
+from posts.cache_utils import CacheManager
+
+DEFAULT_SIZES = [1_000_000]
+
+BENCH_PREFIX = "bench_serializer"
+CHUNK_SIZE = 10_000
+SAMPLE_SIZE = 10_000
+
+# Feed pages are cached as lists of PER_PAGE fragments with COMMENTS each
+PER_PAGE = 10
+COMMENTS = 3
+
+WORDS = "the a feed post like share comment today new great photo launch".split()
+
+CODECS = {
+    "pickle": (PickleSerializer, IdentityCompressor, {}),
+    "pickle + zstd": (PickleSerializer, ZstdCompressor, {}),
+    "compact": (CompactSerializer, IdentityCompressor, {}),
+    "compact + zstd": (CompactSerializer, ZstdCompressor, {}),
+    "compact + zstd (all sizes)": (
+        CompactSerializer,
+        ZstdCompressor,
+        {"COMPRESS_MIN_LENGTH": 0},
+    ),
+}
+
+
+def _text(rng, low, high):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def _post(rng, post_id, now):
+    created = now - timedelta(seconds=rng.randint(0, 86400 * 30))
+    return {
+        "id": post_id,
+        "author_id": rng.randint(1, 100_000),
+        "author_username": f"user_{rng.randint(1, 100_000)}",
+        "author_date_joined": (
+            created - timedelta(days=rng.randint(1, 999))
+        ).isoformat(),
+        "content": _text(rng, 3, 50),
+        "image_url": None,
+        "likes_count": int(rng.paretovariate(1.2)),
+        "comments_count": int(rng.paretovariate(1.5)),
+        "shares_count": int(rng.paretovariate(2)),
+        "created_at": created.isoformat(),
+        "updated_at": created.isoformat(),
+    }
+
+
+def _comment(rng, comment_id, now):
+    return {
+        "id": comment_id,
+        "author_id": rng.randint(1, 100_000),
+        "author_username": f"user_{rng.randint(1, 100_000)}",
+        "content": _text(rng, 1, 20),
+        "created_at": now.isoformat(),
+    }
+
+
+def _entry(value, timeout):
+    return CacheManager._entry(value, timeout, 0.002)
+
+
+def _per_call_us(func, values):
+    """Median microseconds per call over batches of the sample"""
+    batches = []
+    for start in range(0, len(values), 1000):
+        end = start + 1000
+        batch = values[start:end]
+        began = time.perf_counter()
+        for value in batch:
+            func(value)
+        batches.append((time.perf_counter() - began) * 1e6 / len(batch))
+    return statistics.median(batches)
+
+
+def _used_memory(client):
+    return client.info("memory")["used_memory"]
+
+
+def _clear(client):
+    pattern = cache.make_key(f"{BENCH_PREFIX}:*")
+    pipe = client.pipeline(transaction=False)
+    for n, key in enumerate(client.scan_iter(match=pattern, count=CHUNK_SIZE), 1):
+        pipe.unlink(key)
+        if n % CHUNK_SIZE == 0:
+            pipe.execute()
+    pipe.execute()
+
+
+def _fill(client, encode, size, rng, now):
+    for start in range(0, size, CHUNK_SIZE):
+        pipe = client.pipeline(transaction=False)
+        for post_id in range(start, min(start + CHUNK_SIZE, size)):
+            value = encode(_entry(_post(rng, post_id, now), CacheManager.POST_TIMEOUT))
+            pipe.set(cache.make_key(f"{BENCH_PREFIX}:post:{post_id}"), value)
+        pipe.execute()
+
+
+def run(command, sizes, iterations):
+    client = get_redis_connection("default")
+    now = timezone.now()
+    rng = random.Random(42)
+    posts = [
+        _entry(_post(rng, n, now), CacheManager.POST_TIMEOUT)
+        for n in range(SAMPLE_SIZE)
+    ]
+    pages = [
+        _entry(
+            [
+                {
+                    "post": _post(rng, n, now),
+                    "comments": [_comment(rng, n, now) for n in range(COMMENTS)],
+                }
+                for n in range(PER_PAGE)
+            ],
+            CacheManager.LIST_TIMEOUT,
+        )
+        for _ in range(SAMPLE_SIZE // PER_PAGE)
+    ]
+
+    for label, (serializer_class, compressor_class, options) in CODECS.items():
+        serializer = serializer_class(options=options)
+        compressor = compressor_class(options=options)
+
+        def encode(value):
+            return compressor.compress(serializer.dumps(value))
+
+        def decode(value):
+            return serializer.loads(compressor.decompress(value))
+
+        encoded = [encode(post) for post in posts]
+        encoded_pages = [encode(page) for page in pages]
+        command.stdout.write(
+            f"{label:<28} post={statistics.mean(map(len, encoded)):6.0f}B "
+            f"encode={_per_call_us(encode, posts):5.1f}us "
+            f"decode={_per_call_us(decode, encoded):5.1f}us "
+            f"feed_page={statistics.mean(map(len, encoded_pages)):6.0f}B "
+            f"encode={_per_call_us(encode, pages):6.1f}us "
+            f"decode={_per_call_us(decode, encoded_pages):6.1f}us"
+        )
+
+        for size in sizes:
+            _clear(client)
+            before = _used_memory(client)
+            try:
+                _fill(client, encode, size, random.Random(size), now)
+                used = _used_memory(client) - before
+            finally:
+                _clear(client)
+            command.stdout.write(
+                f"  posts={size:,} redis_memory={used / 2**20:8.1f}MiB "
+                f"({used / size:.0f}B per post)"
+            )
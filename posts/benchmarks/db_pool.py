@@ -0,0 +1,87 @@
+"""Connection setup per request: a new connection, a persistent one, or a pool.
+
+Sizes are numbers of concurrent worker threads. Each simulated request does
+what Django's request_started/request_finished handlers do around one small
+query: close the thread's connection if it is obsolete, query, and close it
+again if obsolete. "server connections" counts the distinct Postgres backends
+that served the requests.
+"""
+
+import statistics
+import threading
+import time
+
+from django.db import connections
+
+from . import format_row
+
+DEFAULT_SIZES = [1, 8]
+
+MODES = {
+    "new connection per request (before)": {"CONN_MAX_AGE": 0},
+    "persistent, CONN_MAX_AGE=600": {"CONN_MAX_AGE": 600},
+    "psycopg pool": {"CONN_MAX_AGE": 0, "pool": True},
+}
+
+
+def _settings(mode, threads):
+    database = dict(connections["default"].settings_dict)
+    options = {
+        key: value for key, value in database["OPTIONS"].items() if key != "pool"
+    }
+    if mode.get("pool"):
+        options["pool"] = {"min_size": 1, "max_size": threads}
+    database.update(CONN_MAX_AGE=mode["CONN_MAX_AGE"], OPTIONS=options)
+    return database
+
+
+def _request(connection, backends):
+    started = time.perf_counter()
+    connection.close_if_unusable_or_obsolete()
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_backend_pid()")
+        backends.add(cursor.fetchone()[0])
+    connection.close_if_unusable_or_obsolete()
+    return (time.perf_counter() - started) * 1000
+
+
+def _stats(samples):
+    samples.sort()
+    return {
+        "median_ms": statistics.median(samples),
+        "p95_ms": samples[int(len(samples) * 0.95) - 1],
+        "p99_ms": samples[int(len(samples) * 0.99) - 1],
+    }
+
+
+def run(command, sizes, iterations):
+    for threads in sizes:
+        command.stdout.write(f"threads={threads}")
+        for label, mode in MODES.items():
+            alias = f"bench_db_pool_{threads}"
+            connections.settings[alias] = _settings(mode, threads)
+            samples = []
+            backends = set()
+            lock = threading.Lock()
+
+            def worker():
+                connection = connections[alias]
+                timings = [_request(connection, backends) for _ in range(iterations)]
+                connection.close()
+                del connections[alias]
+                with lock:
+                    samples.extend(timings)
+
+            workers = [threading.Thread(target=worker) for _ in range(threads)]
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+            connections[alias].close_pool()
+            del connections[alias]
+            del connections.settings[alias]
+
+            command.stdout.write(
+                f"{format_row(f'  {label}', _stats(samples))} "
+                f"server_connections={len(backends)}"
+            )
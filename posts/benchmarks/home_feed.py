@@ -0,0 +1,73 @@
+"""Home feed read latency as the number of followed accounts grows."""
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import override_settings
+
+from posts.cache_utils import CacheManager
+from posts.models import Post, TimelineEntry
+from posts.timeline import home_feed_page
+from users.models import Follow, FollowStats
+
+from . import format_row, measure, scratch_data
+
+# Number of accounts the reader follows
+DEFAULT_SIZES = [10, 100, 1000, 5000]
+
+POSTS_PER_AUTHOR = 5
+PAGE_SIZE = 20
+BATCH_SIZE = 5000
+
+
+def _build_reader(size):
+    """Create a reader following `size` authors, with pushed timeline entries"""
+    reader = User.objects.create(username=f"bench_reader_{size}")
+    authors = User.objects.bulk_create(
+        [User(username=f"bench_author_{size}_{i}") for i in range(size)]
+    )
+    Follow.objects.bulk_create(
+        [Follow(follower=reader, followee=author) for author in authors],
+        batch_size=BATCH_SIZE,
+    )
+    FollowStats.objects.bulk_create(
+        [FollowStats(user=author, followers_count=1) for author in authors],
+        batch_size=BATCH_SIZE,
+    )
+    posts = Post.objects.bulk_create(
+        [
+            Post(author=author, content="benchmark post")
+            for author in authors
+            for _ in range(POSTS_PER_AUTHOR)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(owner=reader, post=post, created_at=post.created_at)
+            for post in posts
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    with connection.cursor() as cursor:
+        for model in (Post, TimelineEntry, Follow, FollowStats):
+            cursor.execute(f"ANALYZE {model._meta.db_table}")
+    return reader
+
+
+def run(command, sizes, iterations):
+    with scratch_data():
+        for size in sizes:
+            reader = _build_reader(size)
+            command.stdout.write(f"following={size}")
+
+            CacheManager.invalidate_pull_authors(reader.id)
+            stats = measure(lambda: home_feed_page(reader, PAGE_SIZE), iterations)
+            command.stdout.write(format_row("  fan-out on write", stats))
+
+            # Every followed author over the threshold: all posts pulled on read
+            with override_settings(TIMELINE_FANOUT_THRESHOLD=0):
+                CacheManager.invalidate_pull_authors(reader.id)
+                stats = measure(lambda: home_feed_page(reader, PAGE_SIZE), iterations)
+                command.stdout.write(format_row("  fan-out on read", stats))
+
+            CacheManager.invalidate_pull_authors(reader.id)
@@ -0,0 +1,101 @@
+"""
+Concurrent likes on one hot post: row-lock UPDATE vs write-behind counters.
+
+Unlike the other benchmarks this one commits its rows, since every worker
+thread needs its own connection; it deletes them again when done.
+"""
+
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import F
+
+from posts import counters
+from posts.models import Interaction, Post
+
+# Number of likes fired at the post
+DEFAULT_SIZES = [500]
+
+WORKERS = 50
+
+
+def _row_lock_like(post_id, user_id):
+    """The original LikePost path: UPDATE the post row inside the transaction"""
+    with transaction.atomic():
+        Interaction.objects.get_or_create(
+            post_id=post_id, user_id=user_id, interaction_type="like"
+        )
+        Post.objects.filter(pk=post_id).update(likes_count=F("likes_count") + 1)
+
+
+def _write_behind_like(post_id, user_id):
+    with transaction.atomic():
+        Interaction.objects.get_or_create(
+            post_id=post_id, user_id=user_id, interaction_type="like"
+        )
+        counters.increment(post_id, "likes_count")
+
+
+def _storm(like, post_id, user_ids):
+    """Fire one like per user from WORKERS threads at once; returns latencies"""
+    chunks = [user_ids[i::WORKERS] for i in range(WORKERS)]
+    start_line = threading.Barrier(len(chunks))
+
+    def worker(chunk):
+        latencies = []
+        start_line.wait()
+        try:
+            for user_id in chunk:
+                start = time.perf_counter()
+                like(post_id, user_id)
+                latencies.append((time.perf_counter() - start) * 1000)
+        finally:
+            connection.close()
+        return latencies
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(chunks)) as pool:
+        latencies = [ms for result in pool.map(worker, chunks) for ms in result]
+    return latencies, time.perf_counter() - started
+
+
+def _report(command, label, latencies, elapsed):
+    latencies.sort()
+    command.stdout.write(
+        f"  {label:<14} total={elapsed * 1000:9.1f}ms "
+        f"throughput={len(latencies) / elapsed:8.1f}/s "
+        f"median={statistics.median(latencies):8.3f}ms "
+        f"p95={latencies[int(len(latencies) * 0.95) - 1]:8.3f}ms"
+    )
+
+
+def run(command, sizes, iterations):
+    for size in sizes:
+        users = User.objects.bulk_create(
+            [User(username=f"bench_like_{size}_{i}") for i in range(size)]
+        )
+        user_ids = [user.id for user in users]
+        post = Post.objects.create(author=users[0], content="viral post")
+        command.stdout.write(f"likes={size}, workers={WORKERS}")
+
+        try:
+            _report(command, "row lock", *_storm(_row_lock_like, post.id, user_ids))
+            Interaction.objects.filter(post=post).delete()
+            Post.objects.filter(pk=post.pk).update(likes_count=0)
+
+            _report(
+                command, "write-behind", *_storm(_write_behind_like, post.id, user_ids)
+            )
+            start = time.perf_counter()
+            counters.flush()
+            elapsed = (time.perf_counter() - start) * 1000
+            post.refresh_from_db()
+            command.stdout.write(
+                f"  {'flush':<14} total={elapsed:9.1f}ms likes_count={post.likes_count}"
+            )
+        finally:
+            User.objects.filter(id__in=user_ids).delete()
@@ -0,0 +1,80 @@
+"""`post(id)` over a set of hot posts: Redis only vs the local cache in front.
+
+Sizes are numbers of hot posts, requested round-robin. Hit ratios come from a
+trace around the timed requests: "l1" lookups are answered by the worker's
+local cache, "l2" lookups by Redis.
+"""
+
+from itertools import cycle
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.test.client import RequestFactory
+
+from posts import local_cache, tracing
+from posts.cache_utils import CacheManager
+from posts.models import Post
+from socialfeed.schema import schema
+
+from . import format_row, measure, scratch_data
+
+DEFAULT_SIZES = [100, 1000]
+
+QUERY = (
+    "query($id: ID!) { post(id: $id) { id content likesCount author { username } } }"
+)
+
+
+def _execute(post_id):
+    request = RequestFactory().post("/graphql/")
+    request.user = AnonymousUser()
+    result = schema.execute(QUERY, variables={"id": post_id}, context_value=request)
+    if result.errors:
+        raise result.errors[0]
+
+
+def _ratio(stats):
+    hits, misses = stats
+    return hits / (hits + misses) if hits + misses else 0.0
+
+
+def run(command, sizes, iterations):
+    max_bytes = local_cache.cache.max_bytes
+    post_ids = []
+    try:
+        with scratch_data():
+            author = User.objects.create_user(username="bench_local_cache")
+            for size in sorted(sizes):
+                posts = Post.objects.bulk_create(
+                    [Post(author=author, content="hot post") for _ in range(size)]
+                )
+                post_ids = [post.id for post in posts]
+                command.stdout.write(f"hot_posts={size}")
+
+                for label, l1_bytes in (
+                    ("redis only", 0),
+                    ("local + redis", max_bytes),
+                ):
+                    local_cache.cache.max_bytes = l1_bytes
+                    local_cache.cache.clear()
+                    for post_id in post_ids:
+                        _execute(post_id)
+
+                    ids = cycle(post_ids)
+                    with tracing.trace() as trace:
+                        stats = measure(lambda: _execute(next(ids)), iterations)
+                    l1 = trace.cache.get(f"{tracing.LOCAL_CACHE_PREFIX}:post", (0, 0))
+                    l2 = trace.cache.get(CacheManager.POST_PREFIX, (0, 0))
+                    command.stdout.write(
+                        f"{format_row(f'  {label}', stats)} "
+                        f"l1_hit_ratio={_ratio(l1):.2f} l2_hit_ratio={_ratio(l2):.2f}"
+                    )
+                    stats = measure(
+                        lambda: CacheManager.get_post(next(ids)), iterations
+                    )
+                    command.stdout.write(format_row(f"  {label}, get_post", stats))
+
+                for post_id in post_ids:
+                    CacheManager.invalidate_post(post_id)
+    finally:
+        local_cache.cache.max_bytes = max_bytes
+        local_cache.cache.clear()
@@ -0,0 +1,57 @@
+"""OFFSET paging vs keyset cursors for a deep feed page."""
+
+from django.contrib.auth.models import User
+from django.db import connection
+
+from posts.models import Post
+from posts.pagination import encode_cursor, keyset_page
+
+from . import format_row, measure, scratch_data
+
+DEFAULT_SIZES = [20_000, 100_000, 500_000]
+
+PAGE = 1000
+PER_PAGE = 10
+BATCH_SIZE = 5000
+
+
+def _grow_table(author, target):
+    """Bulk insert posts until the table holds `target` rows"""
+    missing = target - Post.objects.count()
+    while missing > 0:
+        batch = min(BATCH_SIZE, missing)
+        Post.objects.bulk_create(
+            [Post(author=author, content="benchmark post") for _ in range(batch)]
+        )
+        missing -= batch
+
+    # Autovacuum cannot see uncommitted rows, so refresh planner stats by hand
+    with connection.cursor() as cursor:
+        cursor.execute(f"ANALYZE {Post._meta.db_table}")
+
+
+def run(command, sizes, iterations):
+    with scratch_data():
+        author = User.objects.create_user(username="bench_pagination")
+        offset = (PAGE - 1) * PER_PAGE
+
+        for size in sorted(sizes):
+            if size < offset + PER_PAGE:
+                command.stdout.write(f"rows={size}: too small to reach page {PAGE}")
+                continue
+            _grow_table(author, size)
+
+            # The cursor a client would hold after scrolling to page PAGE - 1
+            anchor = Post.objects.order_by("-created_at", "-id")[offset - 1]
+            cursor = encode_cursor(anchor)
+            qs = Post.objects.select_related("author")
+
+            end = offset + PER_PAGE
+            offset_stats = measure(lambda: list(qs[offset:end]), iterations)
+            keyset_stats = measure(
+                lambda: keyset_page(qs, PER_PAGE, cursor), iterations
+            )
+
+            command.stdout.write(f"rows={size}, page={PAGE}, per_page={PER_PAGE}")
+            command.stdout.write(format_row("  offset", offset_stats))
+            command.stdout.write(format_row("  keyset", keyset_stats))
@@ -0,0 +1,67 @@
+"""Per-request parse + validate cost vs a document-cache hit, by document size.
+
+The request rows also resolve the posts; the difference between them is the
+saving per request.
+"""
+
+from django.test import Client
+from graphql import parse, validate
+
+from posts import persisted_queries
+from socialfeed.schema import schema
+
+from . import format_row, measure
+
+DEFAULT_SIZES = [1, 10, 50]
+
+# One aliased copy of this selection per size unit
+SELECTION = """
+    posts{n}: posts(page: 1, perPage: 10) {{
+        id
+        content
+        likesCount
+        author {{ username }}
+        comments {{ content author {{ username }} }}
+    }}
+"""
+
+
+def _document(size):
+    return "query {" + "".join(SELECTION.format(n=n) for n in range(size)) + "}"
+
+
+def run(command, sizes, iterations):
+    graphql_schema = schema.graphql_schema
+    client = Client()
+
+    for size in sorted(sizes):
+        query = _document(size)
+        sha256 = persisted_queries.query_hash(query)
+        command.stdout.write(f"root fields={size} bytes={len(query)}")
+
+        stats = measure(lambda: validate(graphql_schema, parse(query)), iterations)
+        command.stdout.write(format_row("  parse + validate", stats))
+
+        documents = persisted_queries.DocumentCache(maxsize=1000)
+        documents.set(sha256, parse(query))
+        stats = measure(
+            lambda: documents.get(persisted_queries.query_hash(query)), iterations
+        )
+        command.stdout.write(format_row("  hash + document cache hit", stats))
+
+        def request():
+            client.post(
+                "/graphql/",
+                {"query": query},
+                content_type="application/json",
+            )
+
+        def cold_request():
+            persisted_queries.documents.clear()
+            request()
+
+        stats = measure(cold_request, iterations)
+        command.stdout.write(format_row("  request, cold document", stats))
+
+        stats = measure(request, iterations)
+        command.stdout.write(format_row("  request, cached document", stats))
@@ -0,0 +1,71 @@
+"""Cache-hit path of `post(id)`: reloading from Postgres vs hydrating the payload."""
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.db import connection
+from django.db.models import Prefetch
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from posts.cache_utils import CacheManager, cache_post_data, hydrate_post
+from posts.models import Comment, Post
+from socialfeed.schema import schema
+
+from . import format_row, measure, scratch_data
+
+# Number of comments on the benchmark post
+DEFAULT_SIZES = [0, 10, 100]
+
+QUERY = "query($id: ID!) { post(id: $id) { id content likesCount author { username } } }"
+
+
+def _reload_from_db(post_id):
+    """What the hit path used to do: ignore the payload and query again"""
+    CacheManager.get_post(post_id)
+    return (
+        Post.objects.select_related("author")
+        .prefetch_related(
+            Prefetch("comments", queryset=Comment.objects.select_related("author"))
+        )
+        .get(pk=post_id)
+    )
+
+
+def _hydrate(post_id):
+    return hydrate_post(CacheManager.get_post(post_id))
+
+
+def _execute(post_id):
+    request = RequestFactory().post("/graphql/")
+    request.user = AnonymousUser()
+    return schema.execute(QUERY, variables={"id": post_id}, context_value=request)
+
+
+def _count_queries(func):
+    with CaptureQueriesContext(connection) as queries:
+        func()
+    return len(queries)
+
+
+def run(command, sizes, iterations):
+    with scratch_data():
+        author = User.objects.create_user(username="bench_post_cache")
+
+        for size in sizes:
+            post = Post.objects.create(author=author, content="benchmark post")
+            Comment.objects.bulk_create(
+                [Comment(post=post, author=author, content="c") for _ in range(size)]
+            )
+            post = Post.objects.select_related("author").get(pk=post.pk)
+            CacheManager.set_post(post.id, cache_post_data(post))
+
+            command.stdout.write(f"comments={size}")
+            for label, func in (
+                ("reload from db (before)", _reload_from_db),
+                ("hydrate payload (after)", _hydrate),
+                ("graphql post(id) (after)", _execute),
+            ):
+                stats = measure(lambda: func(post.id), iterations)
+                queries = _count_queries(lambda: func(post.id))
+                command.stdout.write(format_row(f"  {label}", stats) + f" queries={queries}")
+
+            CacheManager.invalidate_post(post.id)
@@ -0,0 +1,86 @@
+"""Assembling a feed page of cached posts: a GET per post vs one MGET.
+
+Sizes are page sizes. The local cache is turned off so every lookup goes to
+Redis. "postgres" is how a page of cached IDs used to be turned into posts;
+"assemble" is the same page built from cached post entries.
+"""
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.test.client import RequestFactory
+
+from posts import local_cache, tracing
+from posts.cache_utils import CacheManager, cache_post_data
+from posts.models import Post
+from posts.queries import _cached_posts, _posts_in_order
+from socialfeed.schema import schema
+
+from . import format_row, measure, scratch_data
+
+DEFAULT_SIZES = [10, 50, 100]
+
+QUERY = "query($perPage: Int!) { posts(page: 2, perPage: $perPage) { id content } }"
+
+
+def _get_each(post_ids):
+    return [CacheManager.get_post(post_id) for post_id in post_ids]
+
+
+def _from_postgres(post_ids):
+    return list(_posts_in_order(post_ids))
+
+
+def _execute(per_page):
+    request = RequestFactory().post("/graphql/")
+    request.user = AnonymousUser()
+    result = schema.execute(
+        QUERY, variables={"perPage": per_page}, context_value=request
+    )
+    if result.errors:
+        raise result.errors[0]
+
+
+def _round_trips(func):
+    with tracing.trace() as trace:
+        func()
+    return sum(trace.round_trips.values()), trace.sql_count
+
+
+def run(command, sizes, iterations):
+    max_bytes = local_cache.cache.max_bytes
+    local_cache.cache.max_bytes = 0
+    local_cache.cache.clear()
+    try:
+        with scratch_data():
+            author = User.objects.create_user(username="bench_posts_many")
+            for size in sizes:
+                # Enough posts for the second page of the GraphQL query
+                posts = Post.objects.bulk_create(
+                    [Post(author=author, content="feed post") for _ in range(2 * size)]
+                )
+                post_ids = [post.id for post in posts[:size]]
+                rows = Post.objects.select_related("author").filter(id__in=post_ids)
+                CacheManager.set_posts_many(cache_post_data(post) for post in rows)
+
+                command.stdout.write(f"page_size={size}")
+                for label, func in (
+                    ("get_post per post (before)", lambda: _get_each(post_ids)),
+                    (
+                        "get_posts_many (after)",
+                        lambda: CacheManager.get_posts_many(post_ids),
+                    ),
+                    ("page from postgres (before)", lambda: _from_postgres(post_ids)),
+                    ("page assembled (after)", lambda: _cached_posts(post_ids)),
+                    ("graphql posts(page: 2)", lambda: _execute(size)),
+                ):
+                    stats = measure(func, iterations)
+                    round_trips, queries = _round_trips(func)
+                    command.stdout.write(
+                        f"{format_row(f'  {label}', stats)} "
+                        f"round_trips={round_trips} queries={queries}"
+                    )
+
+                CacheManager.invalidate_many(post.id for post in posts)
+                CacheManager.invalidate_posts_lists()
+    finally:
+        local_cache.cache.max_bytes = max_bytes
+        local_cache.cache.clear()
@@ -0,0 +1,122 @@
+"""Ranked feed pages: ORDER BY a score expression vs the Redis rankings.
+
+Rankings are built under a scratch key prefix, so live rankings are untouched.
+"""
+
+import random
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import F, FloatField
+from django.db.models.functions import Extract, Greatest, Log
+from django.utils import timezone
+
+from posts import ranking
+from posts.models import Post
+
+from . import format_row, measure, scratch_data
+
+DEFAULT_SIZES = [10_000, 100_000]
+
+PER_PAGE = 10
+BATCH_SIZE = 5000
+
+# Posts are spread over this many hours before now
+SPREAD_HOURS = 72
+
+
+def _grow_table(author, target, rng):
+    """Bulk insert posts with random engagement until the table holds `target` rows"""
+    now = timezone.now()
+    missing = target - Post.objects.count()
+    while missing > 0:
+        batch = min(BATCH_SIZE, missing)
+        Post.objects.bulk_create(
+            [
+                Post(
+                    author=author,
+                    content="benchmark post",
+                    likes_count=int(rng.paretovariate(1.2)),
+                    comments_count=int(rng.paretovariate(1.5)),
+                    shares_count=int(rng.paretovariate(2)),
+                )
+                for _ in range(batch)
+            ]
+        )
+        missing -= batch
+
+    # created_at is auto_now_add, so spread it afterwards
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {Post._meta.db_table} SET created_at = %s - random() * %s",
+            [now, timedelta(hours=SPREAD_HOURS)],
+        )
+        cursor.execute(f"ANALYZE {Post._meta.db_table}")
+
+
+def _engagement():
+    return sum(F(field) * weight for field, weight in ranking.WEIGHTS.items())
+
+
+def _sql_hot():
+    age = (Extract("created_at", "epoch") - ranking.HOT_EPOCH) / ranking.HOT_GRAVITY
+    score = Log(10, Greatest(_engagement(), 1, output_field=FloatField())) + age
+    return list(
+        Post.objects.annotate(score=score)
+        .order_by("-score")
+        .values_list("id", flat=True)[:PER_PAGE]
+    )
+
+
+def _sql_top_24h():
+    since = timezone.now() - timedelta(hours=ranking.TOP_WINDOW_HOURS)
+    return list(
+        Post.objects.filter(created_at__gte=since)
+        .annotate(score=_engagement())
+        .order_by("-score")
+        .values_list("id", flat=True)[:PER_PAGE]
+    )
+
+
+def run(command, sizes, iterations):
+    rng = random.Random(42)
+    prefix = ranking.PREFIX
+    ranking.PREFIX = f"bench-{uuid.uuid4().hex[:8]}"
+    try:
+        with scratch_data():
+            author = User.objects.create_user(username="bench_ranking")
+            for size in sorted(sizes):
+                _grow_table(author, size, rng)
+                ranking.rebuild(
+                    Post.objects.values_list(
+                        "id",
+                        "created_at",
+                        "likes_count",
+                        "comments_count",
+                        "shares_count",
+                    ).iterator(),
+                    [],
+                )
+
+                rows = Post.objects.count()
+                command.stdout.write(f"rows={rows}, per_page={PER_PAGE}")
+                stats = measure(_sql_hot, iterations)
+                command.stdout.write(format_row("  HOT, ORDER BY score", stats))
+                stats = measure(
+                    lambda: ranking.page_ids(ranking.HOT, 1, PER_PAGE), iterations
+                )
+                command.stdout.write(format_row("  HOT, sorted set", stats))
+                stats = measure(_sql_top_24h, iterations)
+                command.stdout.write(format_row("  TOP_24H, ORDER BY score", stats))
+                stats = measure(
+                    lambda: ranking.page_ids(ranking.TOP_24H, 1, PER_PAGE), iterations
+                )
+                command.stdout.write(format_row("  TOP_24H, sorted sets", stats))
+    finally:
+        client = ranking._client()
+        stale = list(client.scan_iter(match=f"*{ranking.PREFIX}:*", count=1000))
+        if stale:
+            client.delete(*stale)
+        ranking.PREFIX = prefix
@@ -0,0 +1,100 @@
+"""Per-call rate-limit overhead: django_ratelimit vs the token bucket.
+
+Sizes are the number of distinct clients the calls rotate through.
+"""
+
+import itertools
+import uuid
+from contextlib import contextmanager
+
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory
+from django_ratelimit.decorators import ratelimit as django_ratelimit
+from graphql import GraphQLError
+from redis import Redis
+
+from posts import ratelimit
+
+from . import format_row, measure
+
+DEFAULT_SIZES = [1, 1000]
+
+OPEN_RATE = "1000000/m"
+
+
+def _requests(size):
+    factory = RequestFactory()
+    requests = []
+    for n in range(size):
+        request = factory.post("/graphql/", REMOTE_ADDR=f"10.0.{n // 256}.{n % 256}")
+        request.user = AnonymousUser()
+        requests.append(request)
+    return itertools.cycle(requests)
+
+
+def _previous_decorator(request, group):
+    """What posts.decorators.rate_limit did before the token bucket"""
+    limiter = django_ratelimit(group=group, key="user_or_ip", rate=OPEN_RATE)
+    limiter(lambda r: True)(request)
+    return getattr(request, "limited", False)
+
+
+@contextmanager
+def _round_trips():
+    """Count commands sent by redis clients (a script is one)"""
+    sent = [0]
+    execute_command = Redis.execute_command
+
+    def counting(self, *args, **options):
+        sent[0] += 1
+        return execute_command(self, *args, **options)
+
+    Redis.execute_command = counting
+    try:
+        yield sent
+    finally:
+        Redis.execute_command = execute_command
+
+
+def _report(command, label, func, iterations):
+    with _round_trips() as sent:
+        stats = measure(func, iterations, warmup=0)
+    per_call = sent[0] / iterations
+    command.stdout.write(f"{format_row(label, stats)} round_trips={per_call:.1f}")
+
+
+def run(command, sizes, iterations):
+    for size in sorted(sizes):
+        command.stdout.write(f"clients={size}")
+        # Fresh buckets each run; they expire once refilled
+        group = f"bench-{uuid.uuid4().hex[:8]}"
+
+        requests = _requests(size)
+        _report(
+            command,
+            "  django_ratelimit, allowed",
+            lambda: _previous_decorator(next(requests), group),
+            iterations,
+        )
+        _report(
+            command,
+            "  token bucket, allowed",
+            lambda: ratelimit.consume(next(requests), group, OPEN_RATE),
+            iterations,
+        )
+
+        # Empty every bucket once; later calls are shed in-process
+        for _ in range(size):
+            try:
+                ratelimit.consume(next(requests), f"{group}-shed", "1/m")
+                ratelimit.consume(next(requests), f"{group}-shed", "1/m")
+            except GraphQLError:
+                pass
+
+        def shed():
+            try:
+                ratelimit.consume(next(requests), f"{group}-shed", "1/m")
+            except GraphQLError:
+                pass
+
+        _report(command, "  token bucket, shed locally", shed, iterations)
@@ -0,0 +1,75 @@
+"""Post search: `content__icontains` scan vs the search_vector GIN index."""
+
+import random
+
+from django.contrib.auth.models import User
+from django.db import connection
+
+from posts.models import Post
+from posts.search import FULL_TEXT, TYPEAHEAD, search_posts
+
+from . import format_row, measure, scratch_data
+
+DEFAULT_SIZES = [100_000, 1_000_000]
+
+BATCH_SIZE = 10_000
+PER_PAGE = 10
+WORDS_PER_POST = 30
+
+SYLLABLES = "ka lo mi ne ru sa ti vo ze ba".split()
+
+# ~1000 made-up words drawn with Zipf weights, like real post vocabulary
+VOCABULARY = [a + b + c for a in SYLLABLES for b in SYLLABLES for c in SYLLABLES]
+WEIGHTS = [1 / rank for rank in range(1, len(VOCABULARY) + 1)]
+
+TERMS = [
+    (VOCABULARY[2], FULL_TEXT),  # in roughly a third of posts
+    (VOCABULARY[200], FULL_TEXT),  # in a few hundred per 100k posts
+    ("zeppelin", FULL_TEXT),  # in a single post
+    ("nosuchword", FULL_TEXT),
+    (VOCABULARY[200][:4], TYPEAHEAD),
+]
+
+
+def _grow_table(author, target, rng):
+    missing = target - Post.objects.count()
+    while missing > 0:
+        batch = min(BATCH_SIZE, missing)
+        Post.objects.bulk_create(
+            [
+                Post(
+                    author=author,
+                    content=" ".join(
+                        rng.choices(VOCABULARY, weights=WEIGHTS, k=WORDS_PER_POST)
+                    ),
+                )
+                for _ in range(batch)
+            ]
+        )
+        missing -= batch
+
+    # A handful of posts mention the rare word
+    Post.objects.create(author=author, content="a zeppelin over the stadium")
+    with connection.cursor() as cursor:
+        cursor.execute(f"ANALYZE {Post._meta.db_table}")
+
+
+def run(command, sizes, iterations):
+    rng = random.Random(42)
+    with scratch_data():
+        author = User.objects.create_user(username="bench_search")
+        qs = Post.objects.select_related("author")
+
+        for size in sorted(sizes):
+            _grow_table(author, size, rng)
+            command.stdout.write(f"rows={size}")
+
+            for term, mode in TERMS:
+                scan = qs.filter(content__icontains=term).order_by("-created_at")
+                stats = measure(lambda: list(scan[:PER_PAGE]), iterations)
+                label = f"  icontains '{term}'"
+                command.stdout.write(format_row(label, stats))
+
+                indexed = search_posts(qs, term, mode)
+                stats = measure(lambda: list(indexed[:PER_PAGE]), iterations)
+                command.stdout.write(format_row(f"  {mode} '{term}'", stats))
@@ -0,0 +1,75 @@
+"""SecurityValidator content checks: per-pattern passes vs the compiled validator.
+
+Sizes are content lengths in characters (posts are limited to 5000).
+"""
+
+import random
+import re
+
+from django.utils.html import escape
+
+from posts.security import SecurityValidator
+
+from . import format_row, measure
+
+DEFAULT_SIZES = [80, 280, 1000, 5000]
+
+BATCH = 1000
+
+WORDS = (
+    "the a to and of in is it you that for on was with this my at be have "
+    "just so we are but not all get like today new one time love great day "
+    "post feed photo friends weekend coffee game music city team"
+).split()
+
+PREVIOUS_PATTERNS = [
+    r"(\bUNION\b.*\bSELECT\b)",
+    r"(\bDROP\b.*\bTABLE\b)",
+    r"(\bINSERT\b.*\bINTO\b)",
+    r"(--\s)",
+    r"(;\s*DROP)",
+]
+
+
+def _previous(content):
+    """validate_content() before it was compiled"""
+    content = " ".join(content.split())
+    for pattern in PREVIOUS_PATTERNS:
+        if re.search(pattern, content, re.IGNORECASE):
+            raise ValueError
+    return escape(content)
+
+
+def _text(rng, size, punctuated):
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        if punctuated and rng.random() < 0.1:
+            word = rng.choice(("it's", "<b>" + word + "</b>", word + "!", "café"))
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)[:size].strip()
+
+
+def run(command, sizes, iterations):
+    rng = random.Random(42)
+    for size in sorted(sizes):
+        for punctuated in (False, True):
+            kind = "html/unicode" if punctuated else "plain ascii"
+            texts = [_text(rng, size, punctuated) for _ in range(BATCH)]
+            command.stdout.write(f"chars={size} {kind}")
+
+            stats = measure(lambda: [_previous(t) for t in texts], iterations)
+            command.stdout.write(format_row(f"  previous x{BATCH}", stats))
+
+            stats = measure(
+                lambda: [SecurityValidator.validate_content(t) for t in texts],
+                iterations,
+            )
+            command.stdout.write(format_row(f"  validate_content x{BATCH}", stats))
+
+            stats = measure(
+                lambda: SecurityValidator.validate_contents(texts), iterations
+            )
+            command.stdout.write(format_row(f"  validate_contents({BATCH})", stats))
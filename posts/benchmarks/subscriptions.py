@@ -0,0 +1,122 @@
+"""Idle subscription soak: memory held per socket and fan-out latency.
+
+Sizes are concurrent sockets, all subscribed to postCreated on one worker
+event loop. Sockets are driven in-process through the ASGI app, so the
+figures cover the protocol handler, its subscription and the shared broker,
+but not the server's own per-connection buffers (uvicorn/wsproto).
+"""
+
+import asyncio
+import gc
+import json
+import threading
+import tracemalloc
+
+from django.contrib.auth.models import User
+
+from posts import pubsub
+from posts.cache_utils import cache_post_data
+from posts.models import Post
+from posts.websocket import SUBPROTOCOL, websocket_application
+from socialfeed.schema import async_schema
+
+from . import format_row, measure, scratch_data
+
+DEFAULT_SIZES = [1000, 10_000]
+
+SUBSCRIPTION = "subscription { postCreated { id content author { username } } }"
+
+# Seconds to wait for every socket to subscribe or receive an event
+TIMEOUT = 120
+
+
+class _Socket:
+    def __init__(self, app):
+        self.incoming = asyncio.Queue()
+        self.outgoing = asyncio.Queue()
+        self.incoming.put_nowait({"type": "websocket.connect"})
+        scope = {
+            "type": "websocket",
+            "path": "/graphql/ws/",
+            "subprotocols": [SUBPROTOCOL],
+        }
+        self.task = asyncio.create_task(
+            app(scope, self.incoming.get, self.outgoing.put)
+        )
+
+    def send(self, message):
+        self.incoming.put_nowait(
+            {"type": "websocket.receive", "text": json.dumps(message)}
+        )
+
+    async def receive(self):
+        return await self.outgoing.get()
+
+
+async def _open(count):
+    app = websocket_application(async_schema)
+    sockets = [_Socket(app) for _ in range(count)]
+    for socket in sockets:
+        await socket.receive()  # websocket.accept
+        socket.send({"type": "connection_init"})
+    for socket in sockets:
+        await socket.receive()  # connection_ack
+        socket.send(
+            {"id": "feed", "type": "subscribe", "payload": {"query": SUBSCRIPTION}}
+        )
+
+    broker = pubsub.broker()
+    while sum(len(listeners) for listeners in broker._listeners.values()) < count:
+        await asyncio.sleep(0.05)
+    return sockets
+
+
+async def _close(sockets):
+    for socket in sockets:
+        socket.incoming.put_nowait({"type": "websocket.disconnect"})
+    await asyncio.gather(*(socket.task for socket in sockets))
+
+
+async def _delivered(sockets):
+    await asyncio.gather(*(socket.receive() for socket in sockets))
+
+
+def run(command, sizes, iterations):
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    def run_in_loop(coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, loop).result(TIMEOUT)
+
+    try:
+        with scratch_data():
+            author = User.objects.create_user(username="bench_subscriptions")
+            event = cache_post_data(Post.objects.create(author=author, content="hi"))
+            channel = pubsub._channel(pubsub.POST_CREATED)
+
+            for size in sorted(sizes):
+                gc.collect()
+                tracemalloc.start()
+                before = tracemalloc.get_traced_memory()[0]
+                sockets = run_in_loop(_open(size))
+                gc.collect()
+                held = tracemalloc.get_traced_memory()[0] - before
+                tracemalloc.stop()
+
+                subscribers = dict(pubsub._client().pubsub_numsub(channel))
+                command.stdout.write(
+                    f"sockets={size}, redis_subscribers={subscribers[channel.encode()]}, "
+                    f"memory_per_socket={held / size / 1024:.1f}KiB"
+                )
+
+                def fan_out():
+                    pubsub._publish([(pubsub.POST_CREATED, event)])
+                    run_in_loop(_delivered(sockets))
+
+                stats = measure(fan_out, iterations)
+                command.stdout.write(format_row(f"  publish -> {size} sockets", stats))
+                run_in_loop(_close(sockets))
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
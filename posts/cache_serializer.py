@@ -0,0 +1,189 @@
+"""
+Compact encoding of cached values, plugged into django-redis through the
+cache's SERIALIZER and COMPRESSOR options.
+
+Values are msgpack-encoded. A dict shaped like a known payload (a post, a
+comment, a feed fragment, a get_or_compute entry) is written as the tuple of
+its values under a msgpack extension type, so field names are not repeated
+in every entry. Its ISO-8601 timestamps are written as integer microseconds.
+Anything msgpack cannot encode exactly falls back to pickle, and values written
+by the pickle serializer are still read, so switching serializers needs no
+cache flush.
+"""
+
+import pickle
+from datetime import datetime, timedelta, timezone
+
+import msgpack
+import pyzstd
+from django_redis.compressors.base import BaseCompressor
+from django_redis.exceptions import CompressorError
+from django_redis.serializers.base import BaseSerializer
+
+# First byte of each encoding; pickle (protocol 2+) starts with 0x80
+MSGPACK = b"M"
+ZSTD = b"Z"
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+class Schema:
+    """The fields, in order, of one payload shape, and which are timestamps"""
+
+    def __init__(self, code, fields, timestamps=()):
+        self.code = code
+        self.fields = tuple(fields)
+        self.timestamps = frozenset(timestamps)
+
+
+# Field orders match cache_post_data, cache_comment_data, cache_post_fragment
+# and CacheManager._entry. Codes are stored in Redis: never reuse one.
+POST = Schema(
+    1,
+    (
+        "id",
+        "author_id",
+        "author_username",
+        "author_date_joined",
+        "content",
+        "image_url",
+        "likes_count",
+        "comments_count",
+        "shares_count",
+        "created_at",
+        "updated_at",
+    ),
+    ("author_date_joined", "created_at", "updated_at"),
+)
+COMMENT = Schema(
+    2,
+    ("id", "author_id", "author_username", "content", "created_at"),
+    ("created_at",),
+)
+FRAGMENT = Schema(3, ("post", "comments"))
+ENTRY = Schema(4, ("value", "expires", "delta"))
+
+SCHEMAS = {schema.fields: schema for schema in (POST, COMMENT, FRAGMENT, ENTRY)}
+_BY_CODE = {schema.code: schema for schema in SCHEMAS.values()}
+
+
+def _pack_timestamp(value):
+    """Microseconds since the epoch for a UTC ISO string that round-trips exactly"""
+    # Only the shape datetime.isoformat() gives an aware UTC datetime with
+    # microseconds, e.g. "2024-01-01T12:00:00.000001+00:00"
+    if (
+        type(value) is str
+        and len(value) == 32
+        and value[10] == "T"
+        and value[19] == "."
+        and value.endswith("+00:00")
+    ):
+        try:
+            moment = datetime.fromisoformat(value)
+        except ValueError:
+            return value
+        if moment.microsecond:
+            return (moment - _EPOCH) // _MICROSECOND
+    return value
+
+
+def _unpack_timestamp(value):
+    return (_EPOCH + value * _MICROSECOND).isoformat()
+
+
+def _pack(value):
+    kind = type(value)
+    if kind is dict:
+        schema = SCHEMAS.get(tuple(value))
+        if schema is None:
+            return {key: _pack(item) for key, item in value.items()}
+        fields = [
+            (
+                _pack_timestamp(value[field])
+                if field in schema.timestamps
+                else _pack(value[field])
+            )
+            for field in schema.fields
+        ]
+        return msgpack.ExtType(schema.code, _packb(fields))
+    if kind is list:
+        return [_pack(item) for item in value]
+    return value
+
+
+def _unsupported(value):
+    raise TypeError(f"{type(value).__name__} is not msgpack-encodable")
+
+
+def _packb(value):
+    # strict_types sends tuples and subclasses of dict, list and str to
+    # _unsupported instead of silently turning them into their base type
+    return msgpack.packb(
+        value, use_bin_type=True, strict_types=True, default=_unsupported
+    )
+
+
+def _ext_hook(code, data):
+    schema = _BY_CODE.get(code)
+    if schema is None:
+        return msgpack.ExtType(code, data)
+    payload = dict(zip(schema.fields, _unpackb(data)))
+    for field in schema.timestamps:
+        if type(payload[field]) is int:
+            payload[field] = _unpack_timestamp(payload[field])
+    return payload
+
+
+def _unpackb(data):
+    return msgpack.unpackb(data, raw=False, ext_hook=_ext_hook, strict_map_key=False)
+
+
+def dumps(value):
+    try:
+        return MSGPACK + _packb(_pack(value))
+    except (TypeError, ValueError, OverflowError):
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def loads(value):
+    if value[:1] == MSGPACK:
+        return _unpackb(memoryview(value)[1:])
+    return pickle.loads(value)
+
+
+class CompactSerializer(BaseSerializer):
+    """msgpack with fixed-schema payloads, falling back to pickle"""
+
+    def dumps(self, value):
+        return dumps(value)
+
+    def loads(self, value):
+        return loads(value)
+
+
+class ZstdCompressor(BaseCompressor):
+    """
+    zstd for values of at least COMPRESS_MIN_LENGTH bytes (default 256).
+
+    Shorter values gain little and are stored as they are; so are values
+    written before compression was enabled.
+    """
+
+    def __init__(self, options):
+        super().__init__(options)
+        self.min_length = options.get("COMPRESS_MIN_LENGTH", 256)
+        self.level = options.get("COMPRESS_LEVEL", 3)
+
+    def compress(self, value):
+        if len(value) < self.min_length:
+            return value
+        return ZSTD + pyzstd.compress(value, self.level)
+
+    def decompress(self, value):
+        if value[:1] != ZSTD:
+            return value
+        try:
+            return pyzstd.decompress(memoryview(value)[1:])
+        except pyzstd.ZstdError as e:
+            raise CompressorError from e
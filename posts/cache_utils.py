@@ -1,5 +1,14 @@
+from datetime import datetime
+from django.contrib.auth.models import User
 from django.core.cache import cache
+from django.db import router
+import asyncio
 import hashlib
+import math
+import random
+import time
+from . import async_cache, local_cache, replicas, tracing
+from .models import Post, Comment
 
 
 class CacheManager:
@@ -10,75 +19,607 @@ class CacheManager:
     POSTS_LIST_PREFIX = "posts_list"
     USER_POSTS_PREFIX = "user_posts"
     POST_COMMENTS_PREFIX = "post_comments"
+    FEED_PAGE_PREFIX = "feed_page"
+    POST_FRAGMENT_PREFIX = "post_fragment"
+    PULL_AUTHORS_PREFIX = "pull_authors"
+
+    GENERATION_PREFIX = "generation"
+
+    # Invalidation scopes. Each scope has a generation counter that is folded
+    # into the keys of the lists it covers; bumping the counter orphans every
+    # key built from the old value, and the orphans expire on their own TTL.
+    FEED_SCOPE = "feed"
+    AUTHOR_SCOPE = "author"
+    # Bumped whenever any post fragment changes, so materialized pages that
+    # embed that fragment are rebuilt from the remaining cached fragments
+    PAGE_SCOPE = "page"
+
+    # Unfiltered feed pages up to this number are cached as full rows
+    MATERIALIZED_PAGES = 1
 
     # Cache timeouts (in seconds)
     POST_TIMEOUT = 300  # 5 minutes
     LIST_TIMEOUT = 60  # 1 minute (lists change frequently)
 
+    # Stampede protection (get_or_compute). Values outlive their timeout by
+    # STALE_TIMEOUT so they can be served while one worker, holding a lease,
+    # recomputes them; other misses wait up to LEASE_WAIT for its result.
+    LEASE_PREFIX = "lease"
+    LEASE_TIMEOUT = 10
+    LEASE_WAIT = 2.0
+    LEASE_POLL_INTERVAL = 0.02
+    STALE_TIMEOUT = 60
+    # Higher refreshes earlier; 1.0 is the XFetch default
+    EARLY_REFRESH_BETA = 1.0
+
+    @staticmethod
+    def _lookup(prefix, key):
+        """cache.get that counts a hit or miss for the prefix"""
+        value = cache.get(key)
+        tracing.record_cache(prefix, int(value is not None), int(value is None))
+        return value
+
     @staticmethod
-    def _make_key(*args):
-        """Generate cache key from arguments"""
-        key_str = ":".join(str(arg) for arg in args)
+    async def _alookup(prefix, key):
+        """Async _lookup"""
+        value = await async_cache.get(key)
+        tracing.record_cache(prefix, int(value is not None), int(value is None))
+        return value
+
+    @classmethod
+    def _local_lookup(cls, prefix, key):
+        """_lookup behind this worker's local cache, which it fills on a miss"""
+        value = local_cache.get(key)
+        tracing.record_local_cache(prefix, int(value is not None), int(value is None))
+        if value is None:
+            version = local_cache.cache.version
+            value = cls._lookup(prefix, key)
+            if value is not None:
+                local_cache.set(key, value, version)
+        return value
+
+    @classmethod
+    async def _alocal_lookup(cls, prefix, key):
+        """Async _local_lookup"""
+        value = local_cache.get(key)
+        tracing.record_local_cache(prefix, int(value is not None), int(value is None))
+        if value is None:
+            version = local_cache.cache.version
+            value = await cls._alookup(prefix, key)
+            if value is not None:
+                local_cache.set(key, value, version)
+        return value
+
+    @staticmethod
+    def _local_lookup_many(prefix, keys):
+        """Entries held by the local cache, and the keys it is missing"""
+        found = {}
+        for key in keys:
+            entry = local_cache.get(key)
+            if entry is not None:
+                found[key] = entry
+        missing = [key for key in keys if key not in found]
+        tracing.record_local_cache(prefix, len(found), len(missing))
+        return found, missing
+
+    @staticmethod
+    def _fill_many(prefix, found, missing, fetched, version):
+        """Count an MGET of the missing keys and keep what it found locally"""
+        tracing.record_cache(prefix, len(fetched), len(missing) - len(fetched))
+        for key, entry in fetched.items():
+            local_cache.set(key, entry, version)
+        found.update(fetched)
+
+    @staticmethod
+    def _entry(value, timeout, delta):
+        """Wrap a value with its soft expiry and how long it took to compute"""
+        return {"value": value, "expires": time.time() + timeout, "delta": delta}
+
+    @staticmethod
+    def _value(entry):
+        return None if entry is None else entry["value"]
+
+    @classmethod
+    def _store(cls, key, value, timeout, delta=0.0):
+        entry = cls._entry(value, timeout, delta)
+        cache.set(key, entry, timeout + cls.STALE_TIMEOUT)
+        local_cache.set(key, entry)
+
+    @classmethod
+    def _is_fresh(cls, entry):
+        """
+        Whether to serve an entry without refreshing it.
+
+        Past its soft expiry it is stale. Before that, it is refreshed early
+        with a probability that grows as expiry nears and with how long the
+        value takes to compute (XFetch), so a single request usually rebuilds
+        a hot key before the other requests for it miss.
+        """
+        early = entry["delta"] * cls.EARLY_REFRESH_BETA * -math.log(1 - random.random())
+        return time.time() + early < entry["expires"]
+
+    @classmethod
+    def _lease_key(cls, key):
+        return f"{cls.LEASE_PREFIX}:{key}"
+
+    @classmethod
+    def _compute(cls, key, compute, timeout):
+        start = time.perf_counter()
+        with replicas.primary():
+            value = compute()
+        if value is not None:
+            cls._store(key, value, timeout, time.perf_counter() - start)
+        return value
+
+    @classmethod
+    def get_or_compute(cls, prefix, key, compute, timeout):
+        """
+        Return the cached value for key, calling compute() at most once across
+        workers when it is missing or due for a refresh.
+
+        The worker that takes the key's lease (SET NX) recomputes. Others serve
+        the stale value meanwhile, or, with nothing to serve, wait for the
+        lease holder's result. None results are returned but not cached.
+        """
+        entry = local_cache.get(key)
+        if entry is not None and cls._is_fresh(entry):
+            tracing.record_local_cache(prefix, 1)
+            return entry["value"]
+        tracing.record_local_cache(prefix, 0, 1)
+
+        version = local_cache.cache.version
+        entry = cache.get(key)
+        if entry is not None and cls._is_fresh(entry):
+            tracing.record_cache(prefix, 1)
+            local_cache.set(key, entry, version)
+            return entry["value"]
+
+        lease = cls._lease_key(key)
+        if cache.add(lease, 1, cls.LEASE_TIMEOUT):
+            try:
+                # Another worker may have refreshed it since our read
+                current = cache.get(key)
+                if current is not None and (
+                    entry is None or current["expires"] != entry["expires"]
+                ):
+                    tracing.record_cache(prefix, 1)
+                    local_cache.set(key, current, version)
+                    return current["value"]
+                tracing.record_cache(prefix, 0, 1)
+                return cls._compute(key, compute, timeout)
+            finally:
+                cache.delete(lease)
+
+        if entry is not None:
+            tracing.record_cache(prefix, 1)
+            return entry["value"]
+
+        deadline = time.monotonic() + cls.LEASE_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(cls.LEASE_POLL_INTERVAL)
+            found = cache.get_many([key, lease])
+            if key in found:
+                tracing.record_cache(prefix, 1)
+                local_cache.set(key, found[key], version)
+                return found[key]["value"]
+            if lease not in found:
+                break
+        # The lease holder cached nothing in time; compute without caching
+        tracing.record_cache(prefix, 0, 1)
+        with replicas.primary():
+            return compute()
+
+    @classmethod
+    async def aget_or_compute(cls, prefix, key, compute, timeout):
+        """Async get_or_compute; compute is a coroutine function"""
+        entry = local_cache.get(key)
+        if entry is not None and cls._is_fresh(entry):
+            tracing.record_local_cache(prefix, 1)
+            return entry["value"]
+        tracing.record_local_cache(prefix, 0, 1)
+
+        version = local_cache.cache.version
+        entry = await async_cache.get(key)
+        if entry is not None and cls._is_fresh(entry):
+            tracing.record_cache(prefix, 1)
+            local_cache.set(key, entry, version)
+            return entry["value"]
+
+        lease = cls._lease_key(key)
+        if await async_cache.add(lease, 1, cls.LEASE_TIMEOUT):
+            try:
+                current = await async_cache.get(key)
+                if current is not None and (
+                    entry is None or current["expires"] != entry["expires"]
+                ):
+                    tracing.record_cache(prefix, 1)
+                    local_cache.set(key, current, version)
+                    return current["value"]
+                tracing.record_cache(prefix, 0, 1)
+                start = time.perf_counter()
+                with replicas.primary():
+                    value = await compute()
+                if value is not None:
+                    entry = cls._entry(value, timeout, time.perf_counter() - start)
+                    await async_cache.set(key, entry, timeout + cls.STALE_TIMEOUT)
+                    local_cache.set(key, entry)
+                return value
+            finally:
+                await async_cache.delete(lease)
+
+        if entry is not None:
+            tracing.record_cache(prefix, 1)
+            return entry["value"]
+
+        deadline = time.monotonic() + cls.LEASE_WAIT
+        while time.monotonic() < deadline:
+            await asyncio.sleep(cls.LEASE_POLL_INTERVAL)
+            found = await async_cache.get_many([key, lease])
+            if key in found:
+                tracing.record_cache(prefix, 1)
+                local_cache.set(key, found[key], version)
+                return found[key]["value"]
+            if lease not in found:
+                break
+        tracing.record_cache(prefix, 0, 1)
+        with replicas.primary():
+            return await compute()
+
+    @staticmethod
+    def _make_key(*args, generations=()):
+        """Generate cache key from arguments and the generations of its scopes"""
+        key_str = ":".join(str(arg) for arg in (*args, *generations))
         return hashlib.md5(key_str.encode()).hexdigest()
 
+    @classmethod
+    def _generation_key(cls, scope, scope_id=""):
+        return f"{cls.GENERATION_PREFIX}:{scope}:{scope_id}"
+
+    @classmethod
+    def _local_generations(cls, keys):
+        """Generations held by the local cache, and the keys it is missing"""
+        found = {key: local_cache.get(key) for key in keys}
+        missing = [key for key, generation in found.items() if generation is None]
+        tracing.record_local_cache(
+            cls.GENERATION_PREFIX, len(keys) - len(missing), len(missing)
+        )
+        return found, missing
+
+    @staticmethod
+    def _fill_generations(found, missing, fetched, version):
+        for key in missing:
+            found[key] = fetched.get(key, 0)
+            local_cache.set(key, found[key], version)
+
+    @classmethod
+    def _get_generations(cls, *scopes):
+        """Fetch the current generation of each (scope, scope_id) in one round-trip"""
+        keys = [cls._generation_key(*scope) for scope in scopes]
+        found, missing = cls._local_generations(keys)
+        if missing:
+            version = local_cache.cache.version
+            fetched = cache.get_many(missing)
+            tracing.record_round_trip(cls.GENERATION_PREFIX)
+            cls._fill_generations(found, missing, fetched, version)
+        return [found[key] for key in keys]
+
+    @classmethod
+    async def _aget_generations(cls, *scopes):
+        """Async _get_generations"""
+        keys = [cls._generation_key(*scope) for scope in scopes]
+        found, missing = cls._local_generations(keys)
+        if missing:
+            version = local_cache.cache.version
+            fetched = await async_cache.get_many(missing)
+            tracing.record_round_trip(cls.GENERATION_PREFIX)
+            cls._fill_generations(found, missing, fetched, version)
+        return [found[key] for key in keys]
+
+    @classmethod
+    def _bump_generation(cls, scope, scope_id=""):
+        """Invalidate every key in a scope with a single INCR"""
+        key = cls._generation_key(scope, scope_id)
+        # ignore_key_check creates the counter (without a TTL) on first use
+        cache.incr(key, ignore_key_check=True)
+        local_cache.invalidate([key])
+        tracing.record_round_trip(cls.GENERATION_PREFIX, 2)
+
+    @classmethod
+    def _posts_list_scopes(cls, user_id=None):
+        if user_id:
+            # Author-filtered lists only change when that author writes
+            return [(cls.AUTHOR_SCOPE, user_id)]
+        return [(cls.FEED_SCOPE,)]
+
+    @classmethod
+    def _posts_list_key(cls, page, per_page, user_id=None, generations=None):
+        if generations is None:
+            generations = cls._get_generations(*cls._posts_list_scopes(user_id))
+        return cls._make_key(
+            cls.POSTS_LIST_PREFIX,
+            page,
+            per_page,
+            user_id or "",
+            generations=generations,
+        )
+
+    @classmethod
+    def _user_posts_key(cls, user_id):
+        (generation,) = cls._get_generations((cls.AUTHOR_SCOPE, user_id))
+        return f"{cls.USER_POSTS_PREFIX}:{user_id}:{generation}"
+
     @classmethod
     def get_post(cls, post_id):
         """Get cached post"""
         key = f"{cls.POST_PREFIX}:{post_id}"
-        return cache.get(key)
+        return cls._value(cls._local_lookup(cls.POST_PREFIX, key))
+
+    @classmethod
+    async def aget_post(cls, post_id):
+        """Async get_post"""
+        return cls._value(
+            await cls._alocal_lookup(cls.POST_PREFIX, f"{cls.POST_PREFIX}:{post_id}")
+        )
 
     @classmethod
     def set_post(cls, post_id, post_data, timeout=None):
         """Cache post data"""
         key = f"{cls.POST_PREFIX}:{post_id}"
+        cls._store(key, post_data, timeout or cls.POST_TIMEOUT)
+        tracing.record_round_trip(cls.POST_PREFIX)
+
+    @classmethod
+    async def aset_post(cls, post_id, post_data, timeout=None):
+        """Async set_post"""
+        key = f"{cls.POST_PREFIX}:{post_id}"
         timeout = timeout or cls.POST_TIMEOUT
-        cache.set(key, post_data, timeout)
+        entry = cls._entry(post_data, timeout, 0.0)
+        await async_cache.set(key, entry, timeout + cls.STALE_TIMEOUT)
+        local_cache.set(key, entry)
+        tracing.record_round_trip(cls.POST_PREFIX)
 
     @classmethod
-    def invalidate_post(cls, post_id):
-        """Invalidate post cache"""
+    def get_or_compute_post(cls, post_id, compute):
+        """Cached post data, computed by compute() at most once across workers"""
         key = f"{cls.POST_PREFIX}:{post_id}"
-        cache.delete(key)
+        return cls.get_or_compute(cls.POST_PREFIX, key, compute, cls.POST_TIMEOUT)
 
     @classmethod
-    def get_posts_list(cls, page, per_page, user_id=None, search=None):
-        """Get cached posts list"""
-        cache_key = cls._make_key(
-            cls.POSTS_LIST_PREFIX, page, per_page, user_id or "", search or ""
+    async def aget_or_compute_post(cls, post_id, compute):
+        """Async get_or_compute_post"""
+        key = f"{cls.POST_PREFIX}:{post_id}"
+        return await cls.aget_or_compute(
+            cls.POST_PREFIX, key, compute, cls.POST_TIMEOUT
         )
-        return cache.get(cache_key)
 
     @classmethod
-    def set_posts_list(cls, posts_data, page, per_page, user_id=None, search=None):
+    def get_posts_many(cls, post_ids):
+        """
+        Get cached posts as a {post_id: post_data} dict of the found ones.
+
+        Posts held by the local cache are served from it; the rest come from
+        Redis in a single MGET.
+        """
+        keys = {f"{cls.POST_PREFIX}:{post_id}": post_id for post_id in post_ids}
+        if not keys:
+            return {}
+        found, missing = cls._local_lookup_many(cls.POST_PREFIX, keys)
+        if missing:
+            version = local_cache.cache.version
+            fetched = cache.get_many(missing)
+            cls._fill_many(cls.POST_PREFIX, found, missing, fetched, version)
+        return {keys[key]: entry["value"] for key, entry in found.items()}
+
+    @classmethod
+    async def aget_posts_many(cls, post_ids):
+        """Async get_posts_many"""
+        keys = {f"{cls.POST_PREFIX}:{post_id}": post_id for post_id in post_ids}
+        if not keys:
+            return {}
+        found, missing = cls._local_lookup_many(cls.POST_PREFIX, keys)
+        if missing:
+            version = local_cache.cache.version
+            fetched = await async_cache.get_many(missing)
+            cls._fill_many(cls.POST_PREFIX, found, missing, fetched, version)
+        return {keys[key]: entry["value"] for key, entry in found.items()}
+
+    @classmethod
+    def _post_entries(cls, posts_data, timeout):
+        return {
+            f"{cls.POST_PREFIX}:{data['id']}": cls._entry(data, timeout, 0.0)
+            for data in posts_data
+        }
+
+    @classmethod
+    def set_posts_many(cls, posts_data, timeout=None):
+        """Cache post data dicts, keyed by their ID, in one pipelined round-trip"""
+        timeout = timeout or cls.POST_TIMEOUT
+        entries = cls._post_entries(posts_data, timeout)
+        if not entries:
+            return
+        cache.set_many(entries, timeout + cls.STALE_TIMEOUT)
+        for key, entry in entries.items():
+            local_cache.set(key, entry)
+        tracing.record_round_trip(cls.POST_PREFIX)
+
+    @classmethod
+    async def aset_posts_many(cls, posts_data, timeout=None):
+        """Async set_posts_many"""
+        timeout = timeout or cls.POST_TIMEOUT
+        entries = cls._post_entries(posts_data, timeout)
+        if not entries:
+            return
+        await async_cache.set_many(entries, timeout + cls.STALE_TIMEOUT)
+        for key, entry in entries.items():
+            local_cache.set(key, entry)
+        tracing.record_round_trip(cls.POST_PREFIX)
+
+    @classmethod
+    def invalidate_post(cls, post_id):
+        """Invalidate post cache, its feed fragment and the pages embedding it"""
+        cls.invalidate_many([post_id])
+
+    @classmethod
+    def invalidate_many(cls, post_ids):
+        """invalidate_post for several posts, with one DEL and one generation bump"""
+        post_ids = list(post_ids)
+        if not post_ids:
+            return
+        keys = [f"{cls.POST_PREFIX}:{post_id}" for post_id in post_ids]
+        cache.delete_many(
+            keys + [f"{cls.POST_FRAGMENT_PREFIX}:{post_id}" for post_id in post_ids]
+        )
+        local_cache.invalidate(keys)
+        tracing.record_round_trip(cls.POST_PREFIX, 2)
+        cls._bump_generation(cls.PAGE_SCOPE)
+
+    @classmethod
+    def is_materialized(cls, page, user_id=None):
+        """Whether a posts page is cached as full rows rather than IDs"""
+        return page <= cls.MATERIALIZED_PAGES and not user_id
+
+    @classmethod
+    def _feed_page_key(cls, page, per_page, generations=None):
+        if generations is None:
+            generations = cls._get_generations((cls.FEED_SCOPE,), (cls.PAGE_SCOPE,))
+        return cls._make_key(
+            cls.FEED_PAGE_PREFIX, page, per_page, generations=generations
+        )
+
+    @classmethod
+    def get_or_compute_feed_page(cls, page, per_page, compute):
+        """Materialized feed page, computed by compute() at most once across workers"""
+        return cls.get_or_compute(
+            cls.FEED_PAGE_PREFIX,
+            cls._feed_page_key(page, per_page),
+            compute,
+            cls.LIST_TIMEOUT,
+        )
+
+    @classmethod
+    async def aget_or_compute_feed_page(cls, page, per_page, compute):
+        """Async get_or_compute_feed_page"""
+        generations = await cls._aget_generations((cls.FEED_SCOPE,), (cls.PAGE_SCOPE,))
+        return await cls.aget_or_compute(
+            cls.FEED_PAGE_PREFIX,
+            cls._feed_page_key(page, per_page, generations),
+            compute,
+            cls.LIST_TIMEOUT,
+        )
+
+    @classmethod
+    def get_post_fragments(cls, post_ids):
+        """Get cached post fragments as a {post_id: fragment} dict in one round-trip"""
+        keys = {
+            f"{cls.POST_FRAGMENT_PREFIX}:{post_id}": post_id for post_id in post_ids
+        }
+        found = cache.get_many(list(keys))
+        tracing.record_cache(
+            cls.POST_FRAGMENT_PREFIX, len(found), len(keys) - len(found)
+        )
+        return {keys[key]: fragment for key, fragment in found.items()}
+
+    @classmethod
+    def set_post_fragments(cls, fragments):
+        """Cache post fragments keyed by their post ID"""
+        cache.set_many(
+            {
+                f"{cls.POST_FRAGMENT_PREFIX}:{fragment['post']['id']}": fragment
+                for fragment in fragments
+            },
+            cls.POST_TIMEOUT,
+        )
+        tracing.record_round_trip(cls.POST_FRAGMENT_PREFIX)
+
+    @classmethod
+    def get_posts_list(cls, page, per_page, user_id=None):
+        """Get cached posts list"""
+        cache_key = cls._posts_list_key(page, per_page, user_id)
+        return cls._value(cls._local_lookup(cls.POSTS_LIST_PREFIX, cache_key))
+
+    @classmethod
+    async def aget_posts_list(cls, page, per_page, user_id=None):
+        """Async get_posts_list"""
+        generations = await cls._aget_generations(*cls._posts_list_scopes(user_id))
+        cache_key = cls._posts_list_key(page, per_page, user_id, generations)
+        return cls._value(await cls._alocal_lookup(cls.POSTS_LIST_PREFIX, cache_key))
+
+    @classmethod
+    def set_posts_list(cls, posts_data, page, per_page, user_id=None):
         """Cache posts list"""
-        cache_key = cls._make_key(
-            cls.POSTS_LIST_PREFIX, page, per_page, user_id or "", search or ""
+        cache_key = cls._posts_list_key(page, per_page, user_id)
+        cls._store(cache_key, posts_data, cls.LIST_TIMEOUT)
+        tracing.record_round_trip(cls.POSTS_LIST_PREFIX)
+
+    @classmethod
+    def get_or_compute_posts_list(cls, page, per_page, compute, user_id=None):
+        """Cached posts list, computed by compute() at most once across workers"""
+        cache_key = cls._posts_list_key(page, per_page, user_id)
+        return cls.get_or_compute(
+            cls.POSTS_LIST_PREFIX, cache_key, compute, cls.LIST_TIMEOUT
         )
-        cache.set(cache_key, posts_data, cls.LIST_TIMEOUT)
 
     @classmethod
     def invalidate_posts_lists(cls):
-        """Invalidate all posts lists (call when new post created)"""
-        # Pattern matching requires redis backend
-        cache.delete_pattern(f"*{cls.POSTS_LIST_PREFIX}*")
+        """Invalidate the global feed (call on any post write)"""
+        cls._bump_generation(cls.FEED_SCOPE)
 
     @classmethod
     def get_user_posts(cls, user_id):
         """Get cached user posts"""
-        key = f"{cls.USER_POSTS_PREFIX}:{user_id}"
-        return cache.get(key)
+        return cls._value(
+            cls._local_lookup(cls.USER_POSTS_PREFIX, cls._user_posts_key(user_id))
+        )
 
     @classmethod
     def set_user_posts(cls, user_id, posts_data):
         """Cache user posts"""
-        key = f"{cls.USER_POSTS_PREFIX}:{user_id}"
-        cache.set(key, posts_data, cls.LIST_TIMEOUT)
+        cls._store(cls._user_posts_key(user_id), posts_data, cls.LIST_TIMEOUT)
+        tracing.record_round_trip(cls.USER_POSTS_PREFIX)
+
+    @classmethod
+    def get_or_compute_user_posts(cls, user_id, compute):
+        """Cached user posts, computed by compute() at most once across workers"""
+        return cls.get_or_compute(
+            cls.USER_POSTS_PREFIX,
+            cls._user_posts_key(user_id),
+            compute,
+            cls.LIST_TIMEOUT,
+        )
+
+    @classmethod
+    async def aget_or_compute_user_posts(cls, user_id, compute):
+        """Async get_or_compute_user_posts"""
+        return await cls.aget_or_compute(
+            cls.USER_POSTS_PREFIX,
+            cls._user_posts_key(user_id),
+            compute,
+            cls.LIST_TIMEOUT,
+        )
 
     @classmethod
     def invalidate_user_posts(cls, user_id):
-        """Invalidate user posts cache"""
-        key = f"{cls.USER_POSTS_PREFIX}:{user_id}"
-        cache.delete(key)
+        """Invalidate user posts and author-filtered lists for one author"""
+        cls._bump_generation(cls.AUTHOR_SCOPE, user_id)
+
+    @classmethod
+    def get_pull_authors(cls, user_id):
+        """Get cached IDs of followed authors that are merged in at read time"""
+        return cls._lookup(
+            cls.PULL_AUTHORS_PREFIX, f"{cls.PULL_AUTHORS_PREFIX}:{user_id}"
+        )
+
+    @classmethod
+    def set_pull_authors(cls, user_id, author_ids):
+        """Cache IDs of followed authors that are merged in at read time"""
+        cache.set(f"{cls.PULL_AUTHORS_PREFIX}:{user_id}", author_ids, cls.POST_TIMEOUT)
+        tracing.record_round_trip(cls.PULL_AUTHORS_PREFIX)
+
+    @classmethod
+    def invalidate_pull_authors(cls, user_id):
+        """Invalidate pull authors (call when the user follows or unfollows)"""
+        cache.delete(f"{cls.PULL_AUTHORS_PREFIX}:{user_id}")
+        tracing.record_round_trip(cls.PULL_AUTHORS_PREFIX)
 
 
 def cache_post_data(post):
@@ -87,6 +628,7 @@ def cache_post_data(post):
         "id": post.id,
         "author_id": post.author_id,
         "author_username": post.author.username,
+        "author_date_joined": post.author.date_joined.isoformat(),
         "content": post.content,
         "image_url": post.image_url,
         "likes_count": post.likes_count,
@@ -95,3 +637,79 @@ def cache_post_data(post):
         "created_at": post.created_at.isoformat(),
         "updated_at": post.updated_at.isoformat(),
     }
+
+
+def cache_comment_data(comment):
+    """Convert comment to cacheable dict"""
+    return {
+        "id": comment.id,
+        "author_id": comment.author_id,
+        "author_username": comment.author.username,
+        "content": comment.content,
+        "created_at": comment.created_at.isoformat(),
+    }
+
+
+def cache_post_fragment(post, comments):
+    """Convert post and its top comments to a feed fragment"""
+    return {
+        "post": cache_post_data(post),
+        "comments": [cache_comment_data(comment) for comment in comments],
+    }
+
+
+def _from_cache(model, values):
+    """
+    Build a model instance as if it had been loaded from the database.
+
+    Fields missing from `values` are deferred, so they are only fetched if
+    something actually reads them.
+    """
+    return model.from_db(router.db_for_read(model), list(values), list(values.values()))
+
+
+def hydrate_post(data):
+    """Rebuild a Post and its author from cache_post_data output without a query"""
+    author_values = {"id": data["author_id"], "username": data["author_username"]}
+    if "author_date_joined" in data:
+        author_values["date_joined"] = datetime.fromisoformat(
+            data["author_date_joined"]
+        )
+    author = _from_cache(User, author_values)
+
+    post = _from_cache(
+        Post,
+        {
+            "id": data["id"],
+            "author_id": data["author_id"],
+            "content": data["content"],
+            "image_url": data["image_url"],
+            "likes_count": data["likes_count"],
+            "comments_count": data["comments_count"],
+            "shares_count": data["shares_count"],
+            "created_at": datetime.fromisoformat(data["created_at"]),
+            "updated_at": datetime.fromisoformat(data["updated_at"]),
+        },
+    )
+    Post.author.field.set_cached_value(post, author)
+    return post
+
+
+def hydrate_comment(data, post):
+    """Rebuild a Comment and its author from cache_comment_data output"""
+    author = _from_cache(
+        User, {"id": data["author_id"], "username": data["author_username"]}
+    )
+    comment = _from_cache(
+        Comment,
+        {
+            "id": data["id"],
+            "post_id": post.id,
+            "author_id": data["author_id"],
+            "content": data["content"],
+            "created_at": datetime.fromisoformat(data["created_at"]),
+        },
+    )
+    Comment.author.field.set_cached_value(comment, author)
+    Comment.post.field.set_cached_value(comment, post)
+    return comment
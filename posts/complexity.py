@@ -0,0 +1,203 @@
+"""
+Static query cost analysis.
+
+The cost of an operation is computed from its validated document before it
+runs: every field returning a post, comment, user or interaction costs its
+weight, times the number of items its list can hold (`perPage`, `first`, or a
+fixed estimate for lists without a size argument). Operations over
+GRAPHQL_MAX_QUERY_COST are rejected, and each client may spend at most
+GRAPHQL_QUERY_COST_PER_MINUTE from a token bucket (posts.ratelimit). Nesting
+depth is bounded separately by a validation rule (GRAPHQL_MAX_QUERY_DEPTH).
+"""
+
+from django.conf import settings
+from graphene.validation import depth_limit_validator
+from graphql import (
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    GraphQLList,
+    InlineFragmentNode,
+    get_named_type,
+    get_nullable_type,
+    get_operation_ast,
+    is_composite_type,
+    specified_rules,
+)
+from graphql.execution.values import get_argument_values, get_variable_values
+
+from . import ratelimit
+from .loaders import COMMENTS_PER_POST, INTERACTIONS_PER_POST
+from .pagination import MAX_PAGE_SIZE
+
+PREFIX = "query_cost"
+
+# Cost of one object of each type; other types (connections, edges, page
+# info, scalars) are free
+TYPE_WEIGHTS = {
+    "PostType": 1,
+    "CommentType": 1,
+    "UserType": 1,
+    "InteractionType": 1,
+}
+
+# Cost of each mutation, on top of the objects it returns
+MUTATION_WEIGHT = 10
+
+# List arguments of bulk mutations; every item costs MUTATION_WEIGHT
+BATCH_ARGUMENTS = ("postIds", "inputs")
+
+# Per-field overrides of TYPE_WEIGHTS and MUTATION_WEIGHT, keyed by "ParentType.field"
+FIELD_WEIGHTS = {
+    # Merges the fanned-out timeline with posts pulled from popular authors
+    "Query.homeFeed": 2,
+}
+
+# Arguments that set how many items a list returns
+SIZE_ARGUMENTS = ("perPage", "first")
+
+# Items assumed for lists without a size argument
+LIST_SIZES = {
+    "PostType.comments": COMMENTS_PER_POST,
+    "PostType.interactions": INTERACTIONS_PER_POST,
+    # Already multiplied by `first` on the connection field
+    "PostConnection.edges": 1,
+}
+UNBOUNDED_LIST_SIZE = MAX_PAGE_SIZE
+
+
+def validation_rules():
+    """The standard validation rules plus the depth limit"""
+    return [
+        *specified_rules,
+        depth_limit_validator(settings.GRAPHQL_MAX_QUERY_DEPTH),
+    ]
+
+
+def query_cost(schema, document, operation_name=None, variables=None):
+    """Cost of running `operation_name` from a validated document"""
+    operation = get_operation_ast(document, operation_name)
+    if operation is None:
+        return 0
+
+    variables = get_variable_values(
+        schema,
+        operation.variable_definitions or (),
+        variables if isinstance(variables, dict) else {},
+    )
+    if isinstance(variables, list):
+        # Invalid variables: the operation fails before resolving anything
+        return 0
+
+    root_type = schema.get_root_type(operation.operation)
+    fragments = {
+        definition.name.value: definition
+        for definition in document.definitions
+        if isinstance(definition, FragmentDefinitionNode)
+    }
+    return _selection_cost(
+        schema, root_type, operation.selection_set, fragments, variables
+    )
+
+
+def _selection_cost(schema, parent_type, selection_set, fragments, variables):
+    cost = 0
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode):
+            cost += _field_cost(schema, parent_type, selection, fragments, variables)
+        elif isinstance(selection, FragmentSpreadNode):
+            fragment = fragments[selection.name.value]
+            fragment_type = schema.get_type(fragment.type_condition.name.value)
+            cost += _selection_cost(
+                schema, fragment_type, fragment.selection_set, fragments, variables
+            )
+        elif isinstance(selection, InlineFragmentNode):
+            fragment_type = parent_type
+            if selection.type_condition is not None:
+                fragment_type = schema.get_type(selection.type_condition.name.value)
+            cost += _selection_cost(
+                schema, fragment_type, selection.selection_set, fragments, variables
+            )
+    return cost
+
+
+def _field_cost(schema, parent_type, node, fragments, variables):
+    name = node.name.value
+    field = getattr(parent_type, "fields", {}).get(name)
+    if field is None or name.startswith("__"):
+        return 0
+
+    key = f"{parent_type.name}.{name}"
+    field_type = get_named_type(field.type)
+    if key in FIELD_WEIGHTS:
+        weight = FIELD_WEIGHTS[key]
+    elif parent_type is schema.mutation_type:
+        weight = MUTATION_WEIGHT * _batch_size(field, node, variables)
+    else:
+        weight = TYPE_WEIGHTS.get(field_type.name, 0)
+    if not is_composite_type(field_type):
+        return weight
+
+    children = _selection_cost(
+        schema, field_type, node.selection_set, fragments, variables
+    )
+    return _list_size(key, field, node, variables) * (weight + children)
+
+
+def _list_size(key, field, node, variables):
+    for argument in SIZE_ARGUMENTS:
+        if argument in field.args:
+            return _size_argument(field, node, variables, argument)
+    if isinstance(get_nullable_type(field.type), GraphQLList):
+        return LIST_SIZES.get(key, UNBOUNDED_LIST_SIZE)
+    return 1
+
+
+def _batch_size(field, node, variables):
+    for argument in BATCH_ARGUMENTS:
+        if argument in field.args:
+            items = _argument(field, node, variables, argument)
+            return len(items) if isinstance(items, list) else UNBOUNDED_LIST_SIZE
+    return 1
+
+
+def _argument(field, node, variables, argument):
+    try:
+        arguments = get_argument_values(field, node, variables)
+    except GraphQLError:
+        # Reported when the operation runs
+        arguments = {}
+    return arguments.get(field.args[argument].out_name or argument)
+
+
+def _size_argument(field, node, variables, argument):
+    value = _argument(field, node, variables, argument)
+    return max(value, 0) if isinstance(value, int) else MAX_PAGE_SIZE
+
+
+def check_cost(cost):
+    """Raise GraphQLError if a single operation is over budget"""
+    budget = settings.GRAPHQL_MAX_QUERY_COST
+    if cost > budget:
+        raise GraphQLError(
+            f"Query cost {cost} exceeds the maximum of {budget}.",
+            extensions={"code": "QUERY_TOO_COMPLEX", "cost": cost, "budget": budget},
+        )
+
+
+def _cost_rate():
+    return f"{settings.GRAPHQL_QUERY_COST_PER_MINUTE}/m"
+
+
+def charge(request, cost):
+    """
+    Spend `cost` from the client's query-cost bucket
+
+    Returns what is left; raises GraphQLError once the budget is spent.
+    """
+    return int(ratelimit.consume(request, PREFIX, _cost_rate(), cost))
+
+
+async def acharge(request, cost):
+    return int(await ratelimit.aconsume(request, PREFIX, _cost_rate(), cost))
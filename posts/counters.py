@@ -0,0 +1,206 @@
+"""
+Write-behind counters for Post.likes_count, comments_count and shares_count.
+
+Mutations add to a per-post Redis hash instead of updating the post row, so a
+viral post no longer serializes every like on its row lock. `flush()` (run
+periodically by the `flush_counters` command) moves the pending deltas into
+Postgres in one bulk UPDATE per batch. Readers add the pending delta to the
+stored counter, so counts stay exact between flushes. While a batch is being
+flushed its deltas sit in per-post "flushing" hashes, which readers also add,
+until the UPDATE is committed and the cached posts are invalidated.
+"""
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django_redis import get_redis_connection
+
+from . import async_cache, tracing
+from .cache_utils import CacheManager
+from .models import Post
+
+FIELDS = ("likes_count", "comments_count", "shares_count")
+
+FLUSH_BATCH_SIZE = 500
+
+# Seconds a flushing hash outlives a flush that died before releasing it
+FLUSHING_TIMEOUT = 600
+
+# Atomically move a batch of posts' pending deltas into their flushing hashes.
+# KEYS: each post's pending hash then its flushing hash; ARGV[1]: TTL.
+_TAKE_SCRIPT = """
+local taken = {}
+for i = 1, #KEYS, 2 do
+    local deltas = redis.call('HGETALL', KEYS[i])
+    for j = 1, #deltas, 2 do
+        if deltas[j + 1] ~= '0' then
+            redis.call('HINCRBY', KEYS[i + 1], deltas[j], deltas[j + 1])
+        end
+    end
+    if #deltas > 0 then
+        redis.call('DEL', KEYS[i])
+        redis.call('EXPIRE', KEYS[i + 1], ARGV[1])
+    end
+    taken[#taken + 1] = deltas
+end
+return taken
+"""
+
+# Atomically remove flushed deltas from the flushing hashes, adding them back
+# to the pending hashes when the flush failed. KEYS: as for _TAKE_SCRIPT;
+# ARGV[1]: 1 to requeue, then per post its field count and field, delta pairs.
+_RELEASE_SCRIPT = """
+local n = 2
+for i = 1, #KEYS, 2 do
+    local count = tonumber(ARGV[n])
+    for j = n + 1, n + 2 * count, 2 do
+        local field, delta = ARGV[j], tonumber(ARGV[j + 1])
+        if redis.call('EXISTS', KEYS[i + 1]) == 1 and
+                redis.call('HINCRBY', KEYS[i + 1], field, -delta) == 0 then
+            redis.call('HDEL', KEYS[i + 1], field)
+        end
+        if ARGV[1] == '1' then
+            redis.call('HINCRBY', KEYS[i], field, delta)
+        end
+    end
+    n = n + 2 * count + 1
+end
+"""
+
+
+def _client():
+    return get_redis_connection("default")
+
+
+def pending_key(post_id):
+    """Redis hash of a post's pending {field: delta}"""
+    return cache.make_key(f"counters:{post_id}")
+
+
+def flushing_key(post_id):
+    """Redis hash of a post's deltas being written by flush()"""
+    return cache.make_key(f"counters:flushing:{post_id}")
+
+
+def _keys(post_ids):
+    """Each post's pending hash then its flushing hash, for the Lua scripts"""
+    return [
+        key
+        for post_id in post_ids
+        for key in (pending_key(post_id), flushing_key(post_id))
+    ]
+
+
+def _dirty_key():
+    return cache.make_key("counters:dirty")
+
+
+def _parse(flat):
+    """Turn a flat HGETALL reply into a {field: delta} dict"""
+    return {field.decode(): int(value) for field, value in zip(flat[::2], flat[1::2])}
+
+
+def increment(post_id, field, delta=1):
+    """Queue a counter change once the current transaction commits"""
+    increment_many([post_id], field, delta)
+
+
+def increment_many(post_ids, field, delta=1):
+    """increment() for several posts, applied in one round-trip"""
+    post_ids = list(post_ids)
+    if not post_ids:
+        return
+
+    def apply():
+        pipe = _client().pipeline(transaction=False)
+        for post_id in post_ids:
+            pipe.hincrby(pending_key(post_id), field, delta)
+        pipe.sadd(_dirty_key(), *post_ids)
+        pipe.execute()
+
+    transaction.on_commit(apply)
+
+
+def pending_many(post_ids):
+    """Pending deltas for several posts in one round-trip, as {post_id: {field: delta}}"""
+    pipe = _client().pipeline(transaction=False)
+    for key in _keys(post_ids):
+        pipe.hgetall(key)
+    results = pipe.execute()
+    tracing.record_round_trip("counters")
+    return _pending_by_post(post_ids, results)
+
+
+async def apending_many(post_ids):
+    """Async pending_many"""
+    pipe = async_cache.client().pipeline(transaction=False)
+    for key in _keys(post_ids):
+        pipe.hgetall(key)
+    results = await pipe.execute()
+    tracing.record_round_trip("counters")
+    return _pending_by_post(post_ids, results)
+
+
+def _pending_by_post(post_ids, results):
+    """Sum each post's pending and flushing hashes"""
+    pending_by_post = {}
+    for post_id, *found in zip(post_ids, results[::2], results[1::2]):
+        deltas = {}
+        for hash_ in found:
+            for field, value in hash_.items():
+                deltas[field.decode()] = deltas.get(field.decode(), 0) + int(value)
+        if deltas:
+            pending_by_post[post_id] = deltas
+    return pending_by_post
+
+
+def _release(release, deltas_by_post, requeue=False):
+    args = [int(requeue)]
+    for deltas in deltas_by_post.values():
+        args.append(len(deltas))
+        for field, delta in deltas.items():
+            args.extend((field, delta))
+    release(keys=_keys(deltas_by_post), args=args)
+    if requeue:
+        _client().sadd(_dirty_key(), *deltas_by_post)
+
+
+def flush(batch_size=FLUSH_BATCH_SIZE):
+    """Apply all pending deltas to Postgres; returns the number of posts updated"""
+    client = _client()
+    take = client.register_script(_TAKE_SCRIPT)
+    release = client.register_script(_RELEASE_SCRIPT)
+    flushed = 0
+
+    while True:
+        post_ids = [int(post_id) for post_id in client.spop(_dirty_key(), batch_size)]
+        if not post_ids:
+            return flushed
+
+        taken = take(keys=_keys(post_ids), args=[FLUSHING_TIMEOUT])
+        deltas_by_post = {}
+        for post_id, deltas in zip(post_ids, map(_parse, taken)):
+            deltas = {field: delta for field, delta in deltas.items() if delta}
+            if deltas:
+                deltas_by_post[post_id] = deltas
+        if not deltas_by_post:
+            continue
+
+        updates = [
+            Post(
+                pk=post_id,
+                **{field: F(field) + deltas.get(field, 0) for field in FIELDS},
+            )
+            for post_id, deltas in deltas_by_post.items()
+        ]
+        try:
+            Post.objects.bulk_update(updates, FIELDS)
+        except Exception:
+            # Put the deltas back so the next flush retries them
+            _release(release, deltas_by_post, requeue=True)
+            raise
+
+        CacheManager.invalidate_many(deltas_by_post)
+        # Readers now get the new counts from Postgres
+        _release(release, deltas_by_post)
+        flushed += len(deltas_by_post)
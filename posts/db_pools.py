@@ -0,0 +1,32 @@
+"""
+Usage of the psycopg connection pools (DB_POOL=psycopg).
+
+Each worker process holds one pool per database alias, created on the
+alias's first connection. `/health/` reports their sizes and
+posts.metrics exports them to Prometheus.
+"""
+
+from django.db import connections
+
+
+def pools():
+    """{alias: pool} for every alias configured with a pool"""
+    return {
+        alias: connections[alias].pool
+        for alias in connections.settings
+        if connections.settings[alias].get("OPTIONS", {}).get("pool")
+    }
+
+
+def usage():
+    """Connections held, idle and waited for, per alias, in this worker"""
+    result = {}
+    for alias, pool in pools().items():
+        stats = pool.get_stats()
+        result[alias] = {
+            "size": stats.get("pool_size", 0),
+            "idle": stats.get("pool_available", 0),
+            "max": stats.get("pool_max", 0),
+            "waiting": stats.get("requests_waiting", 0),
+        }
+    return result
@@ -1,30 +1,25 @@
-from django_ratelimit.decorators import ratelimit
 from functools import wraps
-from graphql import GraphQLError
 
+from . import ratelimit
 
-def rate_limit(group=None, key="user_or_ip", rate="10/m", method="ALL"):
+
+def rate_limit(group=None, rate="10/m", cost=1):
     """
     Rate limit decorator for GraphQL resolvers
+
+    Spends `cost` tokens (an int, or a callable taking the resolver's
+    arguments) from the caller's `group` bucket; see posts.ratelimit.
     """
 
     def decorator(func):
+        bucket = group or func.__qualname__
+
         @wraps(func)
         def wrapper(self, info, *args, **kwargs):
-            # Get request from info context
-            request = info.context
-
-            # Apply rate limit
-            limiter = ratelimit(group=group, key=key, rate=rate, method=method)
-            limited_func = limiter(lambda r: True)
-
-            # Execute limiter to potentially set request.limited flag
-            limited_func(request)
-
-            # If limiter marked the request as limited, raise an error
-            if getattr(request, "limited", False):
-                raise GraphQLError("Rate limit exceeded. Please try again later.")
-
+            weight = cost(info, *args, **kwargs) if callable(cost) else cost
+            ratelimit.consume(
+                info.context, bucket, rate, weight, name=func.__qualname__
+            )
             return func(self, info, *args, **kwargs)
 
         return wrapper
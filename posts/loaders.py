@@ -0,0 +1,172 @@
+from collections import defaultdict
+
+from django.contrib.auth.models import User
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils.asyncio import async_unsafe
+
+from . import counters
+from .models import Comment, Interaction
+
+# Comments returned per post by PostType.comments
+COMMENTS_PER_POST = 10
+
+# Interactions returned per post by PostType.interactions
+INTERACTIONS_PER_POST = 10
+
+
+class DataLoader:
+    """
+    Request-scoped batching loader.
+
+    Our resolvers run synchronously, so keys cannot be gathered from sibling
+    resolvers before dispatch. Instead, a resolver that returns a list calls
+    `expect()` with every key its children may ask for, and the first `load()`
+    fetches all pending keys in a single batch.
+    """
+
+    def __init__(self):
+        self._cache = {}
+        self._pending = {}
+
+    def batch_load(self, keys):
+        """Return a dict mapping each found key to its value"""
+        raise NotImplementedError
+
+    def default(self):
+        """Value for keys that batch_load did not return"""
+        return None
+
+    def expect(self, keys):
+        """Queue keys to be fetched with the next batch"""
+        for key in keys:
+            if key not in self._cache:
+                self._pending[key] = None
+
+    def prime(self, key, value):
+        """Seed the cache with an already loaded value"""
+        self._cache[key] = value
+        self._pending.pop(key, None)
+
+    def load(self, key):
+        if key not in self._cache:
+            self._pending[key] = None
+            self.dispatch()
+        return self._cache[key]
+
+    def load_many(self, keys):
+        self.expect(keys)
+        return [self.load(key) for key in keys]
+
+    def dispatch(self):
+        """Fetch every pending key in one batch"""
+        keys = list(self._pending)
+        self._pending.clear()
+        if not keys:
+            return
+
+        try:
+            results = self.batch_load(keys)
+        except Exception:
+            # Keep the batch together if the caller retries (e.g. on a sync
+            # thread after the async view's event loop refused the query)
+            self._pending.update(dict.fromkeys(keys))
+            raise
+        for key in keys:
+            self._cache[key] = results[key] if key in results else self.default()
+
+
+class UserLoader(DataLoader):
+    def batch_load(self, keys):
+        return User.objects.in_bulk(keys)
+
+
+class LatestByPostLoader(DataLoader):
+    """Latest `limit` rows per post, fetched with one window query"""
+
+    def __init__(self, limit):
+        super().__init__()
+        self.limit = limit
+
+    def default(self):
+        return []
+
+    def queryset(self, keys):
+        raise NotImplementedError
+
+    def batch_load(self, keys):
+        rows = (
+            self.queryset(keys)
+            .annotate(
+                row_number=Window(
+                    RowNumber(),
+                    partition_by=F("post_id"),
+                    order_by=F("created_at").desc(),
+                )
+            )
+            .filter(row_number__lte=self.limit)
+            .order_by("post_id", "-created_at")
+        )
+
+        grouped = defaultdict(list)
+        for row in rows:
+            grouped[row.post_id].append(row)
+        return grouped
+
+
+class CommentsByPostLoader(LatestByPostLoader):
+    def __init__(self, limit=COMMENTS_PER_POST):
+        super().__init__(limit)
+
+    def queryset(self, keys):
+        return Comment.objects.filter(post_id__in=keys).select_related("author")
+
+
+class InteractionsByPostLoader(LatestByPostLoader):
+    def __init__(self, limit=INTERACTIONS_PER_POST):
+        super().__init__(limit)
+
+    def queryset(self, keys):
+        return Interaction.objects.filter(post_id__in=keys).select_related("user")
+
+
+class PendingCountersLoader(DataLoader):
+    """Write-behind counter deltas not yet flushed to Postgres"""
+
+    def default(self):
+        return {}
+
+    # A blocking Redis call must not run on the async view's event loop: like
+    # a query, it raises there and the field is re-run on the sync thread
+    @async_unsafe
+    def batch_load(self, keys):
+        return counters.pending_many(keys)
+
+
+class Loaders:
+    """All loaders for a single request"""
+
+    def __init__(self):
+        self.user = UserLoader()
+        self.comments_by_post = CommentsByPostLoader()
+        self.interactions_by_post = InteractionsByPostLoader()
+        self.pending_counters = PendingCountersLoader()
+
+    def expect_posts(self, posts):
+        """Queue the children of a list of posts for batched loading"""
+        post_ids = [post.id for post in posts]
+        self.comments_by_post.expect(post_ids)
+        self.interactions_by_post.expect(post_ids)
+        self.pending_counters.expect(post_ids)
+
+
+def get_loaders(info):
+    """Return the loaders attached to this request, creating them if needed"""
+    context = info.context
+    loaders = getattr(context, "loaders", None)
+    if loaders is None:
+        loaders = Loaders()
+        # Without a request (e.g. bare schema.execute) loaders are per call
+        if context is not None:
+            context.loaders = loaders
+    return loaders
@@ -0,0 +1,163 @@
+"""
+Per-worker cache (L1) in front of Redis (L2).
+
+Each process keeps a bounded LRU of hot CacheManager entries: at most
+LOCAL_CACHE_MAX_BYTES of pickled values, each for at most
+LOCAL_CACHE_TIMEOUT seconds. Invalidations are broadcast on a Redis pub/sub
+channel that every worker listens to from a background thread, so an entry
+invalidated anywhere is evicted everywhere within milliseconds. The TTL bounds
+staleness should a broadcast be missed.
+
+Values are shared between requests of a worker, so callers must not mutate
+them.
+"""
+
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache as shared_cache
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "local_cache:invalidate"
+
+# Seconds the listener waits for a message, and before resubscribing after
+# losing its connection
+LISTEN_INTERVAL = 1.0
+
+
+class LocalCache:
+    """Thread-safe LRU with a TTL per entry and a cap on the pickled size"""
+
+    def __init__(self, max_bytes, timeout):
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        # key -> (expires, size, value)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        # Bumped by every eviction request, so a value read from L2 before an
+        # invalidation is not stored after it
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0 and self.timeout > 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and item[0] <= time.monotonic():
+                self._pop(key)
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[2]
+
+    def set(self, key, value, version=None):
+        """Store a value, unless anything was evicted since `version` was read"""
+        if not self.enabled:
+            return
+        size = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+            self._pop(key)
+            self._entries[key] = (time.monotonic() + self.timeout, size, value)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted, _) = self._entries.popitem(last=False)
+                self.nbytes -= evicted
+
+    def delete_many(self, keys):
+        with self._lock:
+            self.version += 1
+            for key in keys:
+                self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            self.nbytes = 0
+
+    def _pop(self, key):
+        item = self._entries.pop(key, None)
+        if item is not None:
+            self.nbytes -= item[1]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+cache = LocalCache(
+    getattr(settings, "LOCAL_CACHE_MAX_BYTES", 32 * 1024 * 1024),
+    getattr(settings, "LOCAL_CACHE_TIMEOUT", 5),
+)
+
+
+def _channel():
+    return shared_cache.make_key(CHANNEL)
+
+
+def _on_message(message):
+    cache.delete_many(json.loads(message["data"]))
+
+
+def _on_error(error, pubsub, thread):
+    # Broadcasts may have been missed while disconnected
+    logger.warning("Lost the local cache invalidation channel: %s", error)
+    cache.clear()
+    time.sleep(LISTEN_INTERVAL)
+
+
+_listener = {"pid": None, "thread": None}
+_listener_lock = threading.Lock()
+
+
+def listen():
+    """Start this process's invalidation listener, once per process"""
+    if _listener["pid"] == os.getpid():
+        return
+    with _listener_lock:
+        if _listener["pid"] == os.getpid():
+            return
+        pubsub = get_redis_connection("default").pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{_channel(): _on_message})
+        _listener["thread"] = pubsub.run_in_thread(
+            sleep_time=LISTEN_INTERVAL, daemon=True, exception_handler=_on_error
+        )
+        # A forked worker starts its own listener
+        _listener["pid"] = os.getpid()
+
+
+def get(key):
+    return cache.get(key)
+
+
+def set(key, value, version=None):
+    if cache.enabled:
+        listen()
+        cache.set(key, value, version)
+
+
+def invalidate(keys):
+    """Evict keys in this worker and, through pub/sub, in every other one"""
+    keys = list(keys)
+    cache.delete_many(keys)
+    if cache.enabled:
+        get_redis_connection("default").publish(_channel(), json.dumps(keys))
@@ -0,0 +1,47 @@
+from importlib import import_module
+
+from django.core.management.base import BaseCommand, CommandError
+
+BENCHMARKS = {
+    "bulk_mutations": "posts.benchmarks.bulk_mutations",
+    "cache_invalidation": "posts.benchmarks.cache_invalidation",
+    "cache_serializer": "posts.benchmarks.cache_serializer",
+    "db_pool": "posts.benchmarks.db_pool",
+    "home_feed": "posts.benchmarks.home_feed",
+    "like_contention": "posts.benchmarks.like_contention",
+    "local_cache": "posts.benchmarks.local_cache",
+    "pagination": "posts.benchmarks.pagination",
+    "persisted_queries": "posts.benchmarks.persisted_queries",
+    "post_cache": "posts.benchmarks.post_cache",
+    "posts_many": "posts.benchmarks.posts_many",
+    "ranking": "posts.benchmarks.ranking",
+    "rate_limit": "posts.benchmarks.rate_limit",
+    "search": "posts.benchmarks.search",
+    "security": "posts.benchmarks.security",
+    "subscriptions": "posts.benchmarks.subscriptions",
+}
+
+
+class Command(BaseCommand):
+    help = "Runs a feed performance benchmark"
+
+    def add_arguments(self, parser):
+        parser.add_argument("name", choices=sorted(BENCHMARKS))
+        parser.add_argument(
+            "--sizes",
+            help="Comma-separated dataset sizes (defaults depend on the benchmark)",
+        )
+        parser.add_argument("--iterations", type=int, default=50)
+
+    def handle(self, *args, **options):
+        module = import_module(BENCHMARKS[options["name"]])
+
+        sizes = module.DEFAULT_SIZES
+        if options["sizes"]:
+            try:
+                sizes = [int(size) for size in options["sizes"].split(",")]
+            except ValueError:
+                raise CommandError("--sizes must be a comma-separated list of integers")
+
+        module.run(self, sizes=sizes, iterations=options["iterations"])
+        self.stdout.write(self.style.SUCCESS("✅ Benchmark complete"))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = "Flushes write-behind like/comment/share counters to the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0,
+            help="Keep running, flushing every N seconds (default: flush once)",
+        )
+
+    def handle(self, *args, **options):
+        interval = options["interval"]
+        while True:
+            flushed = counters.flush()
+            if flushed or not interval:
+                self.stdout.write(f"Flushed counters for {flushed} posts")
+            if not interval:
+                return
+            time.sleep(interval)
@@ -0,0 +1,45 @@
+from datetime import timedelta
+from itertools import chain
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts import counters, ranking
+from posts.models import Comment, Interaction, Post
+
+CHUNK_SIZE = 2000
+
+INTERACTION_FIELDS = {"like": "likes_count", "share": "shares_count"}
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the HOT, TOP_24H and TRENDING rankings from the database"
+
+    def handle(self, *args, **options):
+        # Rank on the stored counters, so apply pending deltas first
+        counters.flush()
+
+        now = timezone.now()
+        since = now - timedelta(hours=ranking.TRENDING_WINDOW_HOURS)
+        posts = Post.objects.values_list(
+            "id", "created_at", "likes_count", "comments_count", "shares_count"
+        ).iterator(chunk_size=CHUNK_SIZE)
+        interactions = (
+            (post_id, INTERACTION_FIELDS[kind], created_at)
+            for post_id, kind, created_at in Interaction.objects.filter(
+                created_at__gte=since, interaction_type__in=INTERACTION_FIELDS
+            )
+            .values_list("post_id", "interaction_type", "created_at")
+            .iterator(chunk_size=CHUNK_SIZE)
+        )
+        comments = (
+            (post_id, "comments_count", created_at)
+            for post_id, created_at in Comment.objects.filter(created_at__gte=since)
+            .values_list("post_id", "created_at")
+            .iterator(chunk_size=CHUNK_SIZE)
+        )
+
+        ranked = ranking.rebuild(
+            posts, chain(interactions, comments), now=now.timestamp()
+        )
+        self.stdout.write(f"Ranked {ranked} posts")
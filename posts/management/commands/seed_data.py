@@ -1,85 +1,343 @@
-from django.core.management.base import BaseCommand
+import io
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import django
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
-from posts.models import Post, Comment, Interaction
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.utils import timezone
 from faker import Faker
-import random
 
-fake = Faker()
+from posts.models import Comment, Interaction, Post
+
+CHUNK_SIZE = 20_000
+
+# Distinct sentences generated with Faker up front; rows pick from this pool
+# because calling Faker per row is far too slow for millions of rows
+SENTENCE_POOL_SIZE = 2000
+
+# Posts are spread over this many days before now
+HISTORY_DAYS = 90
+
+# Share of a post's likers that also share it
+SHARE_RATIO = 0.1
+
+_sentences = []
+
+
+def _init_worker(sentences):
+    """Process pool initializer: each worker opens its own DB connection"""
+    global _sentences
+    django.setup()
+    _sentences = sentences
+
+
+def _copy_value(value):
+    if value is None:
+        return r"\N"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _copy_rows(model, columns, rows):
+    """Stream rows into a table with COPY FROM STDIN"""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_value(value) for value in row))
+        buffer.write("\n")
+    buffer.seek(0)
+
+    sql = f"COPY {model._meta.db_table} ({', '.join(columns)}) FROM STDIN"
+    with connection.cursor() as cursor:
+        if hasattr(cursor, "copy_expert"):  # psycopg2
+            cursor.copy_expert(sql, buffer)
+        else:  # psycopg 3
+            with cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+
+
+def _chunked(items, size=CHUNK_SIZE):
+    """Yield (chunk_index, slice) pairs"""
+    for chunk, start in enumerate(range(0, len(items), size)):
+        end = start + size
+        yield chunk, items[start:end]
+
+
+def _rng(seed, phase, chunk):
+    # String seeds hash deterministically, so output does not depend on the
+    # number of workers or on PYTHONHASHSEED
+    return random.Random(f"{seed}:{phase}:{chunk}")
+
+
+def _text(rng, sentences):
+    return " ".join(rng.choices(_sentences, k=sentences))
+
+
+def _seed_posts(seed, chunk, count, user_ids, now):
+    rng = _rng(seed, "posts", chunk)
+    rows = []
+    for _ in range(count):
+        created_at = now - timedelta(seconds=rng.uniform(0, HISTORY_DAYS * 86400))
+        image_url = (
+            f"https://picsum.photos/seed/{rng.getrandbits(32)}/640/480"
+            if rng.random() < 0.3
+            else None
+        )
+        rows.append(
+            (
+                rng.choice(user_ids),
+                _text(rng, rng.randint(1, 4)),
+                image_url,
+                0,
+                0,
+                0,
+                created_at.isoformat(),
+                created_at.isoformat(),
+            )
+        )
+    _copy_rows(
+        Post,
+        [
+            "author_id",
+            "content",
+            "image_url",
+            "likes_count",
+            "comments_count",
+            "shares_count",
+            "created_at",
+            "updated_at",
+        ],
+        rows,
+    )
+    return count
+
+
+def _seed_comments(seed, chunk, posts, user_ids, per_post, now):
+    rng = _rng(seed, "comments", chunk)
+    rows = []
+    for post_id, post_created_at in posts:
+        for _ in range(rng.randint(0, per_post * 2)):
+            created_at = min(
+                now, post_created_at + timedelta(seconds=rng.expovariate(1 / 3600))
+            )
+            rows.append(
+                (post_id, rng.choice(user_ids), _text(rng, 1), created_at.isoformat())
+            )
+    _copy_rows(Comment, ["post_id", "author_id", "content", "created_at"], rows)
+    return len(rows)
+
+
+def _seed_interactions(seed, chunk, likes_by_post, user_ids, now):
+    rng = _rng(seed, "interactions", chunk)
+    rows = []
+    for post_id, likes in likes_by_post:
+        likers = rng.sample(user_ids, min(likes, len(user_ids)))
+        shares = int(len(likers) * SHARE_RATIO)
+        stamp = now.isoformat()
+        rows.extend((post_id, user_id, "like", stamp) for user_id in likers)
+        rows.extend((post_id, user_id, "share", stamp) for user_id in likers[:shares])
+    _copy_rows(
+        Interaction, ["post_id", "user_id", "interaction_type", "created_at"], rows
+    )
+    return len(rows)
 
 
 class Command(BaseCommand):
     help = "Seeds database with test data"
 
-    def handle(self, *args, **kwargs):
-        # Create users
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=5)
+        parser.add_argument("--posts", type=int, default=20)
+        parser.add_argument(
+            "--comments-per-post",
+            type=int,
+            default=3,
+            help="Average comments per post (uniform between 0 and twice this)",
+        )
+        parser.add_argument(
+            "--likes-per-post",
+            type=float,
+            default=3,
+            help="Average likes per post; 10%% of likers also share",
+        )
+        parser.add_argument(
+            "--likes-zipf",
+            type=float,
+            default=1.0,
+            help="Zipf exponent for how likes concentrate on popular posts (0 = even)",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Processes generating and streaming rows in parallel",
+        )
+
+    def handle(self, *args, **options):
+        seed = options["seed"]
+        self.now = timezone.now()
+
+        fake = Faker()
+        fake.seed_instance(seed)
+        self.sentences = [fake.sentence() for _ in range(SENTENCE_POOL_SIZE)]
+
+        started = time.perf_counter()
+        user_ids = self._create_users(options["users"])
+        last_post_id = Post.objects.order_by("-id").values_list("id", flat=True).first()
+
+        sizes = [
+            min(CHUNK_SIZE, options["posts"] - start)
+            for start in range(0, options["posts"], CHUNK_SIZE)
+        ]
+        self._run_chunks(
+            "posts",
+            _seed_posts,
+            [
+                (seed, chunk, size, user_ids, self.now)
+                for chunk, size in enumerate(sizes)
+            ],
+            options["workers"],
+        )
+
+        posts = list(
+            Post.objects.filter(id__gt=last_post_id or 0)
+            .order_by("id")
+            .values_list("id", "created_at")
+        )
+        self._run_chunks(
+            "comments",
+            _seed_comments,
+            [
+                (seed, chunk, batch, user_ids, options["comments_per_post"], self.now)
+                for chunk, batch in _chunked(posts)
+            ],
+            options["workers"],
+        )
+
+        likes = self._zipf_likes(
+            [post_id for post_id, _ in posts],
+            options["likes_per_post"],
+            options["likes_zipf"],
+            random.Random(f"{seed}:popularity"),
+        )
+        self._run_chunks(
+            "interactions",
+            _seed_interactions,
+            [
+                (seed, chunk, batch, user_ids, self.now)
+                for chunk, batch in _chunked(likes)
+            ],
+            options["workers"],
+        )
+
+        self.stdout.write("Computing denormalized counters...")
+        self._update_counters(last_post_id or 0)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Database seeded successfully in {time.perf_counter() - started:.1f}s!"
+            )
+        )
+
+    def _create_users(self, count):
         self.stdout.write("Creating users...")
-        users = []
-        for i in range(5):
-            user, created = User.objects.get_or_create(
-                username=f"user{i+1}",
-                defaults={
-                    "email": f"user{i+1}@example.com",
-                },
+        password = make_password("password123")
+        usernames = [f"user{i + 1}" for i in range(count)]
+        user_ids = []
+        for _, batch in _chunked(usernames):
+            User.objects.bulk_create(
+                [
+                    User(
+                        username=username,
+                        email=f"{username}@example.com",
+                        password=password,
+                    )
+                    for username in batch
+                ],
+                ignore_conflicts=True,
             )
-            if created:
-                user.set_password("password123")
-                user.save()
-            users.append(user)
-
-        self.stdout.write(self.style.SUCCESS(f"Created {len(users)} users"))
-
-        # Create posts
-        self.stdout.write("Creating posts...")
-        posts = []
-        for i in range(20):
-            post = Post.objects.create(
-                author=random.choice(users),
-                content=fake.text(max_nb_chars=200),
-                image_url=fake.image_url() if random.choice([True, False]) else None,
+            user_ids.extend(
+                User.objects.filter(username__in=batch).values_list("id", flat=True)
             )
-            posts.append(post)
-
-        self.stdout.write(self.style.SUCCESS(f"Created {len(posts)} posts"))
-
-        # Create comments
-        self.stdout.write("Creating comments...")
-        comment_count = 0
-        for post in posts:
-            for _ in range(random.randint(1, 5)):
-                Comment.objects.create(
-                    post=post, author=random.choice(users), content=fake.sentence()
-                )
-                comment_count += 1
-                post.comments_count += 1
-            post.save()
-
-        self.stdout.write(self.style.SUCCESS(f"Created {comment_count} comments"))
-
-        # Create interactions
-        self.stdout.write("Creating interactions...")
-        interaction_count = 0
-        for post in posts:
-            # Random likes
-            like_users = random.sample(users, k=random.randint(1, len(users)))
-            for user in like_users:
-                Interaction.objects.get_or_create(
-                    post=post, user=user, interaction_type="like"
-                )
-                interaction_count += 1
-                post.likes_count += 1
-
-            # Random shares
-            if random.choice([True, False]):
-                share_user = random.choice(users)
-                Interaction.objects.get_or_create(
-                    post=post, user=share_user, interaction_type="share"
-                )
-                interaction_count += 1
-                post.shares_count += 1
-
-            post.save()
+        user_ids.sort()
+        self.stdout.write(self.style.SUCCESS(f"Created {len(user_ids)} users"))
+        return user_ids
+
+    def _zipf_likes(self, post_ids, per_post, exponent, rng):
+        """Assign like counts so popularity follows a Zipf distribution"""
+        ranks = list(range(1, len(post_ids) + 1))
+        rng.shuffle(ranks)
+        weights = [rank**-exponent for rank in ranks]
+        scale = per_post * len(post_ids) / (sum(weights) or 1)
+        return [
+            (post_id, round(weight * scale))
+            for post_id, weight in zip(post_ids, weights)
+            if round(weight * scale) > 0
+        ]
+
+    def _run_chunks(self, label, func, chunks, workers):
+        self.stdout.write(f"Creating {label}...")
+        started = time.perf_counter()
+        if workers > 1 and len(chunks) > 1:
+            # Forked workers must not share the parent's connection
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(self.sentences,),
+            ) as pool:
+                total = sum(pool.map(func, *zip(*chunks)))
+        else:
+            _init_worker(self.sentences)
+            total = sum(func(*chunk) for chunk in chunks)
 
         self.stdout.write(
-            self.style.SUCCESS(f"Created {interaction_count} interactions")
+            self.style.SUCCESS(
+                f"Created {total} {label} in {time.perf_counter() - started:.1f}s"
+            )
         )
-        self.stdout.write(self.style.SUCCESS("✅ Database seeded successfully!"))
+
+    def _update_counters(self, after_id):
+        """Set the seeded posts' counters in one aggregate pass per table"""
+        post_table = Post._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                UPDATE {post_table} AS p
+                SET likes_count = agg.likes, shares_count = agg.shares
+                FROM (
+                    SELECT post_id,
+                        COUNT(*) FILTER (WHERE interaction_type = 'like') AS likes,
+                        COUNT(*) FILTER (WHERE interaction_type = 'share') AS shares
+                    FROM {Interaction._meta.db_table}
+                    WHERE post_id > %s
+                    GROUP BY post_id
+                ) AS agg
+                WHERE p.id = agg.post_id
+                """,
+                [after_id],
+            )
+            cursor.execute(
+                f"""
+                UPDATE {post_table} AS p
+                SET comments_count = agg.comments
+                FROM (
+                    SELECT post_id, COUNT(*) AS comments
+                    FROM {Comment._meta.db_table}
+                    WHERE post_id > %s
+                    GROUP BY post_id
+                ) AS agg
+                WHERE p.id = agg.post_id
+                """,
+                [after_id],
+            )
@@ -0,0 +1,145 @@
+"""
+Prometheus metrics.
+
+Each finished GraphQL trace (see posts.tracing) is exported here, along with
+rate-limit rejections. Under gunicorn, set PROMETHEUS_MULTIPROC_DIR so every
+worker writes its samples to a shared directory; `/metrics/` then merges all
+workers' files. Without it, metrics are kept in this process only.
+"""
+
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from . import db_pools
+
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100, float("inf"))
+
+REQUEST_LATENCY = Histogram(
+    "graphql_operation_duration_seconds",
+    "Time to execute a GraphQL operation",
+    ["operation"],
+)
+DB_QUERIES = Histogram(
+    "graphql_operation_db_queries",
+    "SQL queries run by a GraphQL operation",
+    ["operation"],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total",
+    "CacheManager lookups by key prefix and result",
+    ["prefix", "result"],
+)
+REDIS_ROUND_TRIPS = Counter(
+    "redis_round_trips_total",
+    "Redis round-trips made by CacheManager, by key prefix",
+    ["prefix"],
+)
+RATE_LIMITED = Counter(
+    "rate_limit_rejections_total",
+    "Requests rejected by posts.decorators.rate_limit",
+    ["resolver"],
+)
+MUTATIONS = Counter(
+    "graphql_mutations_total",
+    "Executed mutations by root field and outcome",
+    ["mutation", "status"],
+)
+
+# psycopg pool usage (see posts.db_pools); gauges are summed over live workers
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Pooled database connections by alias and state (in_use, idle)",
+    ["database", "state"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_WAITING = Gauge(
+    "db_pool_requests_waiting",
+    "Requests waiting for a pooled connection",
+    ["database"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKOUTS = Counter(
+    "db_pool_checkouts_total",
+    "Connections handed out by the pools",
+    ["database"],
+)
+DB_POOL_WAIT = Counter(
+    "db_pool_wait_seconds_total",
+    "Time requests spent waiting for a pooled connection",
+    ["database"],
+)
+DB_POOL_CONNECTS = Counter(
+    "db_pool_connects_total",
+    "Connections the pools opened to Postgres",
+    ["database"],
+)
+DB_POOL_CONNECT_TIME = Counter(
+    "db_pool_connect_seconds_total",
+    "Time the pools spent opening connections",
+    ["database"],
+)
+DB_POOL_LOST = Counter(
+    "db_pool_connections_lost_total",
+    "Pooled connections found broken and discarded",
+    ["database"],
+)
+
+
+def observe_db_pools():
+    """Export this worker's pool usage; counters cover the time since the last call"""
+    for alias, pool in db_pools.pools().items():
+        stats = pool.pop_stats()
+        size = stats.get("pool_size", 0)
+        idle = stats.get("pool_available", 0)
+        DB_POOL_CONNECTIONS.labels(alias, "in_use").set(size - idle)
+        DB_POOL_CONNECTIONS.labels(alias, "idle").set(idle)
+        DB_POOL_WAITING.labels(alias).set(stats.get("requests_waiting", 0))
+        DB_POOL_CHECKOUTS.labels(alias).inc(stats.get("requests_num", 0))
+        DB_POOL_WAIT.labels(alias).inc(stats.get("requests_wait_ms", 0) / 1000)
+        DB_POOL_CONNECTS.labels(alias).inc(stats.get("connections_num", 0))
+        DB_POOL_CONNECT_TIME.labels(alias).inc(stats.get("connections_ms", 0) / 1000)
+        DB_POOL_LOST.labels(alias).inc(
+            stats.get("connections_lost", 0) + stats.get("returns_bad", 0)
+        )
+
+
+def observe_trace(trace):
+    """Export a finished trace"""
+    REQUEST_LATENCY.labels(trace.signature).observe(trace.duration)
+    DB_QUERIES.labels(trace.signature).observe(trace.sql_count)
+
+    for prefix, (hits, misses) in trace.cache.items():
+        if hits:
+            CACHE_LOOKUPS.labels(prefix, "hit").inc(hits)
+        if misses:
+            CACHE_LOOKUPS.labels(prefix, "miss").inc(misses)
+    for prefix, count in trace.round_trips.items():
+        REDIS_ROUND_TRIPS.labels(prefix).inc(count)
+
+    if trace.operation_type == "mutation":
+        status = "error" if trace.failed else "ok"
+        for field in trace.root_fields:
+            MUTATIONS.labels(field, status).inc()
+
+    observe_db_pools()
+
+
+def render():
+    """Return (body, content_type) with the samples of every worker"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -1,7 +1,18 @@
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
 from django.db.models import F
 
+# Text search configuration used for the post search vector and queries
+SEARCH_CONFIG = "english"
+
+
+class PostManager(models.Manager):
+    def get_queryset(self):
+        # The search vector is only used inside WHERE / ORDER BY; never load it
+        return super().get_queryset().defer("search_vector")
+
 
 class Post(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="posts")
@@ -16,11 +27,21 @@ class Post(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Maintained by Postgres from `content`
+    search_vector = models.GeneratedField(
+        expression=SearchVector("content", config=SEARCH_CONFIG),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    objects = PostManager()
+
     class Meta:
         ordering = ["-created_at"]
         indexes = [
             models.Index(fields=["-created_at"]),
             models.Index(fields=["author", "-created_at"]),
+            GinIndex(fields=["search_vector"], name="post_search_vector_idx"),
         ]
 
     def __str__(self):
@@ -68,3 +89,20 @@ class Interaction(models.Model):
         indexes = [
             models.Index(fields=["post", "interaction_type"]),
         ]
+
+
+class TimelineEntry(models.Model):
+    """A post delivered to a follower's home timeline (fan-out on write)"""
+
+    owner = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="timeline_entries"
+    )
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="+")
+    # Copy of post.created_at so timelines page on a single index
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ["owner", "post"]
+        indexes = [
+            models.Index(fields=["owner", "-created_at", "-post"]),
+        ]
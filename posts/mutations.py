@@ -1,15 +1,72 @@
 import graphene
+from graphql import GraphQLError
 from graphql_jwt.decorators import login_required
-from django.db.models import F
-from django.db import transaction
+from django.db import connection, transaction
 from .models import Post, Comment, Interaction
 from .types import PostType, CommentType
 from .cache_utils import CacheManager
 from .security import SecurityValidator
 from .decorators import rate_limit
+from .timeline import fan_out_post, fan_out_posts
+from . import counters, pubsub, ranking
 
 # Security: input validation applied to create/update/comment mutations using SecurityValidator
 
+# Most items a bulk mutation accepts
+MAX_BATCH_SIZE = 100
+
+
+def _check_batch(items):
+    if len(items) > MAX_BATCH_SIZE:
+        raise GraphQLError(f"At most {MAX_BATCH_SIZE} items per call")
+
+
+def _insert_interactions(user, post_ids, interaction_type):
+    """Insert the interactions, returning the IDs of the posts that gained one"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {Interaction._meta.db_table}
+                (post_id, user_id, interaction_type, created_at)
+            SELECT post_id, %s, %s, now() FROM unnest(%s::bigint[]) AS post_id
+            ON CONFLICT DO NOTHING
+            RETURNING post_id
+            """,
+            [user.id, interaction_type, post_ids],
+        )
+        return {post_id for post_id, in cursor.fetchall()}
+
+
+def _interact_many(user, post_ids, interaction_type, field):
+    """
+    Add the user's interaction to each post that does not have it yet
+
+    Runs two statements whatever the batch size; unknown posts are skipped.
+    Only rows actually inserted are counted, so a concurrent like of the same
+    post is not counted twice.
+    Returns (posts in request order, posts that gained the interaction).
+    """
+    _check_batch(post_ids)
+    try:
+        post_ids = list(dict.fromkeys(int(post_id) for post_id in post_ids))
+    except ValueError:
+        raise GraphQLError("Invalid post ID")
+
+    found = Post.objects.in_bulk(post_ids)
+    posts = [found[post_id] for post_id in post_ids if post_id in found]
+    inserted = _insert_interactions(user, list(found), interaction_type)
+    added = [post for post in posts if post.id in inserted]
+
+    counters.increment_many([post.id for post in added], field)
+    ranking.record_many(added, field)
+    pubsub.publish_counters(added)
+    return posts, added
+
+
+class PostInput(graphene.InputObjectType):
+    content = graphene.String(required=True)
+    image_url = graphene.String()
+
 
 class CreatePost(graphene.Mutation):
     """Create a new post"""
@@ -36,6 +93,9 @@ class CreatePost(graphene.Mutation):
         post = Post.objects.create(
             author=user, content=content.strip(), image_url=image_url
         )
+        fan_out_post(post)
+        ranking.add(post)
+        pubsub.publish_posts_created([post])
 
         # Invalidate caches
         CacheManager.invalidate_posts_lists()
@@ -84,6 +144,7 @@ class UpdatePost(graphene.Mutation):
         # Invalidate caches
         CacheManager.invalidate_post(post_id)
         CacheManager.invalidate_posts_lists()
+        CacheManager.invalidate_user_posts(post.author_id)
 
         return UpdatePost(post=post)
 
@@ -112,6 +173,7 @@ class DeletePost(graphene.Mutation):
 
         author_id = post.author_id
         post.delete()
+        ranking.remove(int(post_id))
 
         # Invalidate caches
         CacheManager.invalidate_post(post_id)
@@ -142,7 +204,7 @@ class CreateComment(graphene.Mutation):
             raise Exception("Comment too long (max 1000 characters)")
 
         try:
-            post = Post.objects.get(pk=post_id)
+            post = Post.objects.select_related("author").get(pk=post_id)
         except Post.DoesNotExist:
             raise Exception("Post not found")
 
@@ -151,8 +213,11 @@ class CreateComment(graphene.Mutation):
             post=post, author=user, content=content.strip()
         )
 
-        # Update post comment count atomically
-        Post.objects.filter(pk=post_id).update(comments_count=F("comments_count") + 1)
+        # Update post comment count (write-behind) and drop its cached top comments
+        counters.increment(post.id, "comments_count", 1)
+        ranking.record(post, "comments_count", 1)
+        pubsub.publish_comment_added(comment)
+        CacheManager.invalidate_post(post_id)
 
         return CreateComment(comment=comment)
 
@@ -183,8 +248,11 @@ class DeleteComment(graphene.Mutation):
         post_id = comment.post.id
         comment.delete()
 
-        # Update post comment count
-        Post.objects.filter(pk=post_id).update(comments_count=F("comments_count") - 1)
+        # Update post comment count (write-behind) and drop its cached top comments
+        counters.increment(post_id, "comments_count", -1)
+        ranking.record(comment.post, "comments_count", -1)
+        pubsub.publish_counters([comment.post])
+        CacheManager.invalidate_post(post_id)
 
         return DeleteComment(success=True, message="Comment deleted successfully")
 
@@ -214,19 +282,21 @@ class LikePost(graphene.Mutation):
             post=post, user=user, interaction_type="like"
         )
 
+        # Counters are write-behind: the post row is not locked, and cached
+        # copies stay valid because readers add the pending delta
         if created:
             # New like
-            Post.objects.filter(pk=post_id).update(likes_count=F("likes_count") + 1)
+            counters.increment(post.id, "likes_count", 1)
+            ranking.record(post, "likes_count", 1)
             liked = True
         else:
             # Unlike
             interaction.delete()
-            Post.objects.filter(pk=post_id).update(likes_count=F("likes_count") - 1)
+            counters.increment(post.id, "likes_count", -1)
+            ranking.record(post, "likes_count", -1)
             liked = False
+        pubsub.publish_counters([post])
 
-        post.refresh_from_db()
-        # Invalidate post cache
-        CacheManager.invalidate_post(post_id)
         return LikePost(post=post, liked=liked)
 
 
@@ -256,18 +326,111 @@ class SharePost(graphene.Mutation):
 
         if created:
             # New share
-            Post.objects.filter(pk=post_id).update(shares_count=F("shares_count") + 1)
+            counters.increment(post.id, "shares_count", 1)
+            ranking.record(post, "shares_count", 1)
             shared = True
         else:
             # Unshare
             interaction.delete()
-            Post.objects.filter(pk=post_id).update(shares_count=F("shares_count") - 1)
+            counters.increment(post.id, "shares_count", -1)
+            ranking.record(post, "shares_count", -1)
             shared = False
+        pubsub.publish_counters([post])
 
-        post.refresh_from_db()
         return SharePost(post=post, shared=shared)
 
 
+class CreatePosts(graphene.Mutation):
+    """Create several posts at once, e.g. when syncing offline drafts"""
+
+    posts = graphene.List(PostType)
+
+    class Arguments:
+        inputs = graphene.List(graphene.NonNull(PostInput), required=True)
+
+    @login_required
+    @rate_limit(
+        group="create_posts", rate="300/h", cost=lambda info, inputs: len(inputs)
+    )
+    @transaction.atomic
+    def mutate(self, info, inputs):
+        user = info.context.user
+        _check_batch(inputs)
+        if not inputs:
+            return CreatePosts(posts=[])
+        contents = SecurityValidator.validate_contents(item.content for item in inputs)
+
+        posts = []
+        for index, (item, content) in enumerate(zip(inputs, contents)):
+            if len(content) > 5000:
+                raise GraphQLError(
+                    "Post content too long (max 5000 characters)",
+                    extensions={"index": index},
+                )
+            try:
+                image_url = SecurityValidator.validate_url(item.image_url)
+            except GraphQLError as e:
+                raise GraphQLError(e.message, extensions={"index": index})
+            posts.append(
+                Post(author=user, content=content.strip(), image_url=image_url)
+            )
+        if not posts:
+            return CreatePosts(posts=[])
+
+        posts = Post.objects.bulk_create(posts)
+        fan_out_posts(posts)
+        ranking.add_many(posts)
+        pubsub.publish_posts_created(posts)
+
+        # Invalidate caches
+        CacheManager.invalidate_posts_lists()
+        CacheManager.invalidate_user_posts(user.id)
+
+        return CreatePosts(posts=posts)
+
+
+class LikePosts(graphene.Mutation):
+    """Like several posts at once; posts already liked stay liked"""
+
+    posts = graphene.List(PostType)
+    liked = graphene.List(graphene.ID, description="Posts this call liked")
+
+    class Arguments:
+        post_ids = graphene.List(graphene.NonNull(graphene.ID), required=True)
+
+    @login_required
+    @rate_limit(
+        group="like_posts", rate="1200/h", cost=lambda info, post_ids: len(post_ids)
+    )
+    @transaction.atomic
+    def mutate(self, info, post_ids):
+        posts, liked = _interact_many(
+            info.context.user, post_ids, "like", "likes_count"
+        )
+        return LikePosts(posts=posts, liked=[post.id for post in liked])
+
+
+class SharePosts(graphene.Mutation):
+    """Share several posts at once; posts already shared stay shared"""
+
+    posts = graphene.List(PostType)
+    shared = graphene.List(graphene.ID, description="Posts this call shared")
+
+    class Arguments:
+        post_ids = graphene.List(graphene.NonNull(graphene.ID), required=True)
+
+    @login_required
+    @rate_limit(
+        group="share_posts", rate="1200/h", cost=lambda info, post_ids: len(post_ids)
+    )
+    @transaction.atomic
+    def mutate(self, info, post_ids):
+        posts, shared = _interact_many(
+            info.context.user, post_ids, "share", "shares_count"
+        )
+        return SharePosts(posts=posts, shared=[post.id for post in shared])
+
+
 class Mutation(graphene.ObjectType):
     create_post = CreatePost.Field()
     update_post = UpdatePost.Field()
@@ -276,3 +439,6 @@ class Mutation(graphene.ObjectType):
     delete_comment = DeleteComment.Field()
     like_post = LikePost.Field()
     share_post = SharePost.Field()
+    create_posts = CreatePosts.Field()
+    like_posts = LikePosts.Field()
+    share_posts = SharePosts.Field()
@@ -0,0 +1,58 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+from graphql import GraphQLError
+
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(post):
+    """Build an opaque cursor from a post's (created_at, id) sort key"""
+    raw = f"{post.created_at.isoformat()}|{post.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Turn a cursor back into its (created_at, id) sort key"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, post_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(post_id)
+    except (ValueError, UnicodeDecodeError):
+        raise GraphQLError("Invalid cursor")
+
+
+def check_page(page, per_page):
+    """Reject offset pages outside 1.. and page sizes over MAX_PAGE_SIZE"""
+    if page < 1:
+        raise GraphQLError("page must be 1 or more")
+    if per_page < 1 or per_page > MAX_PAGE_SIZE:
+        raise GraphQLError(f"perPage must be between 1 and {MAX_PAGE_SIZE}")
+
+
+def keyset_page(qs, first, after=None, key=("created_at", "id")):
+    """
+    Return (rows, has_next_page) for the page following `after`.
+
+    Seeks past the cursor with a WHERE on the (created_at, id) `key` fields
+    instead of OFFSET, so the cost of a page does not grow with how deep the
+    client has scrolled.
+    """
+    if first < 1 or first > MAX_PAGE_SIZE:
+        raise GraphQLError(f"first must be between 1 and {MAX_PAGE_SIZE}")
+
+    time_field, id_field = key
+    qs = qs.order_by(f"-{time_field}", f"-{id_field}")
+    if after:
+        created_at, post_id = decode_cursor(after)
+        # The redundant `created_at <= ...` bound lets Postgres drive the seek
+        # from the created_at index; the OR alone would not be sargable.
+        qs = qs.filter(**{f"{time_field}__lte": created_at}).filter(
+            Q(**{f"{time_field}__lt": created_at})
+            | Q(**{time_field: created_at, f"{id_field}__lt": post_id})
+        )
+
+    # Fetch one extra row to learn whether another page exists
+    rows = list(qs[: first + 1])
+    return rows[:first], len(rows) > first
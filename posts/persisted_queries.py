@@ -0,0 +1,134 @@
+"""
+Automatic persisted queries (APQ) and the parsed-document cache.
+
+Clients following the Apollo APQ protocol send
+`extensions.persistedQuery.sha256Hash` instead of the query text. The text is
+registered in Redis the first time a client sends it along with its hash, so
+every worker can serve it afterwards. Each worker also keeps an LRU of parsed
+and validated documents keyed by hash, so a known query skips parsing and
+validation altogether, persisted or not.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from graphql import GraphQLError
+
+from . import async_cache, tracing
+
+PREFIX = "persisted_query"
+REGISTRY_TIMEOUT = 60 * 60 * 24 * 7  # 7 days
+
+NOT_FOUND = "PersistedQueryNotFound"
+NOT_SUPPORTED = "PersistedQueryNotSupported"
+
+
+def query_hash(query):
+    """Hex sha256 of the query text, as computed by APQ clients"""
+    return hashlib.sha256(query.encode()).hexdigest()
+
+
+def requested_hash(request, data):
+    """
+    The sha256 hash from a request's `persistedQuery` extension, or None
+
+    Raises GraphQLError for extensions that are not valid APQ.
+    """
+    extensions = request.GET.get("extensions") or data.get("extensions")
+    if not extensions:
+        return None
+    if isinstance(extensions, str):
+        try:
+            extensions = json.loads(extensions)
+        except ValueError:
+            raise GraphQLError("Extensions are invalid JSON.")
+
+    persisted = (
+        extensions.get("persistedQuery") if isinstance(extensions, dict) else None
+    )
+    if persisted is None:
+        return None
+    if not isinstance(persisted, dict) or persisted.get("version") != 1:
+        raise GraphQLError(
+            NOT_SUPPORTED, extensions={"code": "PERSISTED_QUERY_NOT_SUPPORTED"}
+        )
+
+    sha256 = persisted.get("sha256Hash")
+    if not isinstance(sha256, str) or len(sha256) != 64:
+        raise GraphQLError("Invalid persisted query hash.")
+    return sha256.lower()
+
+
+def check_hash(sha256, query):
+    """Raise GraphQLError unless `sha256` is the hash of `query`"""
+    if query_hash(query) != sha256:
+        raise GraphQLError("Provided sha256Hash does not match query.")
+
+
+def not_found():
+    """The error APQ clients answer by resending the hash with the query text"""
+    return GraphQLError(NOT_FOUND, extensions={"code": "PERSISTED_QUERY_NOT_FOUND"})
+
+
+def _key(sha256):
+    return f"{PREFIX}:{sha256}"
+
+
+def lookup(sha256):
+    """The registered query text for a hash, or None"""
+    query = cache.get(_key(sha256))
+    tracing.record_cache(PREFIX, query is not None, query is None)
+    return query
+
+
+def register(sha256, query):
+    cache.set(_key(sha256), query, REGISTRY_TIMEOUT)
+    tracing.record_round_trip(PREFIX)
+
+
+async def alookup(sha256):
+    query = await async_cache.get(_key(sha256))
+    tracing.record_cache(PREFIX, query is not None, query is None)
+    return query
+
+
+async def aregister(sha256, query):
+    await async_cache.set(_key(sha256), query, REGISTRY_TIMEOUT)
+    tracing.record_round_trip(PREFIX)
+
+
+class DocumentCache:
+    """Thread-safe LRU of parsed and validated documents"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            document = self._documents.get(key)
+            if document is not None:
+                self._documents.move_to_end(key)
+            return document
+
+    def set(self, key, document):
+        with self._lock:
+            self._documents[key] = document
+            self._documents.move_to_end(key)
+            while len(self._documents) > self.maxsize:
+                self._documents.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._documents.clear()
+
+    def __len__(self):
+        return len(self._documents)
+
+
+documents = DocumentCache(getattr(settings, "GRAPHQL_DOCUMENT_CACHE_SIZE", 1000))
@@ -0,0 +1,194 @@
+"""
+Redis pub/sub for GraphQL subscriptions.
+
+Mutations publish once their transaction commits. Each event loop (one per
+ASGI worker) holds a single Redis subscriber connection shared by all of its
+sockets: a channel is subscribed in Redis while at least one local listener
+wants it, and every message is decoded once and handed to each listener.
+"""
+
+import asyncio
+import json
+import logging
+import weakref
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+from django_redis import get_redis_connection
+from redis.exceptions import ConnectionError
+
+from . import async_cache, counters
+from .cache_utils import cache_comment_data, cache_post_data
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "pubsub"
+
+POST_CREATED = "post_created"
+
+# Events a slow listener may fall behind by; older ones are dropped
+LISTENER_QUEUE_SIZE = 100
+
+# Seconds the reader waits for a message before checking for listeners
+READ_TIMEOUT = 1.0
+
+# Seconds before retrying after losing the Redis connection
+RECONNECT_DELAY = 1.0
+
+
+def post_counters_channel(post_id):
+    return f"post_counters:{post_id}"
+
+
+def comment_added_channel(post_id):
+    return f"comment_added:{post_id}"
+
+
+def _channel(name):
+    return cache.make_key(f"{PREFIX}:{name}")
+
+
+def _client():
+    return get_redis_connection("default")
+
+
+def _counts(posts):
+    """{post_id: {field: stored + pending}} for posts, in one round-trip"""
+    pending = counters.pending_many([post.id for post in posts])
+    return {
+        post.id: {
+            field: getattr(post, field) + pending.get(post.id, {}).get(field, 0)
+            for field in counters.FIELDS
+        }
+        for post in posts
+    }
+
+
+def _publish(messages):
+    """PUBLISH (channel name, payload) pairs in one round-trip"""
+    pipe = _client().pipeline(transaction=False)
+    for name, payload in messages:
+        pipe.publish(_channel(name), json.dumps(payload))
+    pipe.execute()
+
+
+def publish_posts_created(posts):
+    """Announce new posts once the current transaction commits"""
+    posts = list(posts)
+    if posts:
+        transaction.on_commit(
+            lambda: _publish((POST_CREATED, cache_post_data(post)) for post in posts)
+        )
+
+
+def publish_counters(posts):
+    """Announce the current counters of posts once the transaction commits"""
+    posts = list(posts)
+    if not posts:
+        return
+
+    def apply():
+        _publish(
+            (post_counters_channel(post_id), {"id": post_id, **counts})
+            for post_id, counts in _counts(posts).items()
+        )
+
+    transaction.on_commit(apply)
+
+
+def publish_comment_added(comment):
+    """Announce a new comment, and its post's counters, once the transaction commits"""
+
+    def apply():
+        post = comment.post
+        counts = _counts([post])[post.id]
+        _publish(
+            [
+                (
+                    comment_added_channel(post.id),
+                    {
+                        "post": {**cache_post_data(post), **counts},
+                        "comment": cache_comment_data(comment),
+                    },
+                ),
+                (post_counters_channel(post.id), {"id": post.id, **counts}),
+            ]
+        )
+
+    transaction.on_commit(apply)
+
+
+class Broker:
+    """Listeners of one event loop, sharing one Redis subscriber connection"""
+
+    def __init__(self, client):
+        self._pubsub = client.pubsub(ignore_subscribe_messages=True)
+        self._listeners = defaultdict(set)
+        self._reader = None
+
+    def __len__(self):
+        """Number of channels with local listeners"""
+        return len(self._listeners)
+
+    async def subscribe(self, name):
+        """Start listening on a channel; returns the queue its events arrive on"""
+        channel = _channel(name)
+        queue = asyncio.Queue(maxsize=LISTENER_QUEUE_SIZE)
+        listeners = self._listeners[channel]
+        listeners.add(queue)
+        if len(listeners) == 1:
+            await self._pubsub.subscribe(channel)
+            # Only read once SUBSCRIBE has opened the connection
+            if self._reader is None or self._reader.done():
+                self._reader = asyncio.create_task(self._read())
+        return queue
+
+    async def unsubscribe(self, name, queue):
+        channel = _channel(name)
+        listeners = self._listeners.get(channel)
+        if listeners is None:
+            return
+        listeners.discard(queue)
+        if not listeners:
+            del self._listeners[channel]
+            await self._pubsub.unsubscribe(channel)
+
+    async def _read(self):
+        while self._listeners:
+            try:
+                message = await self._pubsub.get_message(timeout=READ_TIMEOUT)
+            except ConnectionError:
+                # The client resubscribes every channel when it reconnects
+                logger.warning("Lost the pub/sub connection; retrying")
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+            if message is None or message["type"] != "message":
+                continue
+
+            payload = json.loads(message["data"])
+            for queue in list(self._listeners.get(message["channel"].decode(), ())):
+                if queue.full():
+                    queue.get_nowait()
+                queue.put_nowait(payload)
+
+
+_brokers = weakref.WeakKeyDictionary()
+
+
+def broker():
+    """The broker for the running event loop"""
+    loop = asyncio.get_running_loop()
+    if loop not in _brokers:
+        _brokers[loop] = Broker(async_cache.client())
+    return _brokers[loop]
+
+
+async def listen(name):
+    """Yield the payloads published on a channel, for as long as the caller iterates"""
+    queue = await broker().subscribe(name)
+    try:
+        while True:
+            yield await queue.get()
+    finally:
+        await broker().unsubscribe(name, queue)
@@ -1,8 +1,163 @@
 import graphene
-from django.db.models import Q, Prefetch, Case, When
-from .types import PostType
-from .models import Post, Comment
-from .cache_utils import CacheManager, cache_post_data
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.db.models import Case, When
+from graphql_jwt.decorators import login_required
+from graphql import GraphQLError
+from . import counters, ranking, replicas
+from .types import PostType, PostConnection, PostSort, SearchMode
+from .models import Post
+from .cache_utils import (
+    CacheManager,
+    cache_post_data,
+    cache_post_fragment,
+    hydrate_comment,
+    hydrate_post,
+)
+from .loaders import get_loaders
+from .pagination import check_page, keyset_page, encode_cursor
+from .timeline import home_feed_page
+from .search import search_posts
+
+
+def _materialized_feed_page(loaders, page, per_page):
+    """
+    Serve an unfiltered feed page from cached rows.
+
+    A hit is served with no SQL at all. On a miss only the page's IDs are
+    queried; each post's fragment (fields, author, top comments) comes from
+    its own cache entry, so an edit to one post rebuilds just that fragment.
+    Only one worker rebuilds a missing or expiring page; the others serve the
+    stale page or wait for it.
+    """
+    fragments = CacheManager.get_or_compute_feed_page(
+        page, per_page, lambda: _build_feed_page(loaders, page, per_page)
+    )
+    return _hydrate_feed_page(loaders, fragments)
+
+
+def _build_feed_page(loaders, page, per_page):
+    """Query a feed page's IDs and its uncached fragments"""
+    start = (page - 1) * per_page
+    end = start + per_page
+    post_ids = list(Post.objects.values_list("id", flat=True)[start:end])
+
+    cached = CacheManager.get_post_fragments(post_ids)
+    missing = [post_id for post_id in post_ids if post_id not in cached]
+    if missing:
+        loaders.comments_by_post.expect(missing)
+        rebuilt = [
+            cache_post_fragment(post, loaders.comments_by_post.load(post.id))
+            for post in Post.objects.filter(id__in=missing).select_related("author")
+        ]
+        CacheManager.set_post_fragments(rebuilt)
+        cached.update((fragment["post"]["id"], fragment) for fragment in rebuilt)
+
+    return [cached[post_id] for post_id in post_ids if post_id in cached]
+
+
+def _hydrate_feed_page(loaders, fragments):
+    posts = []
+    for fragment in fragments:
+        post = hydrate_post(fragment["post"])
+        loaders.comments_by_post.prime(
+            post.id, [hydrate_comment(data, post) for data in fragment["comments"]]
+        )
+        posts.append(post)
+    loaders.expect_posts(posts)
+    return posts
+
+
+def _posts_in_order(post_ids):
+    """Posts with the given IDs, in the order of the IDs"""
+    # Preserve order using CASE WHEN
+    preserved_order = Case(*[When(pk=pk, then=pos) for pos, pk in enumerate(post_ids)])
+    return (
+        Post.objects.filter(id__in=post_ids)
+        .select_related("author")
+        .order_by(preserved_order)
+    )
+
+
+def _assemble(post_ids, cached, loaded):
+    """Posts in post_ids order from loaded rows or cached data; gone ones are skipped"""
+    posts = []
+    for post_id in post_ids:
+        if post_id in loaded:
+            posts.append(loaded[post_id])
+        elif post_id in cached:
+            posts.append(hydrate_post(cached[post_id]))
+    return posts
+
+
+def _cached_posts(post_ids):
+    """
+    Posts with the given IDs, in order, assembled from their cache entries.
+
+    All entries are fetched in one round-trip; only the misses are read from
+    the database, with a single id__in query, and cached for the next page.
+    """
+    cached = CacheManager.get_posts_many(post_ids)
+    loaded = {}
+    missing = [post_id for post_id in post_ids if post_id not in cached]
+    if missing:
+        with replicas.primary():
+            loaded = {
+                post.id: post
+                for post in Post.objects.filter(id__in=missing).select_related("author")
+            }
+        CacheManager.set_posts_many(cache_post_data(post) for post in loaded.values())
+    return _assemble(post_ids, cached, loaded)
+
+
+async def _acached_posts(post_ids):
+    """Async _cached_posts"""
+    cached = await CacheManager.aget_posts_many(post_ids)
+    loaded = {}
+    missing = [post_id for post_id in post_ids if post_id not in cached]
+    if missing:
+        with replicas.primary():
+            loaded = {
+                post.id: post
+                async for post in Post.objects.filter(id__in=missing).select_related(
+                    "author"
+                )
+            }
+        await CacheManager.aset_posts_many(
+            cache_post_data(post) for post in loaded.values()
+        )
+    return _assemble(post_ids, cached, loaded)
+
+
+def _ranked_page(sort, page, per_page):
+    """A page of a ranked feed; posts deleted since they were ranked are skipped"""
+    post_ids = ranking.page_ids(sort, page, per_page)
+    if not post_ids:
+        return []
+    return list(_posts_in_order(post_ids))
+
+
+async def _aprime_counters(loaders, posts):
+    """Prefetch pending counter deltas without blocking the event loop"""
+    post_ids = [post.id for post in posts]
+    if not post_ids:
+        return
+    pending = await counters.apending_many(post_ids)
+    for post_id in post_ids:
+        loaders.pending_counters.prime(post_id, pending.get(post_id, {}))
+
+
+def _post_connection(posts, has_next_page, after):
+    edges = [
+        PostConnection.Edge(node=post, cursor=encode_cursor(post)) for post in posts
+    ]
+    page_info = graphene.relay.PageInfo(
+        has_next_page=has_next_page,
+        has_previous_page=after is not None,
+        start_cursor=edges[0].cursor if edges else None,
+        end_cursor=edges[-1].cursor if edges else None,
+    )
+    return PostConnection(edges=edges, page_info=page_info)
 
 
 class Query(graphene.ObjectType):
@@ -12,144 +167,156 @@ class Query(graphene.ObjectType):
         per_page=graphene.Int(default_value=10),
         user_id=graphene.Int(required=False),
         search=graphene.String(required=False),
+        search_mode=SearchMode(default_value=SearchMode.FULL_TEXT.value),
+        sort=PostSort(default_value=PostSort.NEW.value),
+    )
+    posts_connection = graphene.Field(
+        PostConnection,
+        first=graphene.Int(default_value=10),
+        after=graphene.String(required=False),
+    )
+    home_feed = graphene.Field(
+        PostConnection,
+        first=graphene.Int(default_value=10),
+        after=graphene.String(required=False),
     )
     post = graphene.Field(PostType, id=graphene.ID(required=True))
     user_posts = graphene.List(PostType, user_id=graphene.ID(required=True))
     me = graphene.Field("posts.types.UserType")
     user = graphene.Field("posts.types.UserType", id=graphene.ID(required=True))
 
-    def resolve_posts(self, info, page=1, per_page=10, user_id=None, search=None):
+    def resolve_posts(
+        self,
+        info,
+        page=1,
+        per_page=10,
+        user_id=None,
+        search=None,
+        search_mode=SearchMode.FULL_TEXT.value,
+        sort=PostSort.NEW.value,
+    ):
         """
         Fetch posts with caching and optimized queries
         """
-        # Try cache first
-        cached = CacheManager.get_posts_list(page, per_page, user_id, search)
-        if cached:
-            post_ids = cached
-            # Preserve order using CASE WHEN
-            preserved_order = Case(
-                *[When(pk=pk, then=pos) for pos, pk in enumerate(post_ids)]
-            )
-            posts_qs = (
-                Post.objects.filter(id__in=post_ids)
-                .select_related("author")
-                .prefetch_related(
-                    Prefetch(
-                        "comments",
-                        queryset=Comment.objects.select_related("author").order_by(
-                            "-created_at"
-                        ),
-                    )
-                )
-                .order_by(preserved_order)
-            )
+        check_page(page, per_page)
+        loaders = get_loaders(info)
+        start = (page - 1) * per_page
+        end = start + per_page
 
-            posts = list(posts_qs)
-            # If cache refers to posts that no longer exist (stale cache), invalidate and fallthrough
-            if not posts:
-                CacheManager.invalidate_posts_lists()
-            else:
-                return posts
-
-        # Build optimized query
-        # Avoid slicing a queryset before applying additional filters — instead
-        # order comments here and limit them later if necessary when serializing.
-        qs = Post.objects.select_related("author").prefetch_related(
-            Prefetch(
-                "comments",
-                queryset=Comment.objects.select_related("author").order_by(
-                    "-created_at"
-                ),
-            )
-        )
+        # Ranked feeds are read from their precomputed Redis rankings
+        if sort != PostSort.NEW.value:
+            if user_id or search:
+                raise GraphQLError("sort cannot be combined with userId or search")
+            posts = _ranked_page(sort, page, per_page)
+            loaders.expect_posts(posts)
+            return posts
+
+        # Search runs on the GIN index and is not cached: a list per search
+        # term filled Redis with keys that were rarely read twice.
+        if search:
+            qs = Post.objects.select_related("author")
+            if user_id:
+                qs = qs.filter(author_id=user_id)
+            posts = list(search_posts(qs, search, search_mode)[start:end])
+            loaders.expect_posts(posts)
+            return posts
+
+        # Hot feed pages are cached as full rows
+        if CacheManager.is_materialized(page, user_id):
+            return _materialized_feed_page(loaders, page, per_page)
+
+        # Build optimized query. Comments and interactions are not prefetched
+        # here; the request's loaders batch them only if the query selects them.
+        qs = Post.objects.select_related("author")
 
         # Filters
         if user_id:
             qs = qs.filter(author_id=user_id)
 
-        if search:
-            qs = qs.filter(Q(content__icontains=search))
-
-        # Pagination
-        start = (page - 1) * per_page
-        end = start + per_page
+        fetched = []
 
-        posts = list(qs[start:end])
+        def fetch_ids():
+            fetched.extend(qs[start:end])
+            # Later pages are assembled from these entries
+            CacheManager.set_posts_many(cache_post_data(post) for post in fetched)
+            return [post.id for post in fetched]
 
-        # Cache post IDs
-        post_ids = [post.id for post in posts]
-        CacheManager.set_posts_list(post_ids, page, per_page, user_id, search)
+        # Cached post IDs; on a miss only one worker runs the page query
+        post_ids = CacheManager.get_or_compute_posts_list(
+            page, per_page, fetch_ids, user_id
+        )
+        posts = fetched
+        if not fetched and post_ids:
+            posts = _cached_posts(post_ids)
+            # If cache refers to posts that no longer exist (stale cache), invalidate and rebuild
+            if not posts:
+                CacheManager.invalidate_posts_lists()
+                if user_id:
+                    CacheManager.invalidate_user_posts(user_id)
+                CacheManager.get_or_compute_posts_list(
+                    page, per_page, fetch_ids, user_id
+                )
+                posts = fetched
 
+        loaders.expect_posts(posts)
         return posts
 
+    def resolve_posts_connection(self, info, first=10, after=None):
+        """
+        Cursor-paginated feed (keyset on created_at, id)
+        """
+        qs = Post.objects.select_related("author")
+        posts, has_next_page = keyset_page(qs, first, after)
+        get_loaders(info).expect_posts(posts)
+        return _post_connection(posts, has_next_page, after)
+
+    @login_required
+    def resolve_home_feed(self, info, first=10, after=None):
+        """
+        Posts from followed users (and the viewer), newest first
+        """
+        posts, has_next_page = home_feed_page(info.context.user, first, after)
+        get_loaders(info).expect_posts(posts)
+        return _post_connection(posts, has_next_page, after)
+
     def resolve_post(self, info, id):
         """
         Fetch single post with caching
         """
-        # Try cache first
-        cached = CacheManager.get_post(id)
-        if cached:
-            # Reconstruct from cache (simplified)
+        # Comments are not part of the cached payload; the comments loader
+        # fetches them only if the query selects them.
+        fetched = []
+
+        def fetch():
             try:
-                return (
-                    Post.objects.select_related("author")
-                    .prefetch_related(
-                        Prefetch(
-                            "comments",
-                            queryset=Comment.objects.select_related("author"),
-                        )
-                    )
-                    .get(pk=id)
-                )
+                fetched.append(Post.objects.select_related("author").get(pk=id))
             except Post.DoesNotExist:
-                CacheManager.invalidate_post(id)
                 return None
+            return cache_post_data(fetched[0])
 
-        # Fetch with optimized query
-        try:
-            post = (
-                Post.objects.select_related("author")
-                .prefetch_related(
-                    Prefetch(
-                        "comments", queryset=Comment.objects.select_related("author")
-                    ),
-                    "interactions__user",
-                )
-                .get(pk=id)
-            )
-
-            # Cache it
-            CacheManager.set_post(id, cache_post_data(post))
-            return post
-        except Post.DoesNotExist:
-            return None
+        cached = CacheManager.get_or_compute_post(id, fetch)
+        if fetched:
+            return fetched[0]
+        return hydrate_post(cached) if cached else None
 
     def resolve_user_posts(self, info, user_id):
         """
         Fetch user posts with caching
         """
-        cached = CacheManager.get_user_posts(user_id)
-        if cached:
-            post_ids = cached
-            preserved_order = Case(
-                *[When(pk=pk, then=pos) for pos, pk in enumerate(post_ids)]
-            )
-            return (
-                Post.objects.filter(id__in=post_ids)
-                .select_related("author")
-                .order_by(preserved_order)
-            )
-
-        posts = list(
-            Post.objects.filter(author_id=user_id)
-            .select_related("author")
-            .prefetch_related("comments__author")
-        )
+        fetched = []
 
-        # Cache post IDs
-        post_ids = [post.id for post in posts]
-        CacheManager.set_user_posts(user_id, post_ids)
+        def fetch_ids():
+            fetched.extend(
+                Post.objects.filter(author_id=user_id).select_related("author")
+            )
+            CacheManager.set_posts_many(cache_post_data(post) for post in fetched)
+            return [post.id for post in fetched]
 
+        post_ids = CacheManager.get_or_compute_user_posts(user_id, fetch_ids)
+        posts = fetched
+        if not fetched and post_ids:
+            posts = _cached_posts(post_ids)
+        get_loaders(info).expect_posts(posts)
         return posts
 
     def resolve_me(self, info):
@@ -161,9 +328,129 @@ class Query(graphene.ObjectType):
 
     def resolve_user(self, info, id):
         """Get user by ID"""
-        from django.contrib.auth.models import User
+        try:
+            return get_loaders(info).user.load(int(id))
+        except ValueError:
+            return None
+
+
+class AsyncQuery(Query):
+    """
+    Query with async resolvers for the hot read fields, used by the async view.
+
+    Cache reads go through the async Redis client and database reads through
+    the async ORM, so independent top-level fields (`me`, `posts`, `user`)
+    resolve concurrently. Cache misses on later `posts` pages rebuild the
+    cache on the sync path; other fields keep their sync resolvers. The
+    materialized first page, `post` and `userPosts` take their cache leases
+    asynchronously, so waiting on another worker's lease does not block the
+    event loop. `postsConnection` and `homeFeed` run on the sync thread and
+    then prefetch their posts' pending counters asynchronously.
+    """
+
+    async def resolve_posts(
+        self,
+        info,
+        page=1,
+        per_page=10,
+        user_id=None,
+        search=None,
+        search_mode=SearchMode.FULL_TEXT.value,
+        sort=PostSort.NEW.value,
+    ):
+        check_page(page, per_page)
+        loaders = get_loaders(info)
+        posts = None
+        # Search and ranked feeds are served by the sync path
+        cached_list = not search and sort == PostSort.NEW.value
+        if cached_list and CacheManager.is_materialized(page, user_id):
+            fragments = await CacheManager.aget_or_compute_feed_page(
+                page,
+                per_page,
+                sync_to_async(lambda: _build_feed_page(loaders, page, per_page)),
+            )
+            posts = _hydrate_feed_page(loaders, fragments)
+        elif cached_list:
+            cached = await CacheManager.aget_posts_list(page, per_page, user_id)
+            if cached:
+                posts = await _acached_posts(cached)
+                loaders.expect_posts(posts)
+
+        if not posts:
+            posts = await sync_to_async(Query.resolve_posts)(
+                self, info, page, per_page, user_id, search, search_mode, sort
+            )
+        await _aprime_counters(loaders, posts)
+        return posts
+
+    async def resolve_posts_connection(self, info, first=10, after=None):
+        connection = await sync_to_async(Query.resolve_posts_connection)(
+            self, info, first, after
+        )
+        posts = [edge.node for edge in connection.edges]
+        await _aprime_counters(get_loaders(info), posts)
+        return connection
+
+    async def resolve_home_feed(self, info, first=10, after=None):
+        connection = await sync_to_async(Query.resolve_home_feed)(
+            self, info, first, after
+        )
+        posts = [edge.node for edge in connection.edges]
+        await _aprime_counters(get_loaders(info), posts)
+        return connection
+
+    async def resolve_post(self, info, id):
+        fetched = []
+
+        async def fetch():
+            try:
+                fetched.append(await Post.objects.select_related("author").aget(pk=id))
+            except Post.DoesNotExist:
+                return None
+            return cache_post_data(fetched[0])
+
+        cached = await CacheManager.aget_or_compute_post(id, fetch)
+        if fetched:
+            post = fetched[0]
+        elif cached:
+            post = hydrate_post(cached)
+        else:
+            return None
+
+        await _aprime_counters(get_loaders(info), [post])
+        return post
+
+    async def resolve_user_posts(self, info, user_id):
+        # Waiting on another worker's lease must not block the event loop
+        fetched = []
+
+        async def fetch_ids():
+            qs = Post.objects.filter(author_id=user_id).select_related("author")
+            fetched.extend([post async for post in qs])
+            await CacheManager.aset_posts_many(
+                cache_post_data(post) for post in fetched
+            )
+            return [post.id for post in fetched]
+
+        post_ids = await CacheManager.aget_or_compute_user_posts(user_id, fetch_ids)
+        posts = fetched
+        if not fetched and post_ids:
+            posts = await _acached_posts(post_ids)
+        loaders = get_loaders(info)
+        loaders.expect_posts(posts)
+        await _aprime_counters(loaders, posts)
+        return posts
+
+    async def resolve_me(self, info):
+        # AsyncGraphQLView resolves the user before execution
+        user = info.context.user
+        return user if user.is_authenticated else None
 
+    async def resolve_user(self, info, id):
         try:
-            return User.objects.get(pk=id)
-        except User.DoesNotExist:
+            user_id = int(id)
+        except ValueError:
             return None
+        user = await User.objects.filter(pk=user_id).afirst()
+        get_loaders(info).user.prime(user_id, user)
+        return user
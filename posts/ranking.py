@@ -0,0 +1,311 @@
+"""
+Ranked feeds: HOT, TOP_24H and TRENDING.
+
+Scores live in Redis sorted sets and are updated as likes, comments and shares
+happen, so a ranked page is one ZREVRANGE instead of sorting the posts table
+on an expression.
+
+- HOT: log10(engagement) plus a bonus for newer posts (Reddit's formula), so a
+  post needs 10x the engagement to outrank one HOT_GRAVITY seconds newer.
+  One sorted set, rescored on every event from the stored counters plus the
+  pending write-behind deltas.
+- TOP_24H: engagement of posts created in the last 24 hours, kept in one
+  sorted set per creation hour.
+- TRENDING: engagement received recently, one sorted set per hour of activity;
+  an hour counts half as much every TRENDING_HALF_LIFE hours.
+
+TOP_24H and TRENDING pages are read from a union of the hourly sets,
+materialized for RANKING_TTL seconds.
+"""
+
+import math
+import time
+import uuid
+from itertools import chain
+
+from django.core.cache import cache
+from django.db import transaction
+from django_redis import get_redis_connection
+
+from . import counters, tracing
+
+PREFIX = "ranking"
+
+HOT = "hot"
+TOP_24H = "top_24h"
+TRENDING = "trending"
+
+# Engagement per like, comment and share
+WEIGHTS = {"likes_count": 1, "comments_count": 2, "shares_count": 3}
+
+HOT_GRAVITY = 45_000
+# Start of the HOT age bonus (2025-01-01 UTC), keeps scores small
+HOT_EPOCH = 1_735_689_600
+# Posts kept in the HOT set; older low scorers fall off the end
+HOT_SIZE = 10_000
+
+HOUR = 60 * 60
+TOP_WINDOW_HOURS = 24
+TRENDING_WINDOW_HOURS = 12
+TRENDING_HALF_LIFE = 3
+
+# Seconds a union of hourly sets is reused
+RANKING_TTL = 60
+
+# Seconds a rebuild's unfinished HOT set outlives a rebuild that died
+REBUILD_TTL = 60 * 60
+
+# KEYS[1]: HOT set, KEYS[2], KEYS[3]: the post's pending and flushing counters.
+# ARGV: post id, stored engagement, age bonus, then field/weight pairs.
+HOT_SCORE = """
+local engagement = tonumber(ARGV[2])
+for i = 4, #ARGV, 2 do
+    for k = 2, 3 do
+        local pending = tonumber(redis.call('HGET', KEYS[k], ARGV[i])) or 0
+        engagement = engagement + pending * tonumber(ARGV[i + 1])
+    end
+end
+local score = math.log10(math.max(engagement, 1)) + tonumber(ARGV[3])
+redis.call('ZADD', KEYS[1], score, ARGV[1])
+return tostring(score)
+"""
+
+# KEYS[1]: union, KEYS[2..]: hourly sets.
+# ARGV: ttl, start, stop, then one weight per hourly set.
+UNION_RANGE = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    local args = {KEYS[1], #KEYS - 1}
+    for i = 2, #KEYS do
+        args[#args + 1] = KEYS[i]
+    end
+    args[#args + 1] = 'WEIGHTS'
+    for i = 4, #ARGV do
+        args[#args + 1] = ARGV[i]
+    end
+    redis.call('ZUNIONSTORE', unpack(args))
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+return redis.call('ZREVRANGE', KEYS[1], ARGV[2], ARGV[3])
+"""
+
+_scripts = {}
+
+
+def _client():
+    return get_redis_connection("default")
+
+
+def _script(source):
+    if source not in _scripts:
+        _scripts[source] = _client().register_script(source)
+    return _scripts[source]
+
+
+def _key(*parts):
+    return cache.make_key(":".join([PREFIX, *map(str, parts)]))
+
+
+def _hour(timestamp):
+    return int(timestamp // HOUR)
+
+
+def engagement(counts):
+    """Weighted engagement from a {field: count} mapping"""
+    return sum(weight * counts.get(field, 0) for field, weight in WEIGHTS.items())
+
+
+def age_bonus(created_at):
+    return (created_at.timestamp() - HOT_EPOCH) / HOT_GRAVITY
+
+
+def hot_score(engagement, created_at):
+    """HOT score of a post with the given weighted engagement"""
+    return math.log10(max(engagement, 1)) + age_bonus(created_at)
+
+
+def _stored_engagement(post):
+    return engagement({field: getattr(post, field) for field in WEIGHTS})
+
+
+def _top_key(created_hour):
+    return _key(TOP_24H, created_hour)
+
+
+def _trending_key(hour):
+    return _key(TRENDING, hour)
+
+
+def add(post):
+    """Rank a new post once the current transaction commits"""
+    add_many([post])
+
+
+def add_many(posts):
+    """add() for several posts, applied in one round-trip"""
+    posts = list(posts)
+    if not posts:
+        return
+
+    def apply():
+        pipe = _client().pipeline(transaction=False)
+        for post in posts:
+            created_hour = _hour(post.created_at.timestamp())
+            score = hot_score(_stored_engagement(post), post.created_at)
+            pipe.zadd(_key(HOT), {post.id: score})
+            pipe.zadd(_top_key(created_hour), {post.id: 0}, nx=True)
+            pipe.expireat(
+                _top_key(created_hour), (created_hour + TOP_WINDOW_HOURS + 1) * HOUR
+            )
+        pipe.zremrangebyrank(_key(HOT), 0, -HOT_SIZE - 1)
+        pipe.execute()
+
+    transaction.on_commit(apply)
+
+
+def record(post, field, delta=1):
+    """
+    Rescore a post for a counter change once the current transaction commits
+
+    Call after counters.increment(): the HOT score includes the pending delta.
+    """
+    record_many([post], field, delta)
+
+
+def record_many(posts, field, delta=1):
+    """record() for several posts, applied in one round-trip"""
+    posts = list(posts)
+    if not posts:
+        return
+    weighted = WEIGHTS[field] * delta
+
+    def apply():
+        now_hour = _hour(time.time())
+        pipe = _client().pipeline(transaction=False)
+        for post in posts:
+            _script(HOT_SCORE)(
+                keys=[
+                    _key(HOT),
+                    counters.pending_key(post.id),
+                    counters.flushing_key(post.id),
+                ],
+                args=[
+                    post.id,
+                    _stored_engagement(post),
+                    age_bonus(post.created_at),
+                    *chain.from_iterable(WEIGHTS.items()),
+                ],
+                client=pipe,
+            )
+            created_hour = _hour(post.created_at.timestamp())
+            if now_hour - created_hour < TOP_WINDOW_HOURS:
+                pipe.zincrby(_top_key(created_hour), weighted, post.id)
+                pipe.expireat(
+                    _top_key(created_hour),
+                    (created_hour + TOP_WINDOW_HOURS + 1) * HOUR,
+                )
+            pipe.zincrby(_trending_key(now_hour), weighted, post.id)
+        pipe.expireat(
+            _trending_key(now_hour), (now_hour + TRENDING_WINDOW_HOURS + 1) * HOUR
+        )
+        pipe.execute()
+
+    transaction.on_commit(apply)
+
+
+def remove(post_id):
+    """Drop a deleted post from HOT; the hourly sets skip missing posts at read time"""
+    transaction.on_commit(lambda: _client().zrem(_key(HOT), post_id))
+
+
+def _hourly_sources(sort, now_hour):
+    """{hourly set: weight} read by a TOP_24H or TRENDING union"""
+    if sort == TOP_24H:
+        return {_top_key(now_hour - age): 1 for age in range(TOP_WINDOW_HOURS)}
+    return {
+        _trending_key(now_hour - age): 0.5 ** (age / TRENDING_HALF_LIFE)
+        for age in range(TRENDING_WINDOW_HOURS)
+    }
+
+
+def page_ids(sort, page, per_page):
+    """Post IDs on a page of a ranked feed, best first"""
+    start = (page - 1) * per_page
+    stop = start + per_page - 1
+    if sort == HOT:
+        ids = _client().zrevrange(_key(HOT), start, stop)
+    else:
+        now_hour = _hour(time.time())
+        sources = _hourly_sources(sort, now_hour)
+        ids = _script(UNION_RANGE)(
+            keys=[_key(sort, "union", now_hour), *sources],
+            args=[RANKING_TTL, start, stop, *sources.values()],
+        )
+    tracing.record_round_trip(PREFIX)
+    return [int(post_id) for post_id in ids]
+
+
+def rebuild(posts, events, now=None):
+    """
+    Replace every ranking from the database
+
+    `posts` yields (id, created_at, likes, comments, shares) for all posts,
+    `events` (post_id, field, occurred_at) for the likes, comments and shares
+    of the last TRENDING_WINDOW_HOURS. Returns the number of posts ranked.
+    The rankings are built under temporary keys and swapped in together at
+    the end, so ranked feeds keep serving the old ones meanwhile.
+    """
+    now_hour = _hour(now if now is not None else time.time())
+    client = _client()
+    token = uuid.uuid4().hex
+    staged = {}
+
+    def stage(key):
+        if key not in staged:
+            staged[key] = f"{key}:rebuild:{token}"
+        return staged[key]
+
+    ranked = 0
+    pipe = client.pipeline(transaction=False)
+    for post_id, created_at, likes, comments, shares in posts:
+        score = engagement(
+            {"likes_count": likes, "comments_count": comments, "shares_count": shares}
+        )
+        pipe.zadd(stage(_key(HOT)), {post_id: hot_score(score, created_at)})
+        if not ranked:
+            # Dropped if the rebuild dies before the swap
+            pipe.expire(stage(_key(HOT)), REBUILD_TTL)
+        created_hour = _hour(created_at.timestamp())
+        if 0 <= now_hour - created_hour < TOP_WINDOW_HOURS:
+            pipe.zadd(stage(_top_key(created_hour)), {post_id: score})
+            pipe.expireat(
+                stage(_top_key(created_hour)),
+                (created_hour + TOP_WINDOW_HOURS + 1) * HOUR,
+            )
+        ranked += 1
+        if len(pipe) >= counters.FLUSH_BATCH_SIZE:
+            pipe.execute()
+    if ranked:
+        pipe.zremrangebyrank(stage(_key(HOT)), 0, -HOT_SIZE - 1)
+
+    for post_id, field, occurred_at in events:
+        hour = _hour(occurred_at.timestamp())
+        pipe.zincrby(stage(_trending_key(hour)), WEIGHTS[field], post_id)
+        pipe.expireat(
+            stage(_trending_key(hour)), (hour + TRENDING_WINDOW_HOURS + 1) * HOUR
+        )
+        if len(pipe) >= counters.FLUSH_BATCH_SIZE:
+            pipe.execute()
+    pipe.execute()
+
+    live = {_key(HOT)}
+    for sort in (TOP_24H, TRENDING):
+        live.update(_hourly_sources(sort, now_hour))
+        live.add(_key(sort, "union", now_hour))
+    swap = client.pipeline(transaction=True)
+    for key in live - staged.keys():
+        swap.delete(key)
+    for key, staging in staged.items():
+        swap.rename(staging, key)
+    swap.persist(_key(HOT))
+    swap.execute()
+    return ranked
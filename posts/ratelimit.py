@@ -0,0 +1,203 @@
+"""
+Token-bucket rate limiting in Redis.
+
+Each (group, client) pair owns a bucket holding up to `count` tokens that
+refills at `count` per period, so "5/m" allows bursts of 5 and 5 a minute on
+average. A Lua script refills and spends a bucket atomically in one
+round-trip, timed by the Redis clock so every worker agrees.
+
+Every process also remembers the last balance Redis reported for each bucket.
+Other workers can only spend tokens, so that balance plus the refill since is
+an upper bound on what the bucket holds: a call that could not be afforded
+even then is refused without touching Redis.
+
+Anonymous clients are keyed by IP. Behind nginx that is read from
+X-Forwarded-For, trusted only when the request comes from TRUSTED_PROXIES.
+"""
+
+import ipaddress
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django_ratelimit.core import user_or_ip
+from graphql import GraphQLError
+
+from . import async_cache, metrics, tracing
+
+PREFIX = "rate_limit"
+
+# Buckets remembered per process for the local pre-check
+LOCAL_BUCKETS = 10_000
+
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+# KEYS[1]: bucket hash; ARGV: capacity, refill per second, cost.
+# Returns {allowed, tokens left}; tokens as a string, Lua numbers would be
+# truncated to integers.
+TOKEN_BUCKET = """
+local capacity = tonumber(ARGV[1])
+local refill = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * refill)
+
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / refill * 1000))
+return {allowed, tostring(tokens)}
+"""
+
+_RATE = re.compile(r"^(\d+)/(\d*)([smhd])$")
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """Parse "5/m" into (capacity, refill per second): (5, 5 / 60)"""
+    match = _RATE.match(rate)
+    if match is None:
+        raise ValueError(f"Invalid rate: {rate!r}")
+    count, multiplier, unit = match.groups()
+    period = int(multiplier or 1) * PERIODS[unit]
+    return int(count), int(count) / period
+
+
+class LocalBuckets:
+    """Last balance seen per bucket, bounded LRU"""
+
+    def __init__(self, maxsize=LOCAL_BUCKETS):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def estimate(self, key, capacity, refill):
+        """The most tokens the bucket can hold now, or None if never seen"""
+        with self._lock:
+            seen = self._buckets.get(key)
+        if seen is None:
+            return None
+        tokens, at = seen
+        return min(capacity, tokens + (time.monotonic() - at) * refill)
+
+    def update(self, key, tokens):
+        with self._lock:
+            self._buckets[key] = (tokens, time.monotonic())
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+local_buckets = LocalBuckets()
+
+_script = None
+
+
+def _token_bucket():
+    global _script
+    if _script is None:
+        _script = cache.client.get_client(write=True).register_script(TOKEN_BUCKET)
+    return _script
+
+
+@lru_cache(maxsize=None)
+def _networks(proxies):
+    return tuple(ipaddress.ip_network(proxy.strip(), strict=False) for proxy in proxies)
+
+
+def _address(ip):
+    try:
+        return ipaddress.ip_address(ip.strip())
+    except ValueError:
+        return None
+
+
+def client_ip(request):
+    """
+    The client's IP address (RATELIMIT_IP_META_KEY)
+
+    X-Forwarded-For is read right to left while the hops are trusted proxies,
+    so a client cannot pick its address by sending the header itself.
+    """
+    networks = _networks(tuple(settings.TRUSTED_PROXIES))
+    ip = request.META["REMOTE_ADDR"]
+    forwarded = request.META.get("HTTP_X_FORWARDED_FOR", "").split(",")
+    while True:
+        address = _address(ip)
+        if address is None or not any(address in network for network in networks):
+            return ip
+        hop = forwarded.pop().strip() if forwarded else ""
+        if _address(hop) is None:
+            return ip
+        ip = hop
+
+
+def _key(group, request):
+    return cache.make_key(f"{PREFIX}:{group}:{user_or_ip(request)}")
+
+
+def _rejected(name, capacity, refill, cost, tokens):
+    metrics.RATE_LIMITED.labels(name).inc()
+    extensions = {"code": "RATE_LIMITED", "cost": cost}
+    if cost <= capacity:
+        extensions["retryAfter"] = round((cost - tokens) / refill, 3)
+    return GraphQLError(
+        "Rate limit exceeded. Please try again later.", extensions=extensions
+    )
+
+
+def _settle(key, name, capacity, refill, cost, reply):
+    allowed, tokens = int(reply[0]), float(reply[1])
+    local_buckets.update(key, tokens)
+    tracing.record_round_trip(PREFIX)
+    if not allowed:
+        raise _rejected(name, capacity, refill, cost, tokens)
+    return tokens
+
+
+def consume(request, group, rate, cost=1, name=None):
+    """
+    Spend `cost` tokens from the client's `group` bucket
+
+    Returns the tokens left; raises GraphQLError when the bucket is short.
+    `name` labels rejections in metrics (defaults to the group).
+    """
+    capacity, refill = parse_rate(rate)
+    key = _key(group, request)
+    name = name or group
+    tokens = local_buckets.estimate(key, capacity, refill)
+    if tokens is not None and tokens < cost:
+        raise _rejected(name, capacity, refill, cost, tokens)
+
+    reply = _token_bucket()(keys=[key], args=[capacity, refill, cost])
+    return _settle(key, name, capacity, refill, cost, reply)
+
+
+async def aconsume(request, group, rate, cost=1, name=None):
+    """consume() through the event loop's Redis client"""
+    capacity, refill = parse_rate(rate)
+    key = _key(group, request)
+    name = name or group
+    tokens = local_buckets.estimate(key, capacity, refill)
+    if tokens is not None and tokens < cost:
+        raise _rejected(name, capacity, refill, cost, tokens)
+
+    script = async_cache.client().register_script(TOKEN_BUCKET)
+    reply = await script(keys=[key], args=[capacity, refill, cost])
+    return _settle(key, name, capacity, refill, cost, reply)
@@ -0,0 +1,146 @@
+"""
+Read-replica routing for GraphQL operations.
+
+Each query operation reads from one replica in DATABASE_REPLICAS, picked at
+random. Mutations use the primary, and so does every query of a user who ran
+a mutation in the last REPLICA_STICKY_SECONDS: the user is pinned in Redis
+when the mutation finishes, so they read their own writes despite
+replication lag. Reads outside a GraphQL query (mutations, the admin,
+management commands, counter flushes) always use the primary.
+"""
+
+import random
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from graphql import OperationType
+
+from . import async_cache, tracing
+
+STICKY_PREFIX = "db_primary"
+
+# The replica the current operation reads from; None reads from the primary
+_replica = ContextVar("replica", default=None)
+
+
+def aliases():
+    return list(getattr(settings, "DATABASE_REPLICAS", ()))
+
+
+def _sticky_key(user):
+    return f"{STICKY_PREFIX}:{user.pk}"
+
+
+def _is_authenticated(user):
+    return user is not None and user.is_authenticated
+
+
+@contextmanager
+def reading_from(alias):
+    """Route reads in this context to alias (None for the primary)"""
+    token = _replica.set(alias)
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+def primary():
+    """
+    Read from the primary in this context.
+
+    For reads whose result outlives the request, such as cache fills: a value
+    read from a lagging replica would otherwise be served for its whole TTL.
+    """
+    return reading_from(None)
+
+
+def _pick():
+    replicas = aliases()
+    return random.choice(replicas) if replicas else None
+
+
+def _is_mutation(operation):
+    return operation is not None and operation.operation == OperationType.MUTATION
+
+
+@contextmanager
+def route(request, operation):
+    """Route the reads of one GraphQL operation, pinning the user after a write"""
+    if not aliases():
+        yield
+        return
+    user = getattr(request, "user", None)
+    if _is_mutation(operation):
+        try:
+            with primary():
+                yield
+        finally:
+            # The user may have been authenticated by the mutation (tokenAuth)
+            user = getattr(request, "user", None)
+            if _is_authenticated(user):
+                cache.set(_sticky_key(user), 1, settings.REPLICA_STICKY_SECONDS)
+                tracing.record_round_trip(STICKY_PREFIX)
+        return
+
+    alias = _pick()
+    if _is_authenticated(user):
+        tracing.record_round_trip(STICKY_PREFIX)
+        if cache.get(_sticky_key(user)):
+            alias = None
+    with reading_from(alias):
+        yield
+
+
+@asynccontextmanager
+async def aroute(request, operation):
+    """Async route"""
+    if not aliases():
+        yield
+        return
+    user = getattr(request, "user", None)
+    if _is_mutation(operation):
+        try:
+            with primary():
+                yield
+        finally:
+            user = getattr(request, "user", None)
+            if _is_authenticated(user):
+                await async_cache.set(
+                    _sticky_key(user), 1, settings.REPLICA_STICKY_SECONDS
+                )
+                tracing.record_round_trip(STICKY_PREFIX)
+        return
+
+    alias = _pick()
+    if _is_authenticated(user):
+        tracing.record_round_trip(STICKY_PREFIX)
+        if await async_cache.get(_sticky_key(user)):
+            alias = None
+    with reading_from(alias):
+        yield
+
+
+class ReplicaRouter:
+    """Send reads to the replica chosen for the current query, writes to default"""
+
+    def db_for_read(self, model, **hints):
+        return _replica.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Replicas get the schema through replication
+        if db in aliases():
+            return False
+        return None
@@ -0,0 +1,53 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F
+
+from .models import SEARCH_CONFIG
+
+FULL_TEXT = "full_text"
+TYPEAHEAD = "typeahead"
+
+# Only the most recent matches are ranked, so a very common word costs the
+# same as a rare one instead of ranking a large share of the table
+RANKED_CANDIDATES = 1000
+
+_WORD = re.compile(r"\w+")
+
+
+def _typeahead_query(term):
+    """
+    Match every word in `term`, treating the last one as a prefix.
+
+    Built as a raw tsquery, so only word characters from the input are used.
+    """
+    words = _WORD.findall(term.lower())
+    if not words:
+        return None
+    terms = [*words[:-1], f"{words[-1]}:*"]
+    return SearchQuery(" & ".join(terms), config=SEARCH_CONFIG, search_type="raw")
+
+
+def search_posts(qs, term, mode=FULL_TEXT):
+    """
+    Filter posts by `term` through the search_vector GIN index, best match first.
+
+    Ranking is limited to the RANKED_CANDIDATES most recent matches.
+    """
+    if mode == TYPEAHEAD:
+        query = _typeahead_query(term)
+        if query is None:
+            return qs.none()
+    else:
+        query = SearchQuery(term, config=SEARCH_CONFIG, search_type="websearch")
+
+    candidates = (
+        qs.filter(search_vector=query)
+        .order_by("-created_at")
+        .values("pk")[:RANKED_CANDIDATES]
+    )
+    return (
+        qs.filter(pk__in=candidates)
+        .annotate(rank=SearchRank(F("search_vector"), query))
+        .order_by("-rank", "-created_at")
+    )
@@ -2,6 +2,53 @@ import re
 from django.utils.html import escape
 from graphql import GraphQLError
 
+# SQL injection patterns (basic detection), as one pass
+_SQL_INJECTION = re.compile(
+    r"\bUNION\b.*\bSELECT\b"
+    r"|\bDROP\b.*\bTABLE\b"
+    r"|\bINSERT\b.*\bINTO\b"
+    r"|--\s"
+    r"|;\s*DROP",
+    re.IGNORECASE,
+)
+
+# Characters that escaping changes, that the comment/statement patterns
+# start with, or that str.split() treats as whitespace (besides " " and "\n")
+_SPECIAL_CHARS = tuple("<>&\"';-\t\x0b\x0c\r\x1c\x1d\x1e\x1f")
+
+# Every SQL pattern contains one of these, in any case
+_SQL_TRIGGERS = ("union", "drop", "insert", "--")
+
+# The only non-ASCII characters IGNORECASE matches to ASCII letters
+_FOLDABLE = "\u0130\u0131\u017f\u212a"
+_ASCII_FOLDS = str.maketrans(_FOLDABLE, "iisk")
+
+_URL = re.compile(r"^https?://.+")
+
+
+def _is_clean_ascii(text):
+    """Whether sanitizing leaves ASCII text, one entry per line, unchanged"""
+    return (
+        not any(char in text for char in _SPECIAL_CHARS)
+        and "  " not in text
+        and " \n" not in text
+        and "\n " not in text
+        and text[:1] != " "
+        and text[-1:] != " "
+    )
+
+
+def _looks_like_sql(text):
+    # Scanning with the regex costs ~25x a substring search, so only texts
+    # containing a trigger are scanned
+    folded = text
+    if not text.isascii() and any(char in text for char in _FOLDABLE):
+        folded = text.translate(_ASCII_FOLDS)
+    lowered = folded.lower()
+    if not any(trigger in lowered for trigger in _SQL_TRIGGERS):
+        return False
+    return _SQL_INJECTION.search(text) is not None
+
 
 class SecurityValidator:
     """Security validation utilities"""
@@ -12,26 +59,49 @@ class SecurityValidator:
         if not content:
             raise GraphQLError("Content cannot be empty")
 
+        # Plain ASCII text comes out of sanitizing unchanged
+        if content.isascii() and "\n" not in content and _is_clean_ascii(content):
+            if _looks_like_sql(content):
+                raise GraphQLError("Invalid content detected")
+            return content
+
         # Remove excessive whitespace
         content = " ".join(content.split())
 
         # Check for SQL injection patterns (basic detection)
-        sql_patterns = [
-            r"(\bUNION\b.*\bSELECT\b)",
-            r"(\bDROP\b.*\bTABLE\b)",
-            r"(\bINSERT\b.*\bINTO\b)",
-            r"(--\s)",
-            r"(;\s*DROP)",
-        ]
-
-        for pattern in sql_patterns:
-            if re.search(pattern, content, re.IGNORECASE):
-                raise GraphQLError("Invalid content detected")
+        if _looks_like_sql(content):
+            raise GraphQLError("Invalid content detected")
 
         # Escape HTML to prevent XSS
-        content = escape(content)
+        return escape(content)
+
+    @staticmethod
+    def validate_contents(contents):
+        """
+        validate_content() for many texts at once, e.g. bulk imports
+
+        The texts are checked together, one line each, and only those that
+        need it are sanitized one by one. Raises on the first invalid text,
+        with its position in `extensions.index`.
+        """
+        contents = list(contents)
+        joined = "\n".join(contents)
+        if (
+            all(contents)
+            and joined.isascii()
+            and joined.count("\n") == len(contents) - 1
+            and _is_clean_ascii(joined)
+            and not _looks_like_sql(joined)
+        ):
+            return contents
 
-        return content
+        validated = []
+        for index, content in enumerate(contents):
+            try:
+                validated.append(SecurityValidator.validate_content(content))
+            except GraphQLError as e:
+                raise GraphQLError(e.message, extensions={"index": index})
+        return validated
 
     @staticmethod
     def validate_url(url):
@@ -44,8 +114,7 @@ class SecurityValidator:
             raise GraphQLError("Invalid URL protocol")
 
         # Basic URL validation (must start with http:// or https://)
-        url_pattern = r"^https?://.+"
-        if not re.match(url_pattern, url):
+        if not _URL.match(url):
             raise GraphQLError("Invalid URL format")
 
         # Check max length
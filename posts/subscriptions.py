@@ -0,0 +1,130 @@
+import graphene
+from graphql import (
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    get_named_type,
+    get_operation_ast,
+)
+
+from . import pubsub
+from .cache_utils import hydrate_comment, hydrate_post
+from .loaders import get_loaders
+from .types import CommentType, PostType
+
+
+class PostCountersType(graphene.ObjectType):
+    id = graphene.ID()
+    likes_count = graphene.Int()
+    comments_count = graphene.Int()
+    shares_count = graphene.Int()
+
+
+# Fields an event resolves from its own payload, per type. Anything else
+# (comments, interactions, user columns the payload does not carry) would run
+# SQL for every event and every subscriber, so it cannot be selected.
+PAYLOAD_FIELDS = {
+    "PostType": {
+        "id",
+        "author",
+        "content",
+        "imageUrl",
+        "likesCount",
+        "commentsCount",
+        "sharesCount",
+        "createdAt",
+        "updatedAt",
+    },
+    "CommentType": {"id", "post", "author", "content", "createdAt"},
+    "UserType": {"id", "username"},
+    "PostCountersType": {"id", "likesCount", "commentsCount", "sharesCount"},
+}
+
+
+def check_payload_fields(schema, document, operation_name=None):
+    """Raise GraphQLError if a subscription selects a field not in PAYLOAD_FIELDS"""
+    operation = get_operation_ast(document, operation_name)
+    fragments = {
+        definition.name.value: definition
+        for definition in document.definitions
+        if isinstance(definition, FragmentDefinitionNode)
+    }
+    for node in _fields(operation.selection_set, fragments):
+        field = schema.subscription_type.fields.get(node.name.value)
+        if field is not None and node.selection_set:
+            _check_selection(get_named_type(field.type), node.selection_set, fragments)
+
+
+def _fields(selection_set, fragments):
+    """Field nodes of a selection set, with fragments expanded"""
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode):
+            yield selection
+        else:
+            if isinstance(selection, FragmentSpreadNode):
+                selection = fragments[selection.name.value]
+            yield from _fields(selection.selection_set, fragments)
+
+
+def _check_selection(parent_type, selection_set, fragments):
+    for node in _fields(selection_set, fragments):
+        name = node.name.value
+        if name.startswith("__"):
+            continue
+        if name not in PAYLOAD_FIELDS.get(parent_type.name, ()):
+            raise GraphQLError(
+                f"{parent_type.name}.{name} cannot be selected in a subscription",
+                nodes=[node],
+            )
+        if node.selection_set:
+            field_type = get_named_type(parent_type.fields[name].type)
+            _check_selection(field_type, node.selection_set, fragments)
+
+
+def _post_id(value):
+    try:
+        return int(value)
+    except ValueError:
+        raise GraphQLError("Invalid post ID")
+
+
+def _event_post(info, data):
+    """A post from an event; its counters already include pending deltas"""
+    post = hydrate_post(data)
+    get_loaders(info).pending_counters.prime(post.id, {})
+    return post
+
+
+class Subscription(graphene.ObjectType):
+    """
+    Feed events, delivered over the WebSocket endpoint (posts.websocket)
+
+    Each event is published once by the mutation that caused it and carries
+    the data its fields resolve from. Selections are limited to those fields
+    (PAYLOAD_FIELDS), so delivering an event runs no SQL.
+    """
+
+    post_created = graphene.Field(PostType)
+    post_counters_changed = graphene.Field(
+        PostCountersType, id=graphene.ID(required=True)
+    )
+    comment_added = graphene.Field(CommentType, post_id=graphene.ID(required=True))
+
+    def subscribe_post_created(root, info):
+        return pubsub.listen(pubsub.POST_CREATED)
+
+    def resolve_post_created(root, info):
+        return _event_post(info, root)
+
+    def subscribe_post_counters_changed(root, info, id):
+        return pubsub.listen(pubsub.post_counters_channel(_post_id(id)))
+
+    def resolve_post_counters_changed(root, info, id):
+        return root
+
+    def subscribe_comment_added(root, info, post_id):
+        return pubsub.listen(pubsub.comment_added_channel(_post_id(post_id)))
+
+    def resolve_comment_added(root, info, post_id):
+        return hydrate_comment(root["comment"], _event_post(info, root["post"]))
@@ -0,0 +1,172 @@
+import asyncio
+
+import pytest
+from graphql_jwt.shortcuts import get_token
+from django.core.cache import cache
+from posts import async_cache, counters, local_cache
+from posts.cache_utils import CacheManager
+from posts.models import Post
+
+FEED = """
+    query($userId: ID!, $postId: ID!) {
+        user(id: $userId) {
+            username
+        }
+        posts(perPage: 5) {
+            content
+            likesCount
+            author {
+                username
+            }
+            comments {
+                content
+            }
+        }
+        post(id: $postId) {
+            content
+        }
+    }
+"""
+
+
+@pytest.fixture
+def query(client):
+    def execute(path, query, variables=None, **headers):
+        return client.post(
+            path,
+            {"query": query, "variables": variables or {}},
+            content_type="application/json",
+            headers=headers,
+        ).json()
+
+    return execute
+
+
+@pytest.mark.django_db
+class TestAsyncGraphQLView:
+
+    def test_matches_sync_view(self, query, user, post, comment):
+        """Test the async endpoint returns what the sync endpoint returns"""
+        variables = {"userId": user.id, "postId": post.id}
+
+        expected = query("/graphql/", FEED, variables)
+        # First call fills the cache, the second is served from it
+        cold = query("/graphql/async/", FEED, variables)
+        warm = query("/graphql/async/", FEED, variables)
+
+        assert "errors" not in expected
+        # extensions.cost differs: each call spends from the same budget
+        assert cold["data"] == expected["data"]
+        assert warm["data"] == expected["data"]
+
+    def test_root_fields_resolve_concurrently(self, query, monkeypatch, post):
+        """Test independent root fields wait on Redis at the same time"""
+        in_flight = []
+        peak = []
+        get = async_cache.get
+
+        async def slow_get(key):
+            in_flight.append(key)
+            peak.append(len(in_flight))
+            await asyncio.sleep(0.05)
+            in_flight.remove(key)
+            return await get(key)
+
+        monkeypatch.setattr(async_cache, "get", slow_get)
+        result = query(
+            "/graphql/async/",
+            "query($id: ID!) { a: post(id: $id) { id } b: post(id: $id) { id } }",
+            {"id": post.id},
+        )
+
+        assert result["data"]["a"] == result["data"]["b"]
+        assert max(peak) == 2
+
+    def test_lease_wait_does_not_block_event_loop(self, query, monkeypatch, post):
+        """Test userPosts waits for another worker's cache fill without sleeping the loop"""
+        user_posts = "query($id: ID!) { userPosts(userId: $id) { content } }"
+        key = CacheManager._user_posts_key(post.author_id)
+        cache.add(CacheManager._lease_key(key), 1, CacheManager.LEASE_TIMEOUT)
+        monkeypatch.setattr(CacheManager, "LEASE_WAIT", 0.1)
+
+        def blocking_sleep(seconds):
+            raise AssertionError("time.sleep on the event loop")
+
+        monkeypatch.setattr("posts.cache_utils.time.sleep", blocking_sleep)
+        result = query("/graphql/async/", user_posts, {"id": post.author_id})
+
+        assert result["data"] == {"userPosts": [{"content": post.content}]}
+
+    def test_stale_feed_page_served_while_refreshing(self, query, post):
+        """Test the materialized first page is served stale while leased elsewhere"""
+        query("/graphql/", "{ posts { content } }")
+        key = CacheManager._feed_page_key(1, 10)
+        entry = cache.get(key)
+        entry["expires"] = 0
+        cache.set(key, entry)
+        local_cache.invalidate([key])
+        Post.objects.filter(pk=post.pk).update(content="edited")
+        cache.add(CacheManager._lease_key(key), 1, CacheManager.LEASE_TIMEOUT)
+
+        for path in ("/graphql/", "/graphql/async/"):
+            result = query(path, "{ posts { content } }")
+            assert result["data"] == {"posts": [{"content": post.content}]}
+
+    def test_pending_counters_not_read_on_event_loop(
+        self, client, query, monkeypatch, user, post, django_capture_on_commit_callbacks
+    ):
+        """Test sync fields never make blocking Redis calls on the event loop"""
+        calls = []
+        pending_many = counters.pending_many
+
+        def record(post_ids):
+            try:
+                asyncio.get_running_loop()
+                calls.append("loop")
+            except RuntimeError:
+                calls.append("thread")
+            return pending_many(post_ids)
+
+        monkeypatch.setattr(counters, "pending_many", record)
+        client.force_login(user)
+        with django_capture_on_commit_callbacks(execute=True):
+            query(
+                "/graphql/async/",
+                "mutation($id: ID!) { likePost(postId: $id) { post { likesCount } } }",
+                {"id": post.id},
+            )
+        # The payload's counters are read on the sync thread
+        assert "thread" in calls and "loop" not in calls
+
+        calls.clear()
+        connection = query(
+            "/graphql/async/", "{ postsConnection { edges { node { likesCount } } } }"
+        )
+
+        assert connection["data"]["postsConnection"]["edges"] == [
+            {"node": {"likesCount": 1}}
+        ]
+        # The connection's counters are prefetched asynchronously
+        assert calls == []
+
+    def test_jwt_authentication(self, query, user):
+        """Test a JWT is honoured without touching the DB on the event loop"""
+        result = query(
+            "/graphql/async/",
+            "{ me { username } }",
+            Authorization=f"JWT {get_token(user)}",
+        )
+
+        assert result["data"] == {"me": {"username": "testuser"}}
+
+    def test_mutation_runs_on_sync_thread(self, client, query, user, post):
+        """Test mutations (transactions, rate limits) work through the async view"""
+        client.force_login(user)
+        result = query(
+            "/graphql/async/",
+            "mutation($id: ID!) { likePost(postId: $id) { liked } }",
+            {"id": post.id},
+        )
+
+        assert result["data"] == {"likePost": {"liked": True}}
+        assert post.interactions.filter(user=user).exists()
@@ -0,0 +1,179 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from posts import counters
+from posts.models import Interaction, Post, TimelineEntry
+
+LIKE_POSTS = """
+    mutation($postIds: [ID!]!) {
+        likePosts(postIds: $postIds) {
+            liked
+            posts {
+                id
+                likesCount
+            }
+        }
+    }
+"""
+
+SHARE_POSTS = """
+    mutation($postIds: [ID!]!) {
+        sharePosts(postIds: $postIds) {
+            shared
+        }
+    }
+"""
+
+CREATE_POSTS = """
+    mutation($inputs: [PostInput!]!) {
+        createPosts(inputs: $inputs) {
+            posts {
+                id
+                content
+            }
+        }
+    }
+"""
+
+
+@pytest.fixture
+def user_request(rf, user):
+    request = rf.post("/graphql/")
+    request.user = user
+    return request
+
+
+def _make_posts(author, count):
+    return Post.objects.bulk_create(
+        [Post(author=author, content=f"Post {i}") for i in range(count)]
+    )
+
+
+@pytest.mark.django_db
+class TestBulkMutations:
+
+    def test_like_posts_skips_liked_and_unknown(
+        self, graphql_client, user_request, user, django_capture_on_commit_callbacks
+    ):
+        """Test likePosts likes each new post once, in request order"""
+        posts = _make_posts(user, 3)
+        Interaction.objects.create(post=posts[1], user=user, interaction_type="like")
+        post_ids = [posts[2].id, posts[1].id, 999999, posts[0].id, posts[2].id]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            result = graphql_client.execute(
+                LIKE_POSTS, variables={"postIds": post_ids}, context_value=user_request
+            )
+
+        assert "errors" not in result
+        data = result["data"]["likePosts"]
+        assert data["liked"] == [str(posts[2].id), str(posts[0].id)]
+        assert [post["id"] for post in data["posts"]] == [
+            str(posts[2].id),
+            str(posts[1].id),
+            str(posts[0].id),
+        ]
+        assert counters.pending_many([post.id for post in posts]) == {
+            posts[0].id: {"likes_count": 1},
+            posts[2].id: {"likes_count": 1},
+        }
+        assert Interaction.objects.filter(user=user).count() == 3
+
+    def test_like_posts_counts_only_inserted_rows(
+        self, graphql_client, user_request, user, django_capture_on_commit_callbacks
+    ):
+        """Test a like that lands concurrently is not counted a second time"""
+        posts = _make_posts(user, 2)
+        table = Interaction._meta.db_table
+        raced = []
+
+        def race(execute, sql, params, many, context):
+            # Another request likes the first post just before the insert
+            if "INSERT INTO" in sql and table in sql and not raced:
+                raced.append(sql)
+                Interaction.objects.create(
+                    post=posts[0], user=user, interaction_type="like"
+                )
+            return execute(sql, params, many, context)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            with connection.execute_wrapper(race):
+                result = graphql_client.execute(
+                    LIKE_POSTS,
+                    variables={"postIds": [post.id for post in posts]},
+                    context_value=user_request,
+                )
+
+        assert result["data"]["likePosts"]["liked"] == [str(posts[1].id)]
+        assert counters.pending_many([post.id for post in posts]) == {
+            posts[1].id: {"likes_count": 1},
+        }
+
+    def test_statement_count_does_not_grow_with_batch(
+        self, graphql_client, user_request, user
+    ):
+        """Test sharePosts runs the same SQL for 2 posts as for 50"""
+        posts = _make_posts(user, 52)
+
+        def statements(mutation, batch):
+            with CaptureQueriesContext(connection) as queries:
+                result = graphql_client.execute(
+                    mutation,
+                    variables={"postIds": [post.id for post in batch]},
+                    context_value=user_request,
+                )
+            assert "errors" not in result
+            return len(queries)
+
+        assert statements(SHARE_POSTS, posts[:2]) == statements(SHARE_POSTS, posts[2:])
+        assert Interaction.objects.filter(interaction_type="share").count() == 52
+
+    def test_create_posts(
+        self,
+        graphql_client,
+        user_request,
+        user,
+        another_user,
+        django_capture_on_commit_callbacks,
+    ):
+        """Test createPosts inserts and fans out a batch in a fixed number of statements"""
+        from users.models import Follow
+
+        Follow.objects.create(follower=another_user, followee=user)
+        inputs = [{"content": f"Draft {i}"} for i in range(20)]
+
+        with CaptureQueriesContext(connection) as queries:
+            with django_capture_on_commit_callbacks(execute=True):
+                result = graphql_client.execute(
+                    CREATE_POSTS,
+                    variables={"inputs": inputs},
+                    context_value=user_request,
+                )
+
+        assert "errors" not in result
+        created = result["data"]["createPosts"]["posts"]
+        assert [post["content"] for post in created] == [
+            item["content"] for item in inputs
+        ]
+        assert TimelineEntry.objects.filter(owner=another_user).count() == 20
+        # Post INSERT, follower lookups, timeline INSERT and a savepoint pair
+        assert len(queries) == 6
+
+    def test_create_posts_reports_the_invalid_item(self, graphql_client, user_request):
+        """Test a rejected input fails the whole batch and names its index"""
+        inputs = [{"content": "fine"}, {"content": "x; DROP TABLE posts"}]
+        result = graphql_client.execute(
+            CREATE_POSTS, variables={"inputs": inputs}, context_value=user_request
+        )
+
+        assert result["errors"][0]["extensions"]["index"] == 1
+        assert not Post.objects.exists()
+
+    def test_batch_size_limit(self, graphql_client, user_request):
+        """Test a batch over MAX_BATCH_SIZE is refused"""
+        result = graphql_client.execute(
+            LIKE_POSTS,
+            variables={"postIds": list(range(1, 102))},
+            context_value=user_request,
+        )
+        assert result["errors"][0]["message"] == "At most 100 items per call"
@@ -0,0 +1,74 @@
+import pickle
+
+import pytest
+from django.core.cache import cache
+from django_redis import get_redis_connection
+from posts import cache_serializer
+from posts.cache_serializer import ZstdCompressor
+from posts.cache_utils import (
+    CacheManager,
+    cache_comment_data,
+    cache_post_data,
+    cache_post_fragment,
+)
+
+
+def round_trip(value):
+    return cache_serializer.loads(cache_serializer.dumps(value))
+
+
+@pytest.mark.django_db
+class TestCompactSerializer:
+
+    def test_schemas_match_payloads(self, post, comment):
+        """Test each schema lists its payload's fields in order"""
+        assert tuple(cache_post_data(post)) == cache_serializer.POST.fields
+        assert tuple(cache_comment_data(comment)) == cache_serializer.COMMENT.fields
+        fragment = cache_post_fragment(post, [comment])
+        assert tuple(fragment) == cache_serializer.FRAGMENT.fields
+        assert tuple(CacheManager._entry(1, 60, 0.0)) == cache_serializer.ENTRY.fields
+
+    def test_payloads_round_trip_compactly(self, post, comment):
+        """Test cached payloads decode unchanged and beat pickle on size"""
+        fragment = cache_post_fragment(post, [comment])
+        for value in (
+            CacheManager._entry(cache_post_data(post), 300, 0.001),
+            [fragment, fragment],
+            CacheManager._entry([3, 2, 1], 60, 0.001),
+        ):
+            encoded = cache_serializer.dumps(value)
+            assert round_trip(value) == value
+            assert len(encoded) < len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+    def test_other_values_fall_back_to_pickle(self):
+        """Test values msgpack would alter are pickled, and old pickles still load"""
+        for value in ((1, 2), {"tags": {"a", "b"}}):
+            assert round_trip(value) == value
+        assert type(round_trip((1, 2))) is tuple
+
+        legacy = pickle.dumps({"id": 1}, pickle.HIGHEST_PROTOCOL)
+        assert cache_serializer.loads(legacy) == {"id": 1}
+
+    def test_cache_stores_compact_values(self, post):
+        """Test the configured cache writes posts in the compact encoding"""
+        CacheManager.set_post(post.id, cache_post_data(post))
+
+        raw = get_redis_connection("default").get(
+            cache.make_key(f"{CacheManager.POST_PREFIX}:{post.id}")
+        )
+        assert raw[:1] == cache_serializer.MSGPACK
+        assert CacheManager.get_post(post.id) == cache_post_data(post)
+
+
+class TestZstdCompressor:
+
+    def test_compresses_above_threshold_only(self):
+        """Test short values are stored as they are and long ones shrink"""
+        compressor = ZstdCompressor({"COMPRESS_MIN_LENGTH": 100})
+        short, long = b"M" + b"x" * 50, b"M" + b"x" * 1000
+
+        assert compressor.compress(short) == short
+        compressed = compressor.compress(long)
+        assert len(compressed) < len(long)
+        assert compressor.decompress(compressed) == long
+        assert compressor.decompress(short) == short
@@ -0,0 +1,170 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory
+from graphene.test import Client
+from posts import local_cache, replicas, tracing
+from posts.cache_utils import CacheManager
+from posts.models import Post
+from socialfeed.schema import schema
+
+CONCURRENCY = 8
+
+
+def _concurrently(func):
+    """Call func from CONCURRENCY threads released at the same instant"""
+    barrier = threading.Barrier(CONCURRENCY)
+
+    def call():
+        barrier.wait()
+        try:
+            return func()
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(CONCURRENCY) as pool:
+        return list(pool.map(lambda _: call(), range(CONCURRENCY)))
+
+
+class TestGenerationalInvalidation:
+
+    def test_posts_list_round_trip(self):
+        """Test a cached list is returned for the same arguments"""
+        CacheManager.set_posts_list([3, 2, 1], page=1, per_page=10)
+        assert CacheManager.get_posts_list(page=1, per_page=10) == [3, 2, 1]
+
+    def test_invalidate_posts_lists_orphans_feed(self):
+        """Test bumping the feed generation hides existing lists"""
+        CacheManager.set_posts_list([1], page=1, per_page=10)
+        CacheManager.set_posts_list([2], page=2, per_page=10)
+
+        CacheManager.invalidate_posts_lists()
+
+        assert CacheManager.get_posts_list(page=1, per_page=10) is None
+        assert CacheManager.get_posts_list(page=2, per_page=10) is None
+
+    def test_author_scope_is_independent(self):
+        """Test one author's writes do not invalidate another author's lists"""
+        CacheManager.set_user_posts(1, [10])
+        CacheManager.set_user_posts(2, [20])
+        CacheManager.set_posts_list([10], page=1, per_page=10, user_id=1)
+
+        CacheManager.invalidate_user_posts(1)
+
+        assert CacheManager.get_user_posts(1) is None
+        assert CacheManager.get_posts_list(page=1, per_page=10, user_id=1) is None
+        assert CacheManager.get_user_posts(2) == [20]
+
+
+class TestPostsMany:
+
+    def test_posts_fetched_in_one_round_trip(self):
+        """Test get_posts_many reads every uncached post with a single MGET"""
+        CacheManager.set_posts_many([{"id": n} for n in range(1, 11)])
+        local_cache.cache.clear()
+
+        with tracing.trace() as trace:
+            found = CacheManager.get_posts_many(range(1, 13))
+
+        assert found == {n: {"id": n} for n in range(1, 11)}
+        assert trace.cache[CacheManager.POST_PREFIX] == [10, 2]
+        assert trace.round_trips[CacheManager.POST_PREFIX] == 1
+        # Now held locally
+        assert CacheManager.get_posts_many([1, 2]) == {1: {"id": 1}, 2: {"id": 2}}
+
+    def test_invalidate_many(self):
+        """Test invalidate_many evicts posts and fragments, here and in Redis"""
+        CacheManager.set_posts_many([{"id": 1}, {"id": 2}, {"id": 3}])
+        CacheManager.set_post_fragments([{"post": {"id": 1}, "comments": []}])
+
+        CacheManager.invalidate_many([1, 2])
+
+        assert CacheManager.get_posts_many([1, 2, 3]) == {3: {"id": 3}}
+        assert CacheManager.get_post_fragments([1]) == {}
+
+
+class TestGetOrCompute:
+
+    def test_concurrent_misses_compute_once(self):
+        """Test simultaneous misses wait for a single computation"""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return [1, 2, 3]
+
+        results = _concurrently(
+            lambda: CacheManager.get_or_compute("test", "key", compute, 60)
+        )
+
+        assert len(calls) == 1
+        assert results == [[1, 2, 3]] * CONCURRENCY
+
+    def test_stale_value_served_while_refreshing(self):
+        """Test an expired value is served while another worker holds the lease"""
+        CacheManager.get_or_compute("test", "key", lambda: "old", timeout=0)
+        lease = CacheManager._lease_key("key")
+
+        cache.add(lease, 1, CacheManager.LEASE_TIMEOUT)
+        value = CacheManager.get_or_compute(
+            "test", "key", lambda: pytest.fail("refreshed twice"), 60
+        )
+        assert value == "old"
+
+        cache.delete(lease)
+        assert CacheManager.get_or_compute("test", "key", lambda: "new", 60) == "new"
+
+    def test_lease_wait_timeout_reads_primary(self, monkeypatch):
+        """Test the uncached fallback after a lease wait reads from the primary"""
+        monkeypatch.setattr(CacheManager, "LEASE_WAIT", 0)
+        cache.add(CacheManager._lease_key("key"), 1, CacheManager.LEASE_TIMEOUT)
+
+        with replicas.reading_from("replica"):
+            alias = CacheManager.get_or_compute(
+                "test", "key", lambda: replicas._replica.get(), 60
+            )
+        assert alias is None
+
+    def test_none_is_not_cached(self):
+        """Test a None result is recomputed on the next call"""
+        assert CacheManager.get_or_compute("test", "key", lambda: None, 60) is None
+        assert CacheManager.get_or_compute("test", "key", lambda: 1, 60) == 1
+
+
+@pytest.mark.django_db(transaction=True)
+class TestStampedeProtection:
+
+    @pytest.mark.parametrize("page", [1, 2])
+    def test_concurrent_feed_misses_run_one_page_query(self, user, page):
+        """Test N simultaneous misses on a feed page run its query once"""
+        Post.objects.bulk_create(
+            [Post(author=user, content=f"post {n}") for n in range(10)]
+        )
+        page_queries = []
+
+        def count_page_queries(execute, sql, params, many, context):
+            if "LIMIT" in sql:
+                page_queries.append(sql)
+            return execute(sql, params, many, context)
+
+        def fetch_page():
+            request = RequestFactory().post("/graphql/")
+            request.user = AnonymousUser()
+            with connection.execute_wrapper(count_page_queries):
+                result = Client(schema).execute(
+                    "{ posts(page: %d, perPage: 5) { id } }" % page,
+                    context_value=request,
+                )
+            return result["data"]["posts"]
+
+        pages = _concurrently(fetch_page)
+
+        assert len(page_queries) == 1
+        assert all(page == pages[0] for page in pages)
+        assert len(pages[0]) == 5
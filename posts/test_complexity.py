@@ -0,0 +1,116 @@
+import pytest
+from graphql import parse
+from posts import complexity
+from socialfeed.schema import schema
+
+FEED = """
+    query($perPage: Int) {
+        posts(perPage: $perPage) {
+            content
+            author { username }
+            comments { ...CommentFields }
+        }
+    }
+    fragment CommentFields on CommentType {
+        content
+    }
+"""
+
+NESTED = """
+    {
+        posts(perPage: 10) {
+            comments {
+                post {
+                    comments { author { username } }
+                }
+            }
+        }
+    }
+"""
+
+
+def cost(query, variables=None):
+    return complexity.query_cost(
+        schema.graphql_schema, parse(query), variables=variables
+    )
+
+
+@pytest.fixture
+def query(client):
+    def execute(query, variables=None):
+        return client.post(
+            "/graphql/",
+            {"query": query, "variables": variables or {}},
+            content_type="application/json",
+        )
+
+    return execute
+
+
+@pytest.mark.django_db
+class TestQueryCost:
+
+    def test_lists_multiply_their_items(self):
+        """Test each post pays for its author and its comments, through fragments"""
+        # 10 posts x (post + author + 10 comments)
+        assert cost(FEED) == 10 * (1 + 1 + 10)
+        assert cost(FEED, {"perPage": 50}) == 50 * (1 + 1 + 10)
+        assert cost("{ me { username } }") == 1
+
+    def test_mutations_have_a_base_cost(self):
+        """Test a mutation costs something even when it returns scalars"""
+        mutation = 'mutation { likePost(postId: "1") { liked } }'
+        assert cost(mutation) == complexity.MUTATION_WEIGHT
+
+    def test_bulk_mutations_pay_per_item(self):
+        """Test a bulk mutation costs MUTATION_WEIGHT for every item in its batch"""
+        mutation = "mutation($ids: [ID!]!) { likePosts(postIds: $ids) { liked } }"
+        ids = ["1", "2", "3"]
+        assert cost(mutation, {"ids": ids}) == 3 * complexity.MUTATION_WEIGHT
+
+    def test_expensive_query_rejected_before_running(
+        self, query, django_assert_num_queries, post
+    ):
+        """Test nesting through CommentType.post is refused without touching the DB"""
+        with django_assert_num_queries(0):
+            response = query(NESTED)
+
+        body = response.json()
+        assert response.status_code == 400
+        assert body["errors"][0]["extensions"]["code"] == "QUERY_TOO_COMPLEX"
+        assert body["extensions"]["cost"]["requested"] == cost(NESTED)
+
+    def test_cost_in_extensions(self, query, post):
+        """Test the cost and the client's remaining budget are returned"""
+        body = query(FEED, {"perPage": 5}).json()
+
+        assert body["extensions"]["cost"] == {
+            "requested": 60,
+            "maximum": 1000,
+            "remaining": 20000 - 60,
+        }
+
+    def test_cost_budget_per_client(self, query, settings, post):
+        """Test clients are throttled once they spend their budget for the minute"""
+        settings.GRAPHQL_QUERY_COST_PER_MINUTE = 100
+
+        assert "errors" not in query(FEED, {"perPage": 5}).json()
+        body = query(FEED, {"perPage": 5}).json()
+
+        assert body["errors"][0]["extensions"]["code"] == "RATE_LIMITED"
+
+    def test_depth_limit(self, query, settings):
+        """Test queries nested deeper than GRAPHQL_MAX_QUERY_DEPTH are invalid"""
+        settings.GRAPHQL_MAX_QUERY_DEPTH = 2
+        response = query("{ posts { comments { post { id } } } }")
+
+        assert response.status_code == 400
+        assert (
+            "exceeds maximum operation depth" in response.json()["errors"][0]["message"]
+        )
+
+    def test_per_page_is_bounded(self, query):
+        """Test perPage above MAX_PAGE_SIZE is refused"""
+        body = query("{ posts(perPage: 101) { id } }").json()
+
+        assert body["errors"][0]["message"] == "perPage must be between 1 and 100"
@@ -0,0 +1,116 @@
+import pytest
+from posts import counters
+from posts.models import Post
+
+LIKE = """
+    mutation($postId: ID!) {
+        likePost(postId: $postId) {
+            liked
+            post {
+                likesCount
+            }
+        }
+    }
+"""
+
+
+@pytest.mark.django_db
+class TestWriteBehindCounters:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_like_is_pending_until_flushed(self, graphql_client, rf, user, post):
+        """Test a like is visible immediately but written to the row on flush"""
+        request = rf.post("/graphql/")
+        request.user = user
+
+        # The mutation's own transaction commits before the response is built
+        result = graphql_client.execute(
+            LIKE, variables={"postId": post.id}, context_value=request
+        )
+
+        assert "errors" not in result
+        assert result["data"]["likePost"]["post"]["likesCount"] == 1
+        post.refresh_from_db()
+        assert post.likes_count == 0
+        assert counters.pending_many([post.id]) == {post.id: {"likes_count": 1}}
+
+        assert counters.flush() == 1
+        post.refresh_from_db()
+        assert post.likes_count == 1
+        assert counters.pending_many([post.id]) == {}
+
+    def test_flush_batches_many_posts(self, user, django_capture_on_commit_callbacks):
+        """Test deltas for several posts and fields are applied together"""
+        posts = [
+            Post.objects.create(author=user, content=f"Post {i}") for i in range(3)
+        ]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            for post in posts:
+                for _ in range(5):
+                    counters.increment(post.id, "likes_count")
+            counters.increment(posts[0].id, "shares_count", 2)
+            counters.increment(posts[1].id, "comments_count", -1)
+
+        assert counters.flush(batch_size=2) == 3
+
+        counts = {
+            post.id: (post.likes_count, post.comments_count, post.shares_count)
+            for post in Post.objects.filter(id__in=[post.id for post in posts])
+        }
+        assert counts == {
+            posts[0].id: (5, 0, 2),
+            posts[1].id: (5, -1, 0),
+            posts[2].id: (5, 0, 0),
+        }
+
+    def test_deltas_stay_visible_while_flushing(
+        self, post, monkeypatch, django_capture_on_commit_callbacks
+    ):
+        """Test readers keep counting deltas until the flushed row is committed"""
+        with django_capture_on_commit_callbacks(execute=True):
+            counters.increment(post.id, "likes_count", 3)
+        seen = []
+        bulk_update = Post.objects.bulk_update
+
+        def observed_bulk_update(*args, **kwargs):
+            seen.append(counters.pending_many([post.id]))
+            return bulk_update(*args, **kwargs)
+
+        monkeypatch.setattr(Post.objects, "bulk_update", observed_bulk_update)
+        assert counters.flush() == 1
+
+        assert seen == [{post.id: {"likes_count": 3}}]
+        assert counters.pending_many([post.id]) == {}
+
+    def test_failed_flush_requeues_deltas(
+        self, post, monkeypatch, django_capture_on_commit_callbacks
+    ):
+        """Test deltas taken by a failed flush are retried by the next one"""
+        with django_capture_on_commit_callbacks(execute=True):
+            counters.increment(post.id, "likes_count", 2)
+
+        def failing_bulk_update(*args, **kwargs):
+            raise RuntimeError
+
+        with monkeypatch.context() as patch:
+            patch.setattr(Post.objects, "bulk_update", failing_bulk_update)
+            with pytest.raises(RuntimeError):
+                counters.flush()
+        assert counters.pending_many([post.id]) == {post.id: {"likes_count": 2}}
+
+        assert counters.flush() == 1
+        post.refresh_from_db()
+        assert post.likes_count == 2
+        assert counters.pending_many([post.id]) == {}
+
+    def test_increment_is_dropped_on_rollback(self, post):
+        """Test a rolled back mutation leaves no pending delta"""
+        from django.db import transaction
+
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                counters.increment(post.id, "likes_count")
+                raise RuntimeError
+
+        assert counters.pending_many([post.id]) == {}
@@ -0,0 +1,89 @@
+import json
+import time
+
+from django.core.cache import cache
+from django_redis import get_redis_connection
+from posts import local_cache
+from posts.cache_utils import CacheManager
+from posts.local_cache import LocalCache
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class TestLocalCache:
+
+    def test_lru_is_bounded_by_size(self):
+        """Test the least recently used entries go once the byte cap is reached"""
+        lru = LocalCache(max_bytes=1000, timeout=60)
+        for n in range(10):
+            lru.set(n, "x" * 200)
+            lru.get(0)
+
+        assert lru.nbytes <= 1000
+        assert lru.get(0) is not None
+        assert lru.get(1) is None
+        assert lru.get(9) is not None
+
+    def test_entries_expire(self):
+        """Test an entry is not served past the local timeout"""
+        lru = LocalCache(max_bytes=1000, timeout=0.05)
+        lru.set("key", 1)
+        assert lru.get("key") == 1
+
+        time.sleep(0.06)
+        assert lru.get("key") is None
+        assert len(lru) == 0
+
+    def test_value_read_before_an_eviction_is_not_stored(self):
+        """Test a value fetched before an invalidation cannot outlive it"""
+        lru = LocalCache(max_bytes=1000, timeout=60)
+        version = lru.version
+        lru.delete_many(["key"])
+
+        lru.set("key", "old", version)
+        assert lru.get("key") is None
+
+
+class TestTwoTierCache:
+
+    def test_hot_post_served_locally(self):
+        """Test a repeated get_post does not go back to Redis"""
+        CacheManager.set_post(1, {"id": 1})
+        assert CacheManager.get_post(1) == {"id": 1}
+
+        # Gone from Redis, still in this worker
+        cache.delete(f"{CacheManager.POST_PREFIX}:1")
+        assert CacheManager.get_post(1) == {"id": 1}
+
+        CacheManager.invalidate_post(1)
+        assert CacheManager.get_post(1) is None
+
+    def test_lists_and_generations_are_local(self):
+        """Test invalidating lists evicts the locally held generations"""
+        CacheManager.set_posts_list([3, 2, 1], page=1, per_page=10)
+        CacheManager.set_user_posts(1, [10])
+        assert CacheManager.get_posts_list(page=1, per_page=10) == [3, 2, 1]
+
+        CacheManager.invalidate_posts_lists()
+        CacheManager.invalidate_user_posts(1)
+
+        assert CacheManager.get_posts_list(page=1, per_page=10) is None
+        assert CacheManager.get_user_posts(1) is None
+
+    def test_invalidation_from_another_worker(self):
+        """Test a broadcast from another process evicts the key here"""
+        CacheManager.set_post(1, {"id": 1})
+        key = f"{CacheManager.POST_PREFIX}:1"
+        assert local_cache.get(key) is not None
+
+        # What invalidate_post publishes in another worker
+        get_redis_connection("default").publish(
+            local_cache._channel(), json.dumps([key])
+        )
+
+        assert _wait_for(lambda: local_cache.get(key) is None)
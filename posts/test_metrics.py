@@ -0,0 +1,86 @@
+import pytest
+from prometheus_client import REGISTRY
+
+LIKE = """
+    mutation($postId: ID!) {
+        likePost(postId: $postId) {
+            liked
+        }
+    }
+"""
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@pytest.fixture
+def query(client):
+    def execute(query, variables=None):
+        return client.post(
+            "/graphql/",
+            {"query": query, "variables": variables or {}},
+            content_type="application/json",
+        ).json()
+
+    return execute
+
+
+@pytest.mark.django_db
+class TestMetrics:
+
+    def test_operations_are_exported(self, client, query, post):
+        """Test latency, SQL and cache samples are recorded per operation"""
+        operation = {"operation": "query post"}
+        before = _sample("graphql_operation_duration_seconds_count", **operation)
+        misses = _sample("cache_lookups_total", prefix="post", result="miss")
+
+        query("{ post(id: %d) { id } }" % post.id)
+
+        assert (
+            _sample("graphql_operation_duration_seconds_count", **operation)
+            == before + 1
+        )
+        assert _sample("cache_lookups_total", prefix="post", result="miss") == (
+            misses + 1
+        )
+
+        response = client.get("/metrics/")
+        assert response.status_code == 200
+        assert (
+            b'graphql_operation_db_queries_bucket{le="1.0",operation="query post"}'
+            in (response.content)
+        )
+
+    def test_mutations_and_rejections_are_counted(self, client, query, user, post):
+        """Test mutation outcomes are counted per root field"""
+        client.force_login(user)
+        ok = _sample("graphql_mutations_total", mutation="likePost", status="ok")
+
+        query(LIKE, {"postId": post.id})
+
+        assert (
+            _sample("graphql_mutations_total", mutation="likePost", status="ok")
+            == ok + 1
+        )
+
+    def test_db_pool_usage_is_exported(self, client, query, post):
+        """Test pooled connections are exported and reported by /health/"""
+        query("{ post(id: %d) { id } }" % post.id)
+
+        # The test's transaction holds the default connection
+        assert _sample("db_pool_connections", database="default", state="in_use") == 1
+
+        pools = client.get("/health/").json()["database_pools"]
+        assert pools["default"]["size"] >= 1
+        assert pools["default"]["waiting"] == 0
+
+    def test_metrics_token(self, client, settings):
+        """Test /metrics/ requires the bearer token when one is configured"""
+        settings.METRICS_TOKEN = "secret"
+
+        assert client.get("/metrics/").status_code == 403
+        wrong = client.get("/metrics/", headers={"Authorization": "Bearer wrong"})
+        assert wrong.status_code == 403
+        response = client.get("/metrics/", headers={"Authorization": "Bearer secret"})
+        assert response.status_code == 200
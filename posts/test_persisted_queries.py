@@ -0,0 +1,117 @@
+import json
+
+import pytest
+from posts import persisted_queries
+
+POST = "query($id: ID!) { post(id: $id) { content } }"
+SHA256 = persisted_queries.query_hash(POST)
+
+
+def persisted(sha256=SHA256):
+    return {"persistedQuery": {"version": 1, "sha256Hash": sha256}}
+
+
+@pytest.fixture(autouse=True)
+def empty_document_cache():
+    persisted_queries.documents.clear()
+
+
+@pytest.fixture
+def post_query(client):
+    def execute(path="/graphql/", **body):
+        return client.post(path, body, content_type="application/json")
+
+    return execute
+
+
+@pytest.mark.django_db
+class TestPersistedQueries:
+
+    @pytest.mark.parametrize("path", ["/graphql/", "/graphql/async/"])
+    def test_apq_handshake(self, post_query, post, path):
+        """Test an unknown hash is reported, registered with its text, then served"""
+        variables = {"id": post.id}
+
+        response = post_query(path, variables=variables, extensions=persisted())
+        assert response.json()["errors"][0]["message"] == persisted_queries.NOT_FOUND
+
+        response = post_query(
+            path, query=POST, variables=variables, extensions=persisted()
+        )
+        assert response.json()["data"] == {"post": {"content": post.content}}
+
+        # Another worker, with an empty document cache, finds it in the registry
+        persisted_queries.documents.clear()
+        response = post_query(path, variables=variables, extensions=persisted())
+        assert response.json()["data"] == {"post": {"content": post.content}}
+
+    def test_hash_must_match_query(self, post_query):
+        """Test a query is not registered under someone else's hash"""
+        response = post_query(query=POST, extensions=persisted("0" * 64))
+
+        assert response.status_code == 400
+        assert persisted_queries.lookup("0" * 64) is None
+
+    def test_known_documents_skip_parsing(self, post_query, monkeypatch, post):
+        """Test a cached document is executed without parsing or validating again"""
+        post_query(query=POST, variables={"id": post.id})
+
+        def fail(*args, **kwargs):
+            raise AssertionError("document was parsed again")
+
+        monkeypatch.setattr("posts.views.parse", fail)
+        monkeypatch.setattr("posts.views.validate", fail)
+        response = post_query(query=POST, variables={"id": post.id})
+
+        assert response.json()["data"] == {"post": {"content": post.content}}
+
+    def test_invalid_documents_are_not_cached(self, post_query):
+        """Test validation errors are reported and nothing is cached"""
+        response = post_query(query="query { nope }")
+
+        assert response.status_code == 400
+        assert len(persisted_queries.documents) == 0
+
+    def test_document_cache_is_bounded(self):
+        """Test the least recently used document is evicted first"""
+        documents = persisted_queries.DocumentCache(maxsize=2)
+        documents.set("a", 1)
+        documents.set("b", 2)
+        documents.get("a")
+        documents.set("c", 3)
+
+        assert documents.get("b") is None
+        assert documents.get("a") == 1
+        assert documents.get("c") == 3
+
+    def test_anonymous_persisted_get_is_cacheable(self, client, user, post):
+        """Test persisted GETs are public for anonymous users and private otherwise"""
+        persisted_queries.register(SHA256, POST)
+        params = {
+            "variables": json.dumps({"id": post.id}),
+            "extensions": json.dumps(persisted()),
+        }
+
+        response = client.get("/graphql/", params, HTTP_ACCEPT="application/json")
+        assert response.json()["data"] == {"post": {"content": post.content}}
+        assert "public" in response["Cache-Control"]
+        assert "csrftoken" not in response.cookies
+        assert "remaining" not in response.json()["extensions"]["cost"]
+
+        client.force_login(user)
+        response = client.get("/graphql/", params, HTTP_ACCEPT="application/json")
+        assert "public" not in response.get("Cache-Control", "")
+
+    def test_get_cannot_run_persisted_mutations(self, client):
+        """Test a persisted mutation is still refused over GET"""
+        mutation = 'mutation { createPost(content: "hi") { post { id } } }'
+        sha256 = persisted_queries.query_hash(mutation)
+        persisted_queries.register(sha256, mutation)
+
+        response = client.get(
+            "/graphql/",
+            {"extensions": json.dumps(persisted(sha256))},
+            HTTP_ACCEPT="application/json",
+        )
+
+        assert response.status_code == 405
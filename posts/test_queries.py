@@ -1,5 +1,7 @@
 import pytest
-from posts.models import Post
+from posts.cache_utils import CacheManager
+from posts.loaders import INTERACTIONS_PER_POST
+from posts.models import Post, Comment, Interaction
 
 
 @pytest.mark.django_db
@@ -44,6 +46,30 @@ class TestPostQueries:
         assert "errors" not in result
         assert result["data"]["post"]["id"] == str(post.id)
 
+    def test_cached_post_served_without_queries(
+        self, graphql_client, graphql_request, post, django_assert_num_queries
+    ):
+        """Test a cache hit on post(id) is hydrated from the payload"""
+        query = f"""
+            query {{
+                post(id: "{post.id}") {{
+                    id
+                    content
+                    likesCount
+                    author {{
+                        username
+                    }}
+                }}
+            }}
+        """
+
+        first = graphql_client.execute(query)
+        with django_assert_num_queries(0):
+            second = graphql_client.execute(query, context_value=graphql_request)
+
+        assert "errors" not in second
+        assert second == first
+
     def test_user_posts_query(self, graphql_client, user, post):
         """Test fetching user's posts"""
         query = f"""
@@ -58,3 +84,230 @@ class TestPostQueries:
         result = graphql_client.execute(query)
         assert "errors" not in result
         assert len(result["data"]["userPosts"]) == 1
+
+    def test_posts_connection_pages_with_cursor(self, graphql_client, user):
+        """Test walking the feed with keyset cursors"""
+        for i in range(5):
+            Post.objects.create(author=user, content=f"Post {i}")
+
+        query = """
+            query($after: String) {
+                postsConnection(first: 2, after: $after) {
+                    edges {
+                        cursor
+                        node {
+                            content
+                        }
+                    }
+                    pageInfo {
+                        hasNextPage
+                        endCursor
+                    }
+                }
+            }
+        """
+
+        seen = []
+        after = None
+        while True:
+            result = graphql_client.execute(query, variables={"after": after})
+            assert "errors" not in result
+            connection = result["data"]["postsConnection"]
+            seen.extend(edge["node"]["content"] for edge in connection["edges"])
+            if not connection["pageInfo"]["hasNextPage"]:
+                break
+            after = connection["pageInfo"]["endCursor"]
+
+        assert seen == [f"Post {i}" for i in reversed(range(5))]
+
+    def test_posts_connection_rejects_bad_cursor(self, graphql_client, post):
+        """Test a malformed cursor is reported as an error"""
+        query = """
+            query {
+                postsConnection(first: 2, after: "not-a-cursor") {
+                    edges {
+                        cursor
+                    }
+                }
+            }
+        """
+
+        result = graphql_client.execute(query)
+        assert "errors" in result
+
+    def test_feed_query_count_is_constant(
+        self, graphql_client, graphql_request, user, another_user,
+        django_assert_num_queries,
+    ):
+        """Test nested comments and authors are batched rather than N+1"""
+        for i in range(50):
+            post = Post.objects.create(author=user, content=f"Post {i}")
+            for j in range(3):
+                Comment.objects.create(
+                    post=post, author=another_user, content=f"Comment {j}"
+                )
+
+        query = """
+            query {
+                posts(page: 1, perPage: 50) {
+                    id
+                    author {
+                        username
+                    }
+                    comments {
+                        content
+                        author {
+                            username
+                        }
+                        post {
+                            id
+                        }
+                    }
+                }
+            }
+        """
+
+        # Page IDs, the posts themselves, and one window query for their comments
+        with django_assert_num_queries(3):
+            result = graphql_client.execute(query, context_value=graphql_request)
+
+        assert "errors" not in result
+        assert len(result["data"]["posts"]) == 50
+        assert all(len(post["comments"]) == 3 for post in result["data"]["posts"])
+
+    def test_interactions_are_limited_per_post(
+        self, graphql_client, graphql_request, user, django_user_model
+    ):
+        """Test a post returns only its latest interactions"""
+        post = Post.objects.create(author=user, content="Popular post")
+        likers = django_user_model.objects.bulk_create(
+            django_user_model(username=f"liker{i}")
+            for i in range(INTERACTIONS_PER_POST + 5)
+        )
+        Interaction.objects.bulk_create(
+            Interaction(post=post, user=liker, interaction_type="like")
+            for liker in likers
+        )
+        query = """
+            query($id: ID!) {
+                post(id: $id) { interactions { user { username } } }
+            }
+        """
+
+        result = graphql_client.execute(
+            query, variables={"id": post.id}, context_value=graphql_request
+        )
+
+        assert len(result["data"]["post"]["interactions"]) == INTERACTIONS_PER_POST
+
+    def test_hot_feed_page_served_without_queries(
+        self, graphql_client, graphql_request, post, comment, django_assert_num_queries
+    ):
+        """Test a cached page-1 feed is served from materialized rows"""
+        query = """
+            query {
+                posts(page: 1, perPage: 10) {
+                    id
+                    content
+                    author {
+                        username
+                    }
+                    comments {
+                        content
+                        author {
+                            username
+                        }
+                    }
+                }
+            }
+        """
+
+        first = graphql_client.execute(query)
+        with django_assert_num_queries(0):
+            second = graphql_client.execute(query, context_value=graphql_request)
+
+        assert "errors" not in second
+        assert second == first
+        assert second["data"]["posts"][0]["comments"][0]["content"] == comment.content
+
+    def test_feed_page_rebuilds_only_edited_fragment(
+        self, graphql_client, user, django_assert_num_queries
+    ):
+        """Test an edit invalidates one fragment and the page picks it up"""
+        posts = [
+            Post.objects.create(author=user, content=f"Post {i}") for i in range(3)
+        ]
+        query = "query { posts(page: 1, perPage: 10) { id content } }"
+        graphql_client.execute(query)
+
+        edited = posts[0]
+        Post.objects.filter(pk=edited.pk).update(content="Edited")
+        CacheManager.invalidate_post(edited.pk)
+
+        fragments = CacheManager.get_post_fragments([post.pk for post in posts])
+        assert set(fragments) == {posts[1].pk, posts[2].pk}
+
+        result = graphql_client.execute(query)
+        contents = {item["id"]: item["content"] for item in result["data"]["posts"]}
+        assert contents[str(edited.pk)] == "Edited"
+
+    def test_feed_page_assembled_from_cached_posts(
+        self, graphql_client, graphql_request, user, django_assert_num_queries
+    ):
+        """Test a cached page of IDs queries only the posts missing from the cache"""
+        posts = [
+            Post.objects.create(author=user, content=f"Post {i}") for i in range(20)
+        ]
+        query = "query { posts(page: 2, perPage: 10) { id content } }"
+        first = graphql_client.execute(query)
+
+        edited = posts[0]
+        Post.objects.filter(pk=edited.pk).update(content="Edited")
+        CacheManager.invalidate_post(edited.pk)
+
+        # One id__in query for the invalidated post
+        with django_assert_num_queries(1):
+            second = graphql_client.execute(query, context_value=graphql_request)
+
+        assert "errors" not in second
+        assert [item["id"] for item in second["data"]["posts"]] == [
+            item["id"] for item in first["data"]["posts"]
+        ]
+        contents = {item["id"]: item["content"] for item in second["data"]["posts"]}
+        assert contents[str(edited.pk)] == "Edited"
+
+    def test_search_uses_full_text_ranking(self, graphql_client, user):
+        """Test search matches stemmed words and ranks the best match first"""
+        Post.objects.create(author=user, content="Nothing relevant here")
+        Post.objects.create(author=user, content="I went running once")
+        Post.objects.create(author=user, content="Running, runners and a long run")
+
+        query = """
+            query {
+                posts(search: "run") {
+                    content
+                }
+            }
+        """
+
+        result = graphql_client.execute(query)
+        assert "errors" not in result
+        contents = [post["content"] for post in result["data"]["posts"]]
+        assert contents == ["Running, runners and a long run", "I went running once"]
+
+    def test_search_typeahead_matches_prefix(self, graphql_client, user):
+        """Test typeahead mode treats the last word as a prefix"""
+        Post.objects.create(author=user, content="Django performance tips")
+        Post.objects.create(author=user, content="Python packaging")
+
+        query = """
+            query {
+                posts(search: "django perf", searchMode: TYPEAHEAD) {
+                    content
+                }
+            }
+        """
+
+        result = graphql_client.execute(query)
+        assert "errors" not in result
+        assert result["data"]["posts"] == [{"content": "Django performance tips"}]
@@ -0,0 +1,213 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+from posts import counters, ranking
+from posts.models import Post
+
+RANKED = """
+    query($sort: PostSort!) {
+        posts(sort: $sort) {
+            id
+        }
+    }
+"""
+
+LIKE = "mutation($postId: ID!) { likePost(postId: $postId) { liked } }"
+SHARE = "mutation($postId: ID!) { sharePost(postId: $postId) { shared } }"
+
+
+@pytest.fixture
+def as_user(rf):
+    def request_for(user):
+        request = rf.post("/graphql/")
+        request.user = user
+        return request
+
+    return request_for
+
+
+@pytest.fixture
+def ranked_ids(graphql_client, graphql_request):
+    def ids(sort):
+        result = graphql_client.execute(
+            RANKED, variables={"sort": sort}, context_value=graphql_request
+        )
+        assert "errors" not in result
+        return [int(post["id"]) for post in result["data"]["posts"]]
+
+    return ids
+
+
+@pytest.fixture
+def posts(user, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        created = [
+            Post.objects.create(author=user, content=f"Post {i}") for i in range(3)
+        ]
+        for post in created:
+            ranking.add(post)
+    return created
+
+
+@pytest.mark.django_db
+class TestRankedFeeds:
+
+    def test_engagement_reorders_hot_top_and_trending(
+        self,
+        graphql_client,
+        as_user,
+        user,
+        another_user,
+        posts,
+        ranked_ids,
+        django_capture_on_commit_callbacks,
+    ):
+        """Test likes and shares move a post up every ranking as they happen"""
+        assert ranked_ids("HOT") == [post.id for post in reversed(posts)]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            for liker in (user, another_user):
+                graphql_client.execute(
+                    LIKE,
+                    variables={"postId": posts[0].id},
+                    context_value=as_user(liker),
+                )
+            graphql_client.execute(
+                SHARE, variables={"postId": posts[1].id}, context_value=as_user(user)
+            )
+
+        # A share (3) outweighs two likes (2)
+        expected = [posts[1].id, posts[0].id]
+        assert ranked_ids("HOT")[:2] == expected
+        assert ranked_ids("TOP_24H")[:2] == expected
+        assert ranked_ids("TRENDING") == expected
+
+    def test_unlike_lowers_the_score(
+        self, graphql_client, as_user, user, posts, django_capture_on_commit_callbacks
+    ):
+        """Test toggling a like off takes its engagement back"""
+        post = posts[0]
+        with django_capture_on_commit_callbacks(execute=True):
+            graphql_client.execute(
+                LIKE, variables={"postId": post.id}, context_value=as_user(user)
+            )
+        liked = ranking._client().zscore(ranking._key(ranking.HOT), post.id)
+        assert liked == pytest.approx(ranking.hot_score(1, post.created_at))
+
+        with django_capture_on_commit_callbacks(execute=True):
+            graphql_client.execute(
+                LIKE, variables={"postId": post.id}, context_value=as_user(user)
+            )
+        unliked = ranking._client().zscore(ranking._key(ranking.HOT), post.id)
+        assert unliked == pytest.approx(ranking.hot_score(0, post.created_at))
+
+    def test_hot_score_survives_counter_flush(
+        self,
+        graphql_client,
+        as_user,
+        user,
+        another_user,
+        posts,
+        django_capture_on_commit_callbacks,
+    ):
+        """Test the HOT score counts pending likes the same as flushed ones"""
+        post = posts[0]
+        with django_capture_on_commit_callbacks(execute=True):
+            graphql_client.execute(
+                LIKE, variables={"postId": post.id}, context_value=as_user(user)
+            )
+        counters.flush()
+        with django_capture_on_commit_callbacks(execute=True):
+            graphql_client.execute(
+                LIKE, variables={"postId": post.id}, context_value=as_user(another_user)
+            )
+
+        score = ranking._client().zscore(ranking._key(ranking.HOT), post.id)
+        assert score == pytest.approx(ranking.hot_score(2, post.created_at))
+
+    def test_rebuild_windows(self, user, ranked_ids):
+        """Test TOP_24H only ranks the last day's posts and TRENDING favours recent activity"""
+        now = timezone.now()
+        old, steady, rising = [
+            Post.objects.create(author=user, content=f"Post {i}") for i in range(3)
+        ]
+        Post.objects.filter(pk=old.pk).update(
+            created_at=now - timedelta(days=2), likes_count=50
+        )
+        Post.objects.filter(pk=steady.pk).update(likes_count=3)
+        Post.objects.filter(pk=rising.pk).update(likes_count=4)
+
+        rows = Post.objects.values_list(
+            "id", "created_at", "likes_count", "comments_count", "shares_count"
+        )
+        events = [(steady.id, "likes_count", now - timedelta(hours=9))] * 3 + [
+            (rising.id, "likes_count", now)
+        ]
+        assert ranking.rebuild(rows, events) == 3
+
+        assert ranked_ids("TOP_24H") == [rising.id, steady.id]
+        assert ranked_ids("TRENDING") == [rising.id, steady.id]
+        assert ranked_ids("HOT")[0] == rising.id
+
+    def test_rankings_are_served_during_rebuild(self, posts, ranked_ids):
+        """Test ranked feeds keep the old rankings until the rebuild swaps in"""
+        before = ranked_ids("HOT")
+        seen = []
+
+        def rows():
+            for post in posts:
+                seen.append(ranked_ids("HOT"))
+                yield post.id, post.created_at, 0, 0, 0
+
+        ranking.rebuild(rows(), [])
+
+        assert seen == [before] * len(posts)
+        assert sorted(ranked_ids("HOT")) == sorted(before)
+        assert not ranking._client().keys("*:rebuild:*")
+
+    def test_rebuild_command_matches_incremental_scores(
+        self, graphql_client, as_user, user, posts, django_capture_on_commit_callbacks
+    ):
+        """Test rebuild_rankings reproduces the scores kept up by mutations"""
+        with django_capture_on_commit_callbacks(execute=True):
+            graphql_client.execute(
+                SHARE, variables={"postId": posts[2].id}, context_value=as_user(user)
+            )
+        key = ranking._key(ranking.HOT)
+        incremental = dict(ranking._client().zrange(key, 0, -1, withscores=True))
+
+        call_command("rebuild_rankings", stdout=StringIO())
+
+        rebuilt = dict(ranking._client().zrange(key, 0, -1, withscores=True))
+        assert rebuilt == pytest.approx(incremental)
+
+    def test_deleted_posts_are_skipped(
+        self,
+        graphql_client,
+        as_user,
+        user,
+        posts,
+        ranked_ids,
+        django_capture_on_commit_callbacks,
+    ):
+        """Test a deleted post disappears from ranked pages"""
+        with django_capture_on_commit_callbacks(execute=True):
+            graphql_client.execute(
+                "mutation($postId: ID!) { deletePost(postId: $postId) { success } }",
+                variables={"postId": posts[1].id},
+                context_value=as_user(user),
+            )
+
+        assert ranked_ids("HOT") == [posts[2].id, posts[0].id]
+        assert posts[1].id not in ranked_ids("TOP_24H")
+
+    def test_sort_rejects_filters(self, graphql_client, graphql_request):
+        """Test sort cannot be combined with search or a user filter"""
+        result = graphql_client.execute(
+            '{ posts(sort: HOT, search: "hello") { id } }',
+            context_value=graphql_request,
+        )
+        assert "cannot be combined" in result["errors"][0]["message"]
@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from graphql import GraphQLError
+from posts import ratelimit
+
+
+@pytest.fixture
+def request_for(rf, user):
+    request = rf.post("/graphql/")
+    request.user = user
+    return request
+
+
+@pytest.mark.django_db
+class TestTokenBucket:
+
+    def test_burst_then_reject(self, request_for):
+        """Test a bucket allows `count` calls at once, then refuses with a retry hint"""
+        for _ in range(3):
+            ratelimit.consume(request_for, "test", "3/m")
+
+        with pytest.raises(GraphQLError) as error:
+            ratelimit.consume(request_for, "test", "3/m")
+        assert error.value.extensions["code"] == "RATE_LIMITED"
+        assert 0 < error.value.extensions["retryAfter"] <= 20
+
+    def test_refill(self, request_for):
+        """Test tokens come back at the configured rate"""
+        for _ in range(10):
+            ratelimit.consume(request_for, "test", "10/s")
+        with pytest.raises(GraphQLError):
+            ratelimit.consume(request_for, "test", "10/s")
+
+        time.sleep(0.25)
+        ratelimit.consume(request_for, "test", "10/s")
+
+    def test_weights(self, request_for):
+        """Test expensive calls spend more of the same bucket"""
+        assert ratelimit.consume(request_for, "test", "10/m", cost=7) == 3
+        with pytest.raises(GraphQLError):
+            ratelimit.consume(request_for, "test", "10/m", cost=4)
+        ratelimit.consume(request_for, "test", "10/m", cost=3)
+
+    def test_local_precheck_sheds_without_redis(self, request_for, monkeypatch):
+        """Test a bucket known to be empty is refused without a Redis round-trip"""
+        ratelimit.consume(request_for, "test", "1/h")
+        with pytest.raises(GraphQLError):
+            ratelimit.consume(request_for, "test", "1/h")
+
+        def fail():
+            raise AssertionError("Redis was called")
+
+        monkeypatch.setattr(ratelimit, "_token_bucket", fail)
+        with pytest.raises(GraphQLError):
+            ratelimit.consume(request_for, "test", "1/h")
+
+    def test_clients_have_separate_buckets(self, request_for, rf, another_user):
+        """Test one user's spending does not limit another"""
+        ratelimit.consume(request_for, "test", "1/m")
+        other = rf.post("/graphql/")
+        other.user = another_user
+
+        ratelimit.consume(other, "test", "1/m")
+
+    def test_forwarded_clients_have_separate_buckets(self, rf):
+        """Test anonymous clients behind nginx are limited by their forwarded IP"""
+
+        def anonymous(forwarded_for, remote_addr="172.18.0.5"):
+            request = rf.post(
+                "/graphql/",
+                REMOTE_ADDR=remote_addr,
+                HTTP_X_FORWARDED_FOR=forwarded_for,
+            )
+            request.user = AnonymousUser()
+            return request
+
+        ratelimit.consume(anonymous("203.0.113.7"), "test", "1/m")
+        ratelimit.consume(anonymous("203.0.113.8"), "test", "1/m")
+        with pytest.raises(GraphQLError):
+            ratelimit.consume(anonymous("198.51.100.1, 203.0.113.7"), "test", "1/m")
+
+        # Only trusted proxies may set the header
+        ratelimit.consume(anonymous("203.0.113.9", "198.51.100.2"), "test", "1/m")
+        with pytest.raises(GraphQLError):
+            ratelimit.consume(anonymous("203.0.113.10", "198.51.100.2"), "test", "1/m")
+
+    def test_async_shares_the_bucket(self, request_for):
+        """Test the async path spends from the same bucket as the sync one"""
+        ratelimit.consume(request_for, "test", "2/m")
+        asyncio.run(ratelimit.aconsume(request_for, "test", "2/m"))
+
+        with pytest.raises(GraphQLError):
+            ratelimit.consume(request_for, "test", "2/m")
+
+    def test_mutation_rate_limit(self, client, user):
+        """Test the resolver decorator refuses calls over the rate"""
+        client.force_login(user)
+        mutation = 'mutation { createPost(content: "hello") { post { id } } }'
+
+        def create():
+            return client.post(
+                "/graphql/", {"query": mutation}, content_type="application/json"
+            ).json()
+
+        for _ in range(5):
+            assert "errors" not in create()
+        assert create()["errors"][0]["message"].startswith("Rate limit exceeded")
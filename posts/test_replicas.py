@@ -0,0 +1,83 @@
+import pytest
+from django.db import connections, router
+from django.test.utils import CaptureQueriesContext
+from posts.models import Post
+
+REPLICA = "replica"
+
+FEED = "query { postsConnection(first: 5) { edges { node { content } } } }"
+
+CREATE_POST = 'mutation { createPost(content: "Fresh post") { post { id } } }'
+
+
+@pytest.fixture(scope="module", autouse=True)
+def replica_alias(django_db_setup):
+    """
+    A second alias on the test database, standing in for a replica.
+
+    It has its own connection, so it only sees committed data: tests using it
+    run in transaction mode.
+    """
+    primary = connections["default"].settings_dict
+    connections.settings[REPLICA] = {
+        **primary,
+        "TEST": {**primary["TEST"], "MIRROR": "default"},
+    }
+    yield
+    connections[REPLICA].close()
+    connections[REPLICA].close_pool()
+    del connections[REPLICA]
+    del connections.settings[REPLICA]
+
+
+@pytest.fixture
+def replica(settings):
+    settings.DATABASE_REPLICAS = [REPLICA]
+    return REPLICA
+
+
+@pytest.fixture
+def query(client):
+    def execute(query, path="/graphql/"):
+        with CaptureQueriesContext(connections["default"]) as primary:
+            with CaptureQueriesContext(connections[REPLICA]) as replica:
+                result = client.post(
+                    path, {"query": query}, content_type="application/json"
+                ).json()
+        assert "errors" not in result
+        return len(primary), len(replica)
+
+    return execute
+
+
+@pytest.mark.django_db(transaction=True, databases=["default", REPLICA])
+class TestReplicaRouting:
+
+    def test_reads_outside_queries_use_primary(self, replica):
+        """Test code outside a GraphQL query never reads from a replica"""
+        assert router.db_for_read(Post) == "default"
+        assert router.db_for_write(Post) == "default"
+
+    @pytest.mark.parametrize("path", ["/graphql/", "/graphql/async/"])
+    def test_queries_read_from_replica(self, replica, query, post, path):
+        """Test an anonymous query reads only from the replica"""
+        primary, from_replica = query(FEED, path)
+
+        assert primary == 0
+        assert from_replica > 0
+
+    def test_writer_reads_own_writes_from_primary(
+        self, replica, query, client, user, another_user, settings
+    ):
+        """Test a user's reads stick to the primary for a while after a mutation"""
+        client.force_login(user)
+        primary, from_replica = query(CREATE_POST)
+        assert from_replica == 0
+
+        primary, from_replica = query(FEED)
+        assert primary > 0
+        assert from_replica == 0
+
+        client.force_login(another_user)
+        primary, from_replica = query(FEED)
+        assert from_replica > 0
@@ -33,3 +33,28 @@ class TestSecurityValidator:
         url = "https://example.com/image.jpg"
         result = SecurityValidator.validate_url(url)
         assert result == url
+
+    def test_validate_content_fast_path_matches_sanitizing(self):
+        """Test plain ASCII text and text needing work give the same results as before"""
+        assert SecurityValidator.validate_content("plain text") == "plain text"
+        assert SecurityValidator.validate_content(" a b\x1cc ") == "a b c"
+        with pytest.raises(GraphQLError, match="Invalid content"):
+            SecurityValidator.validate_content("union all select password")
+        # Non-ASCII letters the patterns match case-insensitively
+        with pytest.raises(GraphQLError, match="Invalid content"):
+            SecurityValidator.validate_content("unıon ſelect café")
+
+    def test_validate_contents_batch(self):
+        """Test a batch is sanitized item by item and reports the invalid one"""
+        result = SecurityValidator.validate_contents(["hello", "a  <b>", "x\ny"])
+        assert result == ["hello", "a &lt;b&gt;", "x y"]
+
+        with pytest.raises(GraphQLError) as error:
+            SecurityValidator.validate_contents(["fine", "ok", "DROP TABLE posts"])
+        assert error.value.extensions == {"index": 2}
+
+        # Keywords in different items are not one match
+        assert SecurityValidator.validate_contents(["UNION", "SELECT"]) == [
+            "UNION",
+            "SELECT",
+        ]
@@ -0,0 +1,46 @@
+import pytest
+from django.core.management import call_command
+from django.db.models import Count, Q
+from posts.models import Comment, Interaction, Post
+
+
+def _snapshot():
+    return list(
+        Post.objects.order_by("id").values_list(
+            "author__username", "content", "likes_count", "comments_count"
+        )
+    )
+
+
+@pytest.mark.django_db
+class TestSeedData:
+
+    def test_counters_match_rows(self):
+        """Test the aggregate pass sets counters from the seeded rows"""
+        call_command("seed_data", users=20, posts=50)
+
+        assert Post.objects.count() == 50
+        posts = Post.objects.annotate(
+            likes=Count(
+                "interactions", filter=Q(interactions__interaction_type="like")
+            ),
+            shares=Count(
+                "interactions", filter=Q(interactions__interaction_type="share")
+            ),
+        )
+        for post in posts:
+            assert post.likes_count == post.likes
+            assert post.shares_count == post.shares
+            assert post.comments_count == post.comments.count()
+        assert Interaction.objects.exists()
+        assert Comment.objects.exists()
+
+    def test_same_seed_is_reproducible(self):
+        """Test two runs with the same seed produce the same data"""
+        call_command("seed_data", users=10, posts=30, seed=7)
+        first = _snapshot()
+
+        Post.objects.all().delete()
+        call_command("seed_data", users=10, posts=30, seed=7)
+
+        assert _snapshot() == first
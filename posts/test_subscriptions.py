@@ -0,0 +1,261 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+from django_redis import get_redis_connection
+from posts import pubsub
+from posts.websocket import SUBPROTOCOL, websocket_application
+from socialfeed.schema import async_schema
+
+TIMEOUT = 5
+
+
+class Socket:
+    """An in-process WebSocket client driving the ASGI app"""
+
+    def __init__(self, loop, subprotocols=(SUBPROTOCOL,)):
+        self.loop = loop
+        self.incoming = asyncio.Queue()
+        self.outgoing = asyncio.Queue()
+        scope = {"type": "websocket", "path": "/graphql/ws/"}
+        scope["subprotocols"] = list(subprotocols)
+        self.incoming.put_nowait({"type": "websocket.connect"})
+        app = websocket_application(async_schema)
+        self.task = loop.create_task(app(scope, self.incoming.get, self.outgoing.put))
+
+    def send(self, message):
+        message = {"type": "websocket.receive", "text": json.dumps(message)}
+        self.loop.call_soon_threadsafe(self.incoming.put_nowait, message)
+
+    async def receive(self):
+        message = await asyncio.wait_for(self.outgoing.get(), TIMEOUT)
+        if message["type"] == "websocket.send":
+            return json.loads(message["text"])
+        return message
+
+    async def connect(self):
+        assert (await self.receive())["type"] == "websocket.accept"
+        self.send({"type": "connection_init"})
+        assert (await self.receive()) == {"type": "connection_ack"}
+
+    async def subscribe(self, operation_id, query, variables=None):
+        self.send(
+            {
+                "id": operation_id,
+                "type": "subscribe",
+                "payload": {"query": query, "variables": variables or {}},
+            }
+        )
+        # Subscribed once the worker's broker listens on a channel
+        for _ in range(100):
+            if len(pubsub.broker()):
+                return
+            await asyncio.sleep(0.01)
+
+    async def disconnect(self):
+        self.incoming.put_nowait({"type": "websocket.disconnect"})
+        await asyncio.wait_for(self.task, TIMEOUT)
+
+
+@pytest.fixture
+def run():
+    """Run coroutines on an event loop in another thread, like an ASGI worker"""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    def run(coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, loop).result(TIMEOUT * 2)
+
+    yield run
+    for task in asyncio.all_tasks(loop):
+        loop.call_soon_threadsafe(task.cancel)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(TIMEOUT)
+
+
+@pytest.fixture
+def open_socket(run):
+    sockets = []
+
+    async def open_socket(**kwargs):
+        socket = Socket(asyncio.get_running_loop(), **kwargs)
+        sockets.append(socket)
+        return socket
+
+    yield lambda **kwargs: run(open_socket(**kwargs))
+    # Release the worker's Redis subscriptions before its loop stops
+    for socket in sockets:
+        if not socket.task.done():
+            run(socket.disconnect())
+
+
+@pytest.fixture
+def mutate(graphql_client, rf, user, django_capture_on_commit_callbacks):
+    def mutate(mutation, **variables):
+        request = rf.post("/graphql/")
+        request.user = user
+        with django_capture_on_commit_callbacks(execute=True):
+            result = graphql_client.execute(
+                mutation, variables=variables, context_value=request
+            )
+        assert "errors" not in result
+        return result["data"]
+
+    return mutate
+
+
+def _subscribers(name, expected):
+    """Redis subscribers of a channel, once it settles on `expected`"""
+    channel = pubsub._channel(name)
+    for _ in range(100):
+        count = dict(get_redis_connection("default").pubsub_numsub(channel))
+        if count[channel.encode()] == expected:
+            break
+        time.sleep(0.01)
+    return count[channel.encode()]
+
+
+@pytest.mark.django_db
+class TestSubscriptions:
+
+    def test_mutations_reach_subscribers(self, run, open_socket, mutate, post):
+        """Test new posts, counter changes and comments are pushed to subscribers"""
+        created = open_socket()
+        counts = open_socket()
+        comments = open_socket()
+        run(created.connect())
+        run(counts.connect())
+        run(comments.connect())
+        run(
+            created.subscribe(
+                "1",
+                "subscription { postCreated { content author { username } likesCount } }",
+            )
+        )
+        run(
+            counts.subscribe(
+                "1",
+                "subscription($id: ID!) { postCountersChanged(id: $id) { id likesCount } }",
+                {"id": post.id},
+            )
+        )
+        run(
+            comments.subscribe(
+                "1",
+                "subscription($id: ID!) { commentAdded(postId: $id) { content post { commentsCount } } }",
+                {"id": post.id},
+            )
+        )
+
+        mutate('mutation { createPost(content: "Fresh") { post { id } } }')
+        assert run(created.receive()) == {
+            "id": "1",
+            "type": "next",
+            "payload": {
+                "data": {
+                    "postCreated": {
+                        "content": "Fresh",
+                        "author": {"username": "testuser"},
+                        "likesCount": 0,
+                    }
+                }
+            },
+        }
+
+        mutate("mutation($id: ID!) { likePost(postId: $id) { liked } }", id=post.id)
+        event = run(counts.receive())
+        assert event["payload"]["data"]["postCountersChanged"] == {
+            "id": str(post.id),
+            "likesCount": 1,
+        }
+
+        mutate(
+            'mutation($id: ID!) { createComment(postId: $id, content: "Hi") { comment { id } } }',
+            id=post.id,
+        )
+        event = run(comments.receive())
+        assert event["payload"]["data"]["commentAdded"] == {
+            "content": "Hi",
+            "post": {"commentsCount": 1},
+        }
+
+    def test_one_redis_subscription_per_worker(self, run, open_socket):
+        """Test every socket on a worker shares one Redis channel subscription"""
+        sockets = [open_socket() for _ in range(20)]
+        for socket in sockets:
+            run(socket.connect())
+            run(socket.subscribe("feed", "subscription { postCreated { id } }"))
+
+        assert _subscribers(pubsub.POST_CREATED, 1) == 1
+
+        for socket in sockets:
+            run(socket.disconnect())
+        assert _subscribers(pubsub.POST_CREATED, 0) == 0
+
+    def test_complete_stops_a_subscription(self, run, open_socket):
+        """Test a client `complete` unsubscribes without closing the socket"""
+        socket = open_socket()
+        run(socket.connect())
+        run(socket.subscribe("feed", "subscription { postCreated { id } }"))
+
+        socket.send({"id": "feed", "type": "complete"})
+        socket.send({"type": "ping"})
+        assert run(socket.receive()) == {"type": "pong"}
+        assert _subscribers(pubsub.POST_CREATED, 0) == 0
+
+    def test_protocol_errors(self, run, open_socket):
+        """Test the socket enforces the graphql-transport-ws handshake and rules"""
+        socket = open_socket(subprotocols=())
+        assert run(socket.receive())["code"] == 4406
+
+        socket = open_socket()
+        assert run(socket.receive())["type"] == "websocket.accept"
+        socket.send(
+            {"id": "1", "type": "subscribe", "payload": {"query": "{ me { id } }"}}
+        )
+        assert run(socket.receive())["code"] == 4401
+
+        socket = open_socket()
+        run(socket.connect())
+        socket.send(
+            {"id": "1", "type": "subscribe", "payload": {"query": "{ me { id } }"}}
+        )
+        error = run(socket.receive())
+        assert error["type"] == "error"
+        assert (
+            error["payload"][0]["message"]
+            == "Only subscriptions are served over WebSocket"
+        )
+
+    def test_selections_limited_to_event_payload(self, run, open_socket):
+        """Test a subscription cannot select fields that would query per event"""
+        socket = open_socket()
+        run(socket.connect())
+        socket.send(
+            {
+                "id": "1",
+                "type": "subscribe",
+                "payload": {
+                    "query": "subscription { postCreated { ...Post } }"
+                    " fragment Post on PostType { id comments { content } }"
+                },
+            }
+        )
+        error = run(socket.receive())
+        assert error["type"] == "error"
+        assert (
+            error["payload"][0]["message"]
+            == "PostType.comments cannot be selected in a subscription"
+        )
+
+    def test_subscriptions_rejected_over_http(self, client):
+        """Test the HTTP endpoint points subscriptions to the WebSocket"""
+        response = client.post(
+            "/graphql/async/",
+            {"query": "subscription { postCreated { id } }"},
+            content_type="application/json",
+        )
+        assert response.status_code == 400
@@ -0,0 +1,113 @@
+import pytest
+from posts.models import Post, TimelineEntry
+from posts.timeline import fan_out_post
+
+FOLLOW = """
+    mutation($userId: ID!) {
+        followUser(userId: $userId) {
+            following
+        }
+    }
+"""
+
+HOME_FEED = """
+    query {
+        homeFeed(first: 10) {
+            edges {
+                node {
+                    content
+                }
+            }
+        }
+    }
+"""
+
+
+@pytest.fixture
+def as_user(rf):
+    """Build a request context authenticated as the given user"""
+
+    def make(user):
+        request = rf.post("/graphql/")
+        request.user = user
+        return request
+
+    return make
+
+
+def home_feed(graphql_client, request):
+    result = graphql_client.execute(HOME_FEED, context_value=request)
+    assert "errors" not in result
+    return [edge["node"]["content"] for edge in result["data"]["homeFeed"]["edges"]]
+
+
+@pytest.mark.django_db
+class TestHomeTimeline:
+
+    def test_home_feed_requires_auth(self, graphql_client, graphql_request):
+        """Test anonymous users cannot read a home feed"""
+        result = graphql_client.execute(HOME_FEED, context_value=graphql_request)
+        assert "errors" in result
+
+    def test_new_post_fans_out_to_followers(
+        self,
+        graphql_client,
+        as_user,
+        user,
+        another_user,
+        django_capture_on_commit_callbacks,
+    ):
+        """Test following a user delivers their new posts"""
+        result = graphql_client.execute(
+            FOLLOW, variables={"userId": another_user.id}, context_value=as_user(user)
+        )
+        assert result["data"]["followUser"]["following"] is True
+
+        post = Post.objects.create(author=another_user, content="Hello followers")
+        with django_capture_on_commit_callbacks(execute=True):
+            fan_out_post(post)
+            # Delivered once the transaction commits
+            assert not TimelineEntry.objects.filter(owner=user, post=post).exists()
+
+        assert TimelineEntry.objects.filter(owner=user, post=post).exists()
+        assert home_feed(graphql_client, as_user(user)) == ["Hello followers"]
+
+    def test_follow_backfills_and_unfollow_removes(
+        self, graphql_client, as_user, user, another_user
+    ):
+        """Test existing posts are backfilled on follow and dropped on unfollow"""
+        Post.objects.create(author=another_user, content="Older post")
+        variables = {"userId": another_user.id}
+
+        graphql_client.execute(FOLLOW, variables=variables, context_value=as_user(user))
+        assert home_feed(graphql_client, as_user(user)) == ["Older post"]
+
+        result = graphql_client.execute(
+            FOLLOW, variables=variables, context_value=as_user(user)
+        )
+        assert result["data"]["followUser"]["following"] is False
+        assert home_feed(graphql_client, as_user(user)) == []
+
+    def test_high_fanout_author_is_pulled_on_read(
+        self,
+        graphql_client,
+        as_user,
+        settings,
+        user,
+        another_user,
+        django_capture_on_commit_callbacks,
+    ):
+        """Test authors over the threshold are merged in at read time"""
+        settings.TIMELINE_FANOUT_THRESHOLD = 0
+        graphql_client.execute(
+            FOLLOW, variables={"userId": another_user.id}, context_value=as_user(user)
+        )
+
+        post = Post.objects.create(author=another_user, content="Celebrity post")
+        own = Post.objects.create(author=user, content="My post")
+        with django_capture_on_commit_callbacks(execute=True):
+            fan_out_post(post)
+            fan_out_post(own)
+
+        assert not TimelineEntry.objects.filter(owner=user, post=post).exists()
+        assert home_feed(graphql_client, as_user(user)) == ["My post", "Celebrity post"]
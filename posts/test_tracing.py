@@ -0,0 +1,78 @@
+import pytest
+from posts import tracing
+from prometheus_client import REGISTRY
+
+POST = """
+    query($id: ID!) {
+        post(id: $id) {
+            content
+            author {
+                username
+            }
+        }
+    }
+"""
+
+
+@pytest.fixture
+def query(client):
+    def execute(query, variables=None, **headers):
+        return client.post(
+            "/graphql/",
+            {"query": query, "variables": variables or {}},
+            content_type="application/json",
+            headers=headers,
+        ).json()
+
+    return execute
+
+
+@pytest.mark.django_db
+class TestTracing:
+
+    def test_trace_is_opt_in(self, query, settings, post):
+        """Test the trace is only returned when enabled and requested"""
+        settings.GRAPHQL_TRACING = True
+        assert "tracing" not in query(POST, {"id": post.id})["extensions"]
+
+        settings.GRAPHQL_TRACING = False
+        result = query(POST, {"id": post.id}, **{tracing.TRACING_HEADER: "1"})
+        assert "tracing" not in result["extensions"]
+
+    def test_trace_reports_resolvers_sql_and_cache(self, query, settings, post):
+        """Test a traced operation reports its fields, queries and cache lookups"""
+        settings.GRAPHQL_TRACING = True
+        headers = {tracing.TRACING_HEADER: "1"}
+
+        miss = query(POST, {"id": post.id}, **headers)["extensions"]["tracing"]
+        hit = query(POST, {"id": post.id}, **headers)["extensions"]["tracing"]
+
+        assert miss["operation"] == "query post"
+        assert miss["sql"]["count"] == 1
+        assert miss["cache"]["post"] == {"hits": 0, "misses": 1}
+        assert set(miss["resolvers"]) >= {"Query.post", "PostType.author"}
+        assert hit["sql"]["count"] == 0
+        # Served by the worker's local cache, without a Redis lookup
+        assert hit["cache"]["l1:post"] == {"hits": 1, "misses": 0}
+        assert "post" not in hit["cache"]
+
+    def test_traces_are_exported_by_signature(self, query, post):
+        """Test finished traces are labelled by signature, not the client's name"""
+        signature = {"operation": "query post"}
+        before = REGISTRY.get_sample_value(
+            "graphql_operation_duration_seconds_count", signature
+        )
+        query("query FeedPost($id: ID!) { post(id: $id) { id } }", {"id": post.id})
+
+        assert (
+            REGISTRY.get_sample_value(
+                "graphql_operation_duration_seconds_count", signature
+            )
+            == (before or 0) + 1
+        )
+        assert (
+            REGISTRY.get_sample_value(
+                "graphql_operation_duration_seconds_count", {"operation": "FeedPost"}
+            )
+            is None
+        )
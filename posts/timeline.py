@@ -0,0 +1,137 @@
+"""
+Home timelines.
+
+Posts are pushed into each follower's TimelineEntry rows when they are
+created (fan-out on write), so reading a timeline is one index range scan no
+matter how many accounts the reader follows. The push runs after the
+creating transaction commits. Authors with more than TIMELINE_FANOUT_THRESHOLD
+followers are not pushed; their posts are pulled at read time and merged in
+(fan-out on read).
+"""
+
+from itertools import chain, islice
+
+from django.conf import settings
+from django.db import transaction
+
+from users.models import Follow, FollowStats
+from .cache_utils import CacheManager
+from .models import Post, TimelineEntry
+from .pagination import keyset_page
+
+FANOUT_BATCH_SIZE = 1000
+
+# Posts copied into a timeline when its owner starts following someone
+BACKFILL_SIZE = 50
+
+
+def _fanout_threshold():
+    return getattr(settings, "TIMELINE_FANOUT_THRESHOLD", 10_000)
+
+
+def is_pull_author(user_id):
+    """Whether an author has too many followers to fan out on write"""
+    stats = FollowStats.objects.filter(pk=user_id).first()
+    return stats is not None and stats.followers_count > _fanout_threshold()
+
+
+def fan_out_post(post):
+    """Push a new post into its author's and followers' timelines"""
+    fan_out_posts([post])
+
+
+def fan_out_posts(posts):
+    """
+    Push new posts by one author into their author's and followers' timelines
+
+    Runs once the current transaction commits, so a popular author's post
+    does not hold the mutation's transaction open while up to
+    TIMELINE_FANOUT_THRESHOLD followers' rows are written.
+    """
+    posts = list(posts)
+    transaction.on_commit(lambda: _deliver(posts))
+
+
+def _deliver(posts):
+    author_id = posts[0].author_id
+    owner_ids = iter([author_id])
+    if not is_pull_author(author_id):
+        follower_ids = (
+            Follow.objects.filter(followee_id=author_id)
+            .values_list("follower_id", flat=True)
+            .iterator(chunk_size=FANOUT_BATCH_SIZE)
+        )
+        owner_ids = chain(owner_ids, follower_ids)
+
+    # One INSERT (and transaction) per batch of rows
+    per_batch = max(FANOUT_BATCH_SIZE // len(posts), 1)
+    while batch := list(islice(owner_ids, per_batch)):
+        TimelineEntry.objects.bulk_create(
+            [
+                TimelineEntry(owner_id=owner_id, post=post, created_at=post.created_at)
+                for owner_id in batch
+                for post in posts
+            ],
+            ignore_conflicts=True,
+        )
+
+
+def backfill(follower, followee):
+    """Copy a newly followed author's recent posts into the follower's timeline"""
+    if is_pull_author(followee.id):
+        return
+
+    recent = Post.objects.filter(author=followee).order_by("-created_at")[
+        :BACKFILL_SIZE
+    ]
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(owner=follower, post=post, created_at=post.created_at)
+            for post in recent
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def remove_author(follower, followee):
+    """Drop an unfollowed author's posts from the follower's timeline"""
+    TimelineEntry.objects.filter(owner=follower, post__author=followee).delete()
+
+
+def pull_author_ids(user):
+    """IDs of followed authors whose posts are merged in at read time"""
+    author_ids = CacheManager.get_pull_authors(user.id)
+    if author_ids is None:
+        author_ids = list(
+            Follow.objects.filter(
+                follower=user,
+                followee__follow_stats__followers_count__gt=_fanout_threshold(),
+            ).values_list("followee_id", flat=True)
+        )
+        CacheManager.set_pull_authors(user.id, author_ids)
+    return author_ids
+
+
+def home_feed_page(user, first, after=None):
+    """Return (posts, has_next_page) for a user's home timeline"""
+    entries, has_next_page = keyset_page(
+        TimelineEntry.objects.filter(owner=user).select_related("post__author"),
+        first,
+        after,
+        key=("created_at", "post_id"),
+    )
+    posts = [entry.post for entry in entries]
+
+    author_ids = pull_author_ids(user)
+    if author_ids:
+        pulled, more_pulled = keyset_page(
+            Post.objects.filter(author_id__in=author_ids).select_related("author"),
+            first,
+            after,
+        )
+        seen = {post.id for post in posts}
+        posts.extend(post for post in pulled if post.id not in seen)
+        posts.sort(key=lambda post: (post.created_at, post.id), reverse=True)
+        has_next_page = has_next_page or more_pulled or len(posts) > first
+
+    return posts[:first], has_next_page
@@ -0,0 +1,172 @@
+"""
+Per-operation GraphQL tracing.
+
+`trace()` opens a Trace around one GraphQL operation. While it is active,
+`TracingMiddleware` (a Graphene middleware) times every resolver, an
+`execute_wrapper` installed on every DB connection counts SQL, and `CacheManager`
+reports its hits, misses and round-trips. Finished traces are exported to
+Prometheus (posts.metrics), labelled by their signature; when GRAPHQL_TRACING
+is on, a client can also ask for its own trace in the response's
+`extensions.tracing`.
+"""
+
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from . import metrics
+
+# Request header a client sends to get its trace back in the response
+TRACING_HEADER = "X-GraphQL-Tracing"
+
+# Cache stats of the per-worker cache (posts.local_cache) are kept under
+# "l1:<prefix>", next to the Redis stats of the same prefix
+LOCAL_CACHE_PREFIX = "l1"
+
+_current = ContextVar("graphql_trace", default=None)
+
+
+class Trace:
+    """Timings and counters for a single GraphQL operation"""
+
+    def __init__(self, operation_name=None):
+        self.operation_name = operation_name
+        self.operation_type = None
+        self.root_fields = []
+        self.started = time.perf_counter()
+        self.duration = None
+        # "Type.field" -> [calls, total seconds, max seconds]
+        self.resolvers = defaultdict(lambda: [0, 0.0, 0.0])
+        self.sql_count = 0
+        self.sql_time = 0.0
+        # cache prefix -> [hits, misses]
+        self.cache = defaultdict(lambda: [0, 0])
+        # cache prefix -> Redis round-trips
+        self.round_trips = defaultdict(int)
+        self.failed = False
+
+    @property
+    def signature(self):
+        """The operation type and root fields, e.g. "query me,posts" """
+        if self.root_fields:
+            return f"{self.operation_type} {','.join(sorted(self.root_fields))}"
+        return "anonymous"
+
+    @property
+    def name(self):
+        """The operation name, or its signature for anonymous operations"""
+        return self.operation_name or self.signature
+
+    def add_resolver(self, key, elapsed):
+        stats = self.resolvers[key]
+        stats[0] += 1
+        stats[1] += elapsed
+        stats[2] = max(stats[2], elapsed)
+
+    def add_query(self, elapsed):
+        self.sql_count += 1
+        self.sql_time += elapsed
+
+    def add_cache(self, prefix, hits, misses):
+        stats = self.cache[prefix]
+        stats[0] += hits
+        stats[1] += misses
+
+    def add_round_trip(self, prefix, count=1):
+        self.round_trips[prefix] += count
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.started
+
+    def as_dict(self):
+        """The trace as returned in `extensions.tracing`"""
+        return {
+            "operation": self.name,
+            "durationMs": _ms(self.duration or 0),
+            "sql": {"count": self.sql_count, "durationMs": _ms(self.sql_time)},
+            "cache": {
+                prefix: {"hits": hits, "misses": misses}
+                for prefix, (hits, misses) in sorted(self.cache.items())
+            },
+            "redisRoundTrips": dict(sorted(self.round_trips.items())),
+            "resolvers": {
+                key: {"count": count, "totalMs": _ms(total), "maxMs": _ms(longest)}
+                for key, (count, total, longest) in sorted(self.resolvers.items())
+            },
+        }
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+def current_trace():
+    """The trace of the operation running in this context, if any"""
+    return _current.get()
+
+
+def _sql_wrapper(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        trace = _current.get()
+        if trace is not None:
+            trace.add_query(time.perf_counter() - started)
+
+
+def install_sql_wrapper(connection, **kwargs):
+    """
+    connection_created receiver adding the query counter to a connection
+
+    Installed for good rather than per trace: connections are per thread, and
+    an async operation runs its queries on a different thread than the one
+    that opened the trace.
+    """
+    if _sql_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_sql_wrapper)
+
+
+@contextmanager
+def trace(operation_name=None):
+    """Trace everything that runs inside the block as one operation"""
+    current = Trace(operation_name)
+    token = _current.set(current)
+    try:
+        yield current
+    finally:
+        current.finish()
+        _current.reset(token)
+        metrics.observe_trace(current)
+
+
+def record_cache(prefix, hits, misses=0):
+    """Count a cache lookup (one round-trip) against the current trace"""
+    current = _current.get()
+    if current is not None:
+        current.add_cache(prefix, hits, misses)
+        current.add_round_trip(prefix)
+
+
+def record_local_cache(prefix, hits, misses=0):
+    """Count a lookup in the worker's local cache (no round-trip), as "l1:<prefix>" """
+    current = _current.get()
+    if current is not None:
+        current.add_cache(f"{LOCAL_CACHE_PREFIX}:{prefix}", hits, misses)
+
+
+def record_round_trip(prefix, count=1):
+    """Count Redis round-trips that are not lookups against the current trace"""
+    current = _current.get()
+    if current is not None:
+        current.add_round_trip(prefix, count)
+
+
+def wants_tracing(request):
+    """Whether to return the trace in the response (opt-in per request)"""
+    return getattr(settings, "GRAPHQL_TRACING", False) and request.headers.get(
+        TRACING_HEADER
+    ) in ("1", "true")
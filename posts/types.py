@@ -2,6 +2,34 @@ import graphene
 from graphene_django import DjangoObjectType
 from django.contrib.auth.models import User
 from .models import Post, Comment, Interaction
+from .loaders import get_loaders
+from . import ranking, search
+
+
+def load_user(info, instance, field):
+    """Resolve a user FK through the request's user loader unless already cached"""
+    descriptor = getattr(type(instance), field)
+    if descriptor.is_cached(instance):
+        return getattr(instance, field)
+    return get_loaders(info).user.load(getattr(instance, f"{field}_id"))
+
+
+def with_pending(info, post, field):
+    """Stored counter plus any write-behind delta not yet flushed"""
+    pending = get_loaders(info).pending_counters.load(post.id)
+    return getattr(post, field) + pending.get(field, 0)
+
+
+class SearchMode(graphene.Enum):
+    FULL_TEXT = search.FULL_TEXT
+    TYPEAHEAD = search.TYPEAHEAD
+
+
+class PostSort(graphene.Enum):
+    NEW = "new"
+    HOT = ranking.HOT
+    TOP_24H = ranking.TOP_24H
+    TRENDING = ranking.TRENDING
 
 
 class UserType(DjangoObjectType):
@@ -15,15 +43,22 @@ class CommentType(DjangoObjectType):
         model = Comment
         fields = ("id", "post", "author", "content", "created_at")
 
+    def resolve_author(self, info):
+        return load_user(info, self, "author")
+
 
 class InteractionType(DjangoObjectType):
     class Meta:
         model = Interaction
         fields = ("id", "post", "user", "interaction_type", "created_at")
 
+    def resolve_user(self, info):
+        return load_user(info, self, "user")
+
 
 class PostType(DjangoObjectType):
     comments = graphene.List(CommentType)
+    interactions = graphene.List(InteractionType)
 
     class Meta:
         model = Post
@@ -39,6 +74,33 @@ class PostType(DjangoObjectType):
             "updated_at",
         )
 
+    def resolve_author(self, info):
+        return load_user(info, self, "author")
+
+    def resolve_likes_count(self, info):
+        return with_pending(info, self, "likes_count")
+
+    def resolve_comments_count(self, info):
+        return with_pending(info, self, "comments_count")
+
+    def resolve_shares_count(self, info):
+        return with_pending(info, self, "shares_count")
+
     def resolve_comments(self, info):
-        # Optimized: only fetch recent comments
-        return self.comments.select_related("author").all()[:10]
+        # Only the most recent comments, batched across every post in the request
+        comments = get_loaders(info).comments_by_post.load(self.id)
+        for comment in comments:
+            Comment.post.field.set_cached_value(comment, self)
+        return comments
+
+    def resolve_interactions(self, info):
+        # Only the most recent interactions, batched like comments
+        interactions = get_loaders(info).interactions_by_post.load(self.id)
+        for interaction in interactions:
+            Interaction.post.field.set_cached_value(interaction, self)
+        return interactions
+
+
+class PostConnection(graphene.relay.Connection):
+    class Meta:
+        node = PostType
@@ -1,6 +1,407 @@
-from django.http import JsonResponse
-from django.db import connection
+import hmac
+import inspect
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import authenticate, get_user
+from django.contrib.auth.models import AnonymousUser
+from django.http import (
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseForbidden,
+    HttpResponseNotAllowed,
+    JsonResponse,
+)
+from django.db import connection, transaction
 from django.core.cache import cache
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.views import GraphQLView, HttpError
+from graphql import (
+    ExecutionResult,
+    GraphQLError,
+    OperationType,
+    execute,
+    get_operation_ast,
+    parse,
+    validate,
+    validate_schema,
+)
+from graphql_jwt.exceptions import JSONWebTokenError
+from graphql_jwt.utils import get_http_authorization
+
+from . import complexity, db_pools, metrics, persisted_queries, replicas, tracing
+from .middleware import AsyncExecutionMiddleware
+
+
+class FeedGraphQLView(GraphQLView):
+    """
+    GraphQL view with tracing, persisted queries and a parsed-document cache
+
+    Clients opt in to receiving the trace with the X-GraphQL-Tracing header
+    (honoured only when GRAPHQL_TRACING is enabled). Queries may be sent as
+    Apollo persisted-query hashes (see posts.persisted_queries), also over
+    GET; anonymous GET responses to those are marked cacheable for nginx.
+    Each operation is priced before it runs (see posts.complexity) and its
+    cost is returned in `extensions.cost`.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        if self.validation_rules is None:
+            self.validation_rules = complexity.validation_rules()
+
+    def dispatch(self, request, *args, **kwargs):
+        return self._cache_headers(request, super().dispatch(request, *args, **kwargs))
+
+    def execute_graphql_request(
+        self, request, data, query, variables, operation_name, show_graphiql=False
+    ):
+        if show_graphiql and not query:
+            return None
+
+        with tracing.trace(operation_name) as trace:
+            request.graphql_trace = trace
+            try:
+                result = self.get_document(request, data, query, operation_name)
+            except HttpError:
+                # GraphiQL opens with the offending query instead
+                if show_graphiql:
+                    return None
+                raise
+            if not isinstance(result, ExecutionResult):
+                document = result
+                try:
+                    cost = self._query_cost(
+                        request, document, operation_name, variables
+                    )
+                    if cost:
+                        self._authenticate_jwt(request)
+                        remaining = complexity.charge(request, cost)
+                        request.graphql_cost["remaining"] = remaining
+                except GraphQLError as e:
+                    result = ExecutionResult(errors=[e])
+                else:
+                    result = self._execute(request, document, variables, operation_name)
+            trace.failed = bool(result.errors)
+            return result
+
+    def json_encode(self, request, d, pretty=False):
+        extensions = {}
+        cost = getattr(request, "graphql_cost", None)
+        if cost is not None:
+            if self._shared(request):
+                # One client's balance must not be served to every reader
+                cost = {k: v for k, v in cost.items() if k != "remaining"}
+            extensions["cost"] = cost
+        trace = getattr(request, "graphql_trace", None)
+        if trace is not None and tracing.wants_tracing(request):
+            extensions["tracing"] = trace.as_dict()
+        if extensions:
+            d = {**d, "extensions": extensions}
+        return super().json_encode(request, d, pretty)
+
+    @staticmethod
+    def _authenticate_jwt(request):
+        """
+        Authenticate a JWT up front, so the cost is charged to the user
+
+        JSONWebTokenMiddleware then finds the user already set.
+        """
+        if request.user.is_anonymous and get_http_authorization(request):
+            try:
+                user = authenticate(request=request)
+            except JSONWebTokenError:
+                # Left to JSONWebTokenMiddleware, which reports it per field
+                user = None
+            if user is not None:
+                request.user = user
+
+    def _query_cost(self, request, document, operation_name, variables):
+        """Price the operation; raises GraphQLError if it is over budget"""
+        cost = complexity.query_cost(
+            self.schema.graphql_schema, document, operation_name, variables
+        )
+        request.graphql_cost = {
+            "requested": cost,
+            "maximum": settings.GRAPHQL_MAX_QUERY_COST,
+        }
+        complexity.check_cost(cost)
+        return cost
+
+    def get_document(self, request, data, query, operation_name):
+        """Return the validated document, or an ExecutionResult with the errors"""
+        try:
+            sha256 = self._query_hash(request, data, query)
+        except GraphQLError as e:
+            return ExecutionResult(errors=[e])
+
+        document = persisted_queries.documents.get((id(self.schema), sha256))
+        if document is None:
+            if not query:
+                query = persisted_queries.lookup(sha256)
+                if query is None:
+                    return ExecutionResult(errors=[persisted_queries.not_found()])
+            elif request.graphql_persisted:
+                persisted_queries.register(sha256, query)
+            document = self._parse_and_validate(sha256, query)
+            if isinstance(document, ExecutionResult):
+                return document
+
+        self._check_method(request, document, operation_name)
+        return document
+
+    @staticmethod
+    def _query_hash(request, data, query):
+        """The hash the document is cached under: the persisted one, if sent"""
+        sha256 = persisted_queries.requested_hash(request, data)
+        request.graphql_persisted = sha256 is not None
+        if sha256 is None:
+            if not query:
+                raise HttpError(HttpResponseBadRequest("Must provide query string."))
+            return persisted_queries.query_hash(query)
+        if query:
+            persisted_queries.check_hash(sha256, query)
+        return sha256
+
+    def _parse_and_validate(self, sha256, query):
+        schema = self.schema.graphql_schema
+        schema_validation_errors = validate_schema(schema)
+        if schema_validation_errors:
+            return ExecutionResult(data=None, errors=schema_validation_errors)
+
+        try:
+            document = parse(query)
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+
+        validation_errors = validate(
+            schema,
+            document,
+            self.validation_rules,
+            graphene_settings.MAX_VALIDATION_ERRORS,
+        )
+        if validation_errors:
+            return ExecutionResult(data=None, errors=validation_errors)
+
+        persisted_queries.documents.set((id(self.schema), sha256), document)
+        return document
+
+    @staticmethod
+    def _check_method(request, document, operation_name):
+        """GET requests may only run queries; subscriptions need the WebSocket"""
+        operation_ast = get_operation_ast(document, operation_name)
+        if (
+            operation_ast is not None
+            and operation_ast.operation == OperationType.SUBSCRIPTION
+        ):
+            raise HttpError(
+                HttpResponseBadRequest(
+                    "Subscriptions are served over WebSocket at /graphql/ws/."
+                )
+            )
+        if (
+            request.method.lower() == "get"
+            and operation_ast is not None
+            and operation_ast.operation != OperationType.QUERY
+        ):
+            raise HttpError(
+                HttpResponseNotAllowed(
+                    ["POST"],
+                    f"Can only perform a {operation_ast.operation.value} "
+                    "operation from a POST request.",
+                )
+            )
+
+    def _execute_options(self, request, variables, operation_name):
+        options = {
+            "root_value": self.get_root_value(request),
+            "context_value": self.get_context(request),
+            "variable_values": variables,
+            "operation_name": operation_name,
+            "middleware": self.get_middleware(request),
+        }
+        if self.execution_context_class:
+            options["execution_context_class"] = self.execution_context_class
+        return options
+
+    def _execute(self, request, document, variables, operation_name):
+        schema = self.schema.graphql_schema
+        try:
+            options = self._execute_options(request, variables, operation_name)
+            operation_ast = get_operation_ast(document, operation_name)
+            with replicas.route(request, operation_ast):
+                if (
+                    operation_ast is not None
+                    and operation_ast.operation == OperationType.MUTATION
+                    and (
+                        graphene_settings.ATOMIC_MUTATIONS is True
+                        or connection.settings_dict.get("ATOMIC_MUTATIONS", False)
+                        is True
+                    )
+                ):
+                    with transaction.atomic():
+                        result = execute(schema, document, **options)
+                        if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                            transaction.set_rollback(True)
+                    return result
+
+                return execute(schema, document, **options)
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+
+    @staticmethod
+    def _shared(request):
+        """Whether the response may be stored by shared caches if it succeeds"""
+        return (
+            request.method == "GET"
+            and getattr(request, "graphql_persisted", False)
+            and not get_http_authorization(request)
+            and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        )
+
+    @classmethod
+    def _cache_headers(cls, request, response):
+        """Let shared caches store successful anonymous persisted GETs"""
+        trace = getattr(request, "graphql_trace", None)
+        if (
+            cls._shared(request)
+            and response.status_code == 200
+            and trace is not None
+            and not trace.failed
+        ):
+            patch_cache_control(
+                response, public=True, max_age=settings.GRAPHQL_GET_MAX_AGE
+            )
+            # The CSRF cookie would stop nginx from caching the response
+            response.cookies.pop(settings.CSRF_COOKIE_NAME, None)
+        patch_vary_headers(response, ("Authorization", "Cookie"))
+        return response
+
+
+class AsyncGraphQLView(FeedGraphQLView):
+    """
+    GraphQL endpoint for ASGI servers
+
+    Executes the schema on the event loop, so independent top-level fields
+    resolve concurrently. GraphiQL and batching stay on the sync view.
+    """
+
+    view_is_async = True
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # Last is outermost: it must wrap the JWT and tracing middleware too
+        self.middleware = [*(self.middleware or []), AsyncExecutionMiddleware()]
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            if request.method.lower() not in ("get", "post"):
+                raise HttpError(
+                    HttpResponseNotAllowed(
+                        ["GET", "POST"], "GraphQL only supports GET and POST requests."
+                    )
+                )
+
+            data = self.parse_body(request)
+            await self._authenticate(request)
+            result, status_code = await self.aget_response(request, data)
+            response = HttpResponse(
+                status=status_code, content=result, content_type="application/json"
+            )
+            return self._cache_headers(request, response)
+
+        except HttpError as e:
+            response = e.response
+            response["Content-Type"] = "application/json"
+            response.content = self.json_encode(
+                request, {"errors": [self.format_error(e)]}
+            )
+            return response
+
+    @staticmethod
+    async def _authenticate(request):
+        """Load the user up front; the event loop cannot load it lazily"""
+        if settings.SESSION_COOKIE_NAME in request.COOKIES:
+            # Not request.auser(): the JWT backend has no async aget_user
+            request.user = await sync_to_async(get_user)(request)
+        else:
+            request.user = AnonymousUser()
+        if request.user.is_anonymous and get_http_authorization(request):
+            await sync_to_async(FeedGraphQLView._authenticate_jwt)(request)
+
+    async def aget_response(self, request, data):
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+        execution_result = await self.aexecute_graphql_request(
+            request, data, query, variables, operation_name
+        )
+
+        status_code = 200
+        response = {}
+        if execution_result.errors:
+            response["errors"] = [self.format_error(e) for e in execution_result.errors]
+
+        if execution_result.errors and any(
+            not getattr(e, "path", None) for e in execution_result.errors
+        ):
+            status_code = 400
+        else:
+            response["data"] = execution_result.data
+
+        return self.json_encode(request, response), status_code
+
+    async def aexecute_graphql_request(
+        self, request, data, query, variables, operation_name
+    ):
+        with tracing.trace(operation_name) as trace:
+            request.graphql_trace = trace
+            result = await self.aget_document(request, data, query, operation_name)
+            if isinstance(result, ExecutionResult):
+                return result
+
+            try:
+                cost = self._query_cost(request, result, operation_name, variables)
+                if cost:
+                    remaining = await complexity.acharge(request, cost)
+                    request.graphql_cost["remaining"] = remaining
+            except GraphQLError as e:
+                return ExecutionResult(errors=[e])
+
+            try:
+                options = self._execute_options(request, variables, operation_name)
+                operation_ast = get_operation_ast(result, operation_name)
+                async with replicas.aroute(request, operation_ast):
+                    result = execute(self.schema.graphql_schema, result, **options)
+                    if inspect.isawaitable(result):
+                        result = await result
+            except Exception as e:
+                result = ExecutionResult(errors=[e])
+
+            trace.failed = bool(result.errors)
+            return result
+
+    async def aget_document(self, request, data, query, operation_name):
+        """get_document with the registry read and written without blocking"""
+        try:
+            sha256 = self._query_hash(request, data, query)
+        except GraphQLError as e:
+            return ExecutionResult(errors=[e])
+
+        document = persisted_queries.documents.get((id(self.schema), sha256))
+        if document is None:
+            if not query:
+                query = await persisted_queries.alookup(sha256)
+                if query is None:
+                    return ExecutionResult(errors=[persisted_queries.not_found()])
+            elif request.graphql_persisted:
+                await persisted_queries.aregister(sha256, query)
+            document = self._parse_and_validate(sha256, query)
+            if isinstance(document, ExecutionResult):
+                return document
+
+        self._check_method(request, document, operation_name)
+        return document
 
 
 def health_check(request):
@@ -31,5 +432,26 @@ def health_check(request):
         health_status["checks"]["redis"] = f"error: {str(e)}"
         health_status["status"] = "unhealthy"
 
+    # Connections held by this worker's pools, for spotting exhaustion
+    pools = db_pools.usage()
+    if pools:
+        health_status["database_pools"] = pools
+
     status_code = 200 if health_status["status"] == "healthy" else 503
     return JsonResponse(health_status, status=status_code)
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint
+    Requires `Authorization: Bearer <METRICS_TOKEN>` when METRICS_TOKEN is set
+    """
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token and not hmac.compare_digest(
+        request.headers.get("Authorization", "").encode(),
+        f"Bearer {token}".encode(),
+    ):
+        return HttpResponseForbidden()
+
+    body, content_type = metrics.render()
+    return HttpResponse(body, content_type=content_type)
@@ -0,0 +1,293 @@
+"""
+GraphQL subscriptions over WebSockets, speaking the graphql-transport-ws
+protocol (as implemented by the `graphql-ws` client library).
+
+Served by the ASGI app (socialfeed.asgi) at /graphql/ws/. A client sends
+`connection_init`, optionally with {"Authorization": "JWT <token>"}, then one
+`subscribe` per subscription. Events arrive through the worker's shared
+pub/sub connection (posts.pubsub), and each is executed against the
+subscriber's selection with a fresh context, so loaders never outlive an
+event.
+"""
+
+import asyncio
+import inspect
+import json
+import logging
+from types import SimpleNamespace
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from graphql import (
+    ExecutionResult,
+    GraphQLError,
+    OperationType,
+    execute,
+    get_operation_ast,
+    parse,
+    validate,
+)
+from graphql.execution import create_source_event_stream
+from graphql_jwt.exceptions import JSONWebTokenError
+from graphql_jwt.settings import jwt_settings
+from graphql_jwt.shortcuts import get_user_by_token
+
+from . import complexity, persisted_queries, subscriptions
+from .middleware import AsyncExecutionMiddleware
+
+logger = logging.getLogger(__name__)
+
+SUBPROTOCOL = "graphql-transport-ws"
+
+# Seconds a client has to send connection_init
+CONNECTION_INIT_TIMEOUT = 10
+
+# Subscriptions one socket may hold at once
+MAX_SUBSCRIPTIONS = 100
+
+
+class _Close(Exception):
+    """Close the socket with a protocol error code"""
+
+    def __init__(self, code, reason):
+        super().__init__(reason)
+        self.code = code
+        self.reason = reason
+
+
+class GraphQLWebSocket:
+    """One client socket and its running subscriptions"""
+
+    def __init__(self, schema, send):
+        self.schema = schema
+        self._send = send
+        self.user = AnonymousUser()
+        self.acknowledged = False
+        self.initialising = False
+        self.operations = {}
+        self._closing = None
+
+    async def send(self, message):
+        await self._send({"type": "websocket.send", "text": json.dumps(message)})
+
+    async def close(self, code, reason=""):
+        await self._send({"type": "websocket.close", "code": code, "reason": reason})
+
+    async def serve(self, receive):
+        """Handle messages until the client disconnects or breaks the protocol"""
+        timeout = asyncio.get_running_loop().call_later(
+            CONNECTION_INIT_TIMEOUT, self._init_timeout
+        )
+        try:
+            while True:
+                message = await receive()
+                if message["type"] == "websocket.disconnect":
+                    return
+                if message["type"] == "websocket.receive":
+                    await self.handle(message.get("text") or message.get("bytes"))
+        except _Close as e:
+            await self.close(e.code, e.reason)
+        finally:
+            timeout.cancel()
+            await self.stop_all()
+
+    def _init_timeout(self):
+        if not self.acknowledged:
+            self._closing = asyncio.ensure_future(
+                self.close(4408, "Connection initialisation timeout")
+            )
+
+    async def handle(self, text):
+        try:
+            message = json.loads(text)
+            kind = message["type"]
+        except (TypeError, ValueError, KeyError):
+            raise _Close(4400, "Invalid message")
+
+        if kind == "connection_init":
+            await self._connection_init(message.get("payload"))
+        elif kind == "ping":
+            await self.send({"type": "pong"})
+        elif kind == "pong":
+            pass
+        elif kind == "subscribe":
+            await self._subscribe(message)
+        elif kind == "complete":
+            task = self.operations.pop(message.get("id"), None)
+            if task is not None:
+                task.cancel()
+        else:
+            raise _Close(4400, f"Unknown message type {kind!r}")
+
+    async def _connection_init(self, payload):
+        if self.initialising:
+            raise _Close(4429, "Too many initialisation requests")
+        self.initialising = True
+        try:
+            self.user = await self._authenticate(payload or {})
+        except JSONWebTokenError:
+            raise _Close(4403, "Forbidden")
+        self.acknowledged = True
+        await self.send({"type": "connection_ack"})
+
+    @staticmethod
+    async def _authenticate(payload):
+        header = payload.get("Authorization") or payload.get("authorization")
+        if not header:
+            return AnonymousUser()
+        prefix, _, token = str(header).partition(" ")
+        if prefix.lower() != jwt_settings.JWT_AUTH_HEADER_PREFIX.lower():
+            raise JSONWebTokenError("Invalid Authorization header")
+        return await sync_to_async(get_user_by_token)(token)
+
+    async def _subscribe(self, message):
+        if not self.acknowledged:
+            raise _Close(4401, "Unauthorized")
+        operation_id = message.get("id")
+        payload = message.get("payload")
+        if not isinstance(operation_id, str) or not isinstance(payload, dict):
+            raise _Close(4400, "Invalid message")
+        if operation_id in self.operations:
+            raise _Close(4409, f"Subscriber for {operation_id} already exists")
+        if len(self.operations) >= MAX_SUBSCRIPTIONS:
+            error = GraphQLError(
+                f"At most {MAX_SUBSCRIPTIONS} subscriptions per socket"
+            )
+            await self._error(operation_id, [error])
+            return
+
+        self.operations[operation_id] = asyncio.create_task(
+            self._run(operation_id, payload)
+        )
+
+    def _context(self):
+        return SimpleNamespace(user=self.user)
+
+    def _document(self, query):
+        """The validated subscription document, or a list of errors"""
+        if not isinstance(query, str):
+            return [GraphQLError("Must provide query string.")]
+        key = (id(self.schema), persisted_queries.query_hash(query))
+        document = persisted_queries.documents.get(key)
+        if document is None:
+            try:
+                document = parse(query)
+            except GraphQLError as e:
+                return [e]
+            errors = validate(
+                self.schema.graphql_schema, document, complexity.validation_rules()
+            )
+            if errors:
+                return errors
+            persisted_queries.documents.set(key, document)
+        return document
+
+    async def _run(self, operation_id, payload):
+        variables = payload.get("variables")
+        operation_name = payload.get("operationName")
+        try:
+            document = self._document(payload.get("query"))
+            if isinstance(document, list):
+                await self._error(operation_id, document)
+                return
+
+            operation = get_operation_ast(document, operation_name)
+            if operation is None or operation.operation != OperationType.SUBSCRIPTION:
+                error = GraphQLError("Only subscriptions are served over WebSocket")
+                await self._error(operation_id, [error])
+                return
+            try:
+                complexity.check_cost(
+                    complexity.query_cost(
+                        self.schema.graphql_schema, document, operation_name, variables
+                    )
+                )
+                subscriptions.check_payload_fields(
+                    self.schema.graphql_schema, document, operation_name
+                )
+            except GraphQLError as e:
+                await self._error(operation_id, [e])
+                return
+
+            stream = await create_source_event_stream(
+                self.schema.graphql_schema,
+                document,
+                context_value=self._context(),
+                variable_values=variables,
+                operation_name=operation_name,
+            )
+            if isinstance(stream, ExecutionResult):
+                await self._error(operation_id, stream.errors)
+                return
+
+            try:
+                async for event in stream:
+                    result = await self._execute(
+                        document, event, variables, operation_name
+                    )
+                    await self.send(
+                        {"id": operation_id, "type": "next", "payload": result}
+                    )
+            finally:
+                await stream.aclose()
+            await self.send({"id": operation_id, "type": "complete"})
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Subscription %s failed", operation_id)
+            await self._error(operation_id, [GraphQLError("Subscription failed")])
+        finally:
+            if self.operations.get(operation_id) is asyncio.current_task():
+                del self.operations[operation_id]
+
+    async def _execute(self, document, event, variables, operation_name):
+        result = execute(
+            self.schema.graphql_schema,
+            document,
+            root_value=event,
+            context_value=self._context(),
+            variable_values=variables,
+            operation_name=operation_name,
+            middleware=[AsyncExecutionMiddleware()],
+        )
+        if inspect.isawaitable(result):
+            result = await result
+        response = {"data": result.data}
+        if result.errors:
+            response["errors"] = [error.formatted for error in result.errors]
+        return response
+
+    async def _error(self, operation_id, errors):
+        await self.send(
+            {
+                "id": operation_id,
+                "type": "error",
+                "payload": [error.formatted for error in errors],
+            }
+        )
+
+    async def stop_all(self):
+        """Cancel every subscription and wait for their cleanup"""
+        tasks = list(self.operations.values())
+        self.operations.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def websocket_application(schema):
+    """ASGI app serving `schema`'s subscriptions to WebSocket clients"""
+
+    async def application(scope, receive, send):
+        message = await receive()
+        if message["type"] != "websocket.connect":
+            return
+        if SUBPROTOCOL not in scope.get("subprotocols", ()):
+            # Closing before accepting rejects the handshake
+            await send({"type": "websocket.close", "code": 4406})
+            return
+
+        await send({"type": "websocket.accept", "subprotocol": SUBPROTOCOL})
+        await GraphQLWebSocket(schema, send).serve(receive)
+
+    return application
@@ -8,6 +8,17 @@ APP_MODULE="socialfeed.wsgi:application"
 # Bind to $PORT if provided by the hosting environment (Render, Cloud providers)
 GUNICORN_BIND="0.0.0.0:${PORT:-8000}"
 GUNICORN_WORKERS=${GUNICORN_WORKERS:-3}
+# SERVER_MODE=asgi runs the ASGI app on uvicorn workers, which serves the
+# async GraphQL endpoint (/graphql/async/) without blocking on Postgres/Redis
+GUNICORN_WORKER_ARGS=""
+if [ "${SERVER_MODE:-wsgi}" = "asgi" ]; then
+	APP_MODULE="socialfeed.asgi:application"
+	GUNICORN_WORKER_ARGS="--worker-class uvicorn_worker.UvicornWorker"
+fi
+# SERVER_MODE=flusher runs the counter flusher instead of a web server: likes,
+# shares and comment counts are buffered in Redis and only reach Postgres
+# through it. Run exactly one next to the web service.
+FLUSH_INTERVAL=${FLUSH_INTERVAL:-2}
 
 echo "Waiting for dependent services (db/redis) if needed..."
 # Wait for DB to be ready before running migrations. Use a Django management
@@ -26,6 +37,22 @@ until python manage.py showmigrations >/dev/null 2>&1; do
 	sleep $SLEEP_TIME
 done
 
+if [ "${SERVER_MODE:-wsgi}" = "flusher" ]; then
+	# Migrations are left to the web service; wait until it has applied them
+	count=0
+	until python manage.py migrate --check >/dev/null 2>&1; do
+		count=$((count+1))
+		if [ "$count" -ge "$RETRIES" ]; then
+			echo "Timed out waiting for migrations after ${RETRIES} attempts"
+			exit 1
+		fi
+		echo "Migrations pending - sleeping ${SLEEP_TIME}s (attempt ${count}/${RETRIES})"
+		sleep $SLEEP_TIME
+	done
+	echo "Starting the counter flusher as appuser: interval=${FLUSH_INTERVAL}s"
+	exec su -s /bin/sh appuser -c "exec python manage.py flush_counters --interval ${FLUSH_INTERVAL}"
+fi
+
 echo "Running database migrations..."
 # Ensure static and media dirs are writable by the application user. This is
 # important when those paths are mounted as Docker named volumes which are
@@ -43,6 +70,12 @@ else
 	mkdir -p "$MEDIA_DIR" && chown -R appuser:appuser "$MEDIA_DIR" || true
 fi
 
+# Shared directory where every gunicorn worker writes its Prometheus samples;
+# emptied on start so counters from a previous run are not merged in.
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR" && chown -R appuser:appuser "$PROMETHEUS_MULTIPROC_DIR"
+
 echo "Running database migrations as appuser..."
 su -s /bin/sh appuser -c "python manage.py migrate --no-input"
 
@@ -54,6 +87,6 @@ if [ "$#" -ne 0 ]; then
 	echo "Running supplied command: $@"
 	exec "$@"
 else
-	echo "Starting Gunicorn as appuser: bind=${GUNICORN_BIND}, workers=${GUNICORN_WORKERS}"
-	exec su -s /bin/sh appuser -c "exec gunicorn ${APP_MODULE} --bind ${GUNICORN_BIND} --workers ${GUNICORN_WORKERS}"
+	echo "Starting Gunicorn as appuser: app=${APP_MODULE}, bind=${GUNICORN_BIND}, workers=${GUNICORN_WORKERS}"
+	exec su -s /bin/sh appuser -c "exec gunicorn ${APP_MODULE} --bind ${GUNICORN_BIND} --workers ${GUNICORN_WORKERS} ${GUNICORN_WORKER_ARGS}"
 fi
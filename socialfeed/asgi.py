@@ -13,4 +13,18 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "socialfeed.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up
+from posts.websocket import websocket_application  # noqa: E402
+from socialfeed.schema import async_schema  # noqa: E402
+
+graphql_websocket = websocket_application(async_schema)
+
+
+async def application(scope, receive, send):
+    """Django for HTTP; GraphQL subscriptions for WebSockets on /graphql/ws/"""
+    if scope["type"] == "websocket" and scope["path"] == "/graphql/ws/":
+        await graphql_websocket(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -1,6 +1,7 @@
 import graphene
-from posts.queries import Query as PostsQuery
+from posts.queries import AsyncQuery as AsyncPostsQuery, Query as PostsQuery
 from posts.mutations import Mutation as PostsMutations
+from posts.subscriptions import Subscription as PostsSubscription
 from users.mutations import Mutation as UsersMutations
 
 
@@ -14,4 +15,18 @@ class Mutation(UsersMutations, PostsMutations, graphene.ObjectType):
 
 
 
+class AsyncQuery(AsyncPostsQuery, graphene.ObjectType):
+    """Root Query for the async endpoint"""
+
+    class Meta:
+        name = "Query"
+
+
+class Subscription(PostsSubscription, graphene.ObjectType):
+    """Root Subscription, served over WebSocket"""
+
+
 schema = graphene.Schema(query=Query, mutation=Mutation)
+async_schema = graphene.Schema(
+    query=AsyncQuery, mutation=Mutation, subscription=Subscription
+)
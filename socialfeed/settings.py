@@ -20,7 +20,6 @@ import sentry_sdk
 from dotenv import load_dotenv
 from sentry_sdk.integrations.django import DjangoIntegration
 
-
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -74,6 +73,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     # Third party
     "graphene_django",
     "corsheaders",
@@ -186,9 +186,37 @@ GRAPHENE = {
     "SCHEMA": "socialfeed.schema.schema",
     "MIDDLEWARE": [
         "graphql_jwt.middleware.JSONWebTokenMiddleware",
+        "posts.middleware.TracingMiddleware",
     ],
 }
 
+# Let clients request per-resolver timings in `extensions.tracing` by sending
+# the X-GraphQL-Tracing header. Aggregated histograms are always collected.
+GRAPHQL_TRACING = os.getenv("GRAPHQL_TRACING", str(DEBUG)).lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+# Parsed and validated GraphQL documents kept per worker, keyed by query hash
+GRAPHQL_DOCUMENT_CACHE_SIZE = int(os.getenv("GRAPHQL_DOCUMENT_CACHE_SIZE", "1000"))
+
+# Shared-cache lifetime (seconds) of anonymous persisted queries sent over GET
+GRAPHQL_GET_MAX_AGE = int(os.getenv("GRAPHQL_GET_MAX_AGE", "10"))
+
+# Static query cost limits (see posts.complexity): the most one operation
+# may cost, what each client may spend per minute, and how deep it may nest
+GRAPHQL_MAX_QUERY_COST = int(os.getenv("GRAPHQL_MAX_QUERY_COST", "1000"))
+GRAPHQL_QUERY_COST_PER_MINUTE = int(os.getenv("GRAPHQL_QUERY_COST_PER_MINUTE", "20000"))
+GRAPHQL_MAX_QUERY_DEPTH = int(os.getenv("GRAPHQL_MAX_QUERY_DEPTH", "8"))
+
+# Anonymous clients are rate limited by IP. Requests from these networks (the
+# nginx in front of the app) have the client's IP read from X-Forwarded-For.
+TRUSTED_PROXIES = os.getenv(
+    "TRUSTED_PROXIES", "127.0.0.1/32,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16"
+).split(",")
+RATELIMIT_IP_META_KEY = "posts.ratelimit.client_ip"
+
 # CORS Configuration (for GraphQL Playground)
 CORS_ALLOW_ALL_ORIGINS = False
 CORS_ALLOWED_ORIGINS = os.getenv(
@@ -222,21 +250,42 @@ CACHES = {
             "CONNECTION_POOL_KWARGS": {"max_connections": 50},
             "SOCKET_CONNECT_TIMEOUT": 5,
             "SOCKET_TIMEOUT": 5,
+            # Compact msgpack payloads, zstd above COMPRESS_MIN_LENGTH bytes
+            # (see posts.cache_serializer). Entries written by django-redis's
+            # default PickleSerializer stay readable after switching to them.
+            "SERIALIZER": os.getenv(
+                "CACHE_SERIALIZER", "posts.cache_serializer.CompactSerializer"
+            ),
+            "COMPRESSOR": os.getenv(
+                "CACHE_COMPRESSOR", "posts.cache_serializer.ZstdCompressor"
+            ),
+            "COMPRESS_MIN_LENGTH": int(os.getenv("CACHE_COMPRESS_MIN_LENGTH", "256")),
         },
         "KEY_PREFIX": "socialfeed",
         "TIMEOUT": 300,  # 5 minutes default
     }
 }
 
+# Per-worker cache in front of Redis for hot posts and lists (see
+# posts.local_cache): its size cap in bytes (0 disables it) and how long an
+# entry may be served should an invalidation broadcast be missed
+LOCAL_CACHE_MAX_BYTES = int(os.getenv("LOCAL_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+LOCAL_CACHE_TIMEOUT = int(os.getenv("LOCAL_CACHE_TIMEOUT", "5"))
+
+# Home timelines: authors with more followers than this are not fanned out on
+# write; their posts are merged into followers' timelines at read time.
+TIMELINE_FANOUT_THRESHOLD = int(os.getenv("TIMELINE_FANOUT_THRESHOLD", "10000"))
+
+# Bearer token required to scrape /metrics/ (open when empty)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
 # Session engine (use Redis for sessions too)
 SESSION_ENGINE = "django.contrib.sessions.backends.cache"
 SESSION_CACHE_ALIAS = "default"
 
 
 if "DATABASE_URL" in os.environ:
-    DATABASES["default"] = dj_database_url.config(
-        conn_max_age=600, conn_health_checks=True
-    )
+    DATABASES["default"] = dj_database_url.config()
 
 # Safety guard: some CI environments or misconfigured DATABASE_URL values
 # may accidentally contain the DB user 'root', which typically does not exist
@@ -247,3 +296,62 @@ if db_user == "root":
     override = os.getenv("DB_USER_OVERRIDE", "postgres")
     warnings.warn("Detected DB_USER='root'. Overriding to '%s' for safety." % override)
     DATABASES["default"]["USER"] = override
+
+# Read replicas, as comma-separated database URLs. GraphQL queries read from
+# them; mutations, and a user's queries for REPLICA_STICKY_SECONDS after their
+# last mutation, use the primary (see posts/replicas.py). To try it locally,
+# point a replica URL at the primary database itself.
+DATABASE_REPLICAS = []
+for n, url in enumerate(
+    filter(None, os.getenv("DATABASE_REPLICA_URLS", "").split(",")), 1
+):
+    DATABASE_REPLICAS.append(f"replica_{n}")
+    DATABASES[f"replica_{n}"] = {
+        **dj_database_url.parse(url.strip()),
+        # Under test, replica aliases point at the test database
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_ROUTERS = ["posts.replicas.ReplicaRouter"]
+# Longer than the replicas' worst expected lag
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+
+# Connection handling, for every alias above (DB_POOL):
+#   psycopg    a psycopg connection pool per worker process (default)
+#   pgbouncer  persistent connections to a PgBouncer in transaction mode
+#   off        persistent connections straight to Postgres
+# Pool sizes default by worker type (SERVER_MODE, see scripts/entrypoint.sh):
+# a sync worker serves one request at a time, while an ASGI worker runs many
+# requests' ORM calls on its thread pool. Each alias gets its own pool.
+SERVER_MODE = os.getenv("SERVER_MODE", "wsgi")
+DB_POOL = os.getenv("DB_POOL", "psycopg")
+DB_POOL_SIZES = {"wsgi": (1, 4), "asgi": (2, 16)}
+DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE = DB_POOL_SIZES.get(
+    SERVER_MODE, DB_POOL_SIZES["wsgi"]
+)
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", DB_POOL_MIN_SIZE))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", DB_POOL_MAX_SIZE))
+# Seconds a request waits for a free pooled connection before failing
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+if DB_POOL not in ("psycopg", "pgbouncer", "off"):
+    raise ValueError(f"DB_POOL must be psycopg, pgbouncer or off, not {DB_POOL!r}")
+
+for database in DATABASES.values():
+    # Pooled connections are checked before use, persistent ones per request
+    database["CONN_HEALTH_CHECKS"] = True
+    if DB_POOL == "psycopg":
+        # Returned to the pool at the end of each request
+        database["CONN_MAX_AGE"] = 0
+        database.setdefault("OPTIONS", {})["pool"] = {
+            "min_size": DB_POOL_MIN_SIZE,
+            "max_size": DB_POOL_MAX_SIZE,
+            "timeout": DB_POOL_TIMEOUT,
+            # Recycle connections, so Postgres frees their memory
+            "max_lifetime": 1800,
+            "max_idle": 300,
+        }
+    else:
+        database["CONN_MAX_AGE"] = 600
+    if DB_POOL == "pgbouncer":
+        # A transaction-mode server connection is only ours for one
+        # transaction, so cursors cannot outlive it
+        database["DISABLE_SERVER_SIDE_CURSORS"] = True
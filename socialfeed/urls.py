@@ -18,11 +18,22 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path
 from django.views.decorators.csrf import csrf_exempt
-from graphene_django.views import GraphQLView
-from posts.views import health_check
+from posts.views import (
+    AsyncGraphQLView,
+    FeedGraphQLView,
+    health_check,
+    metrics_view,
+)
+from socialfeed.schema import async_schema
 
 urlpatterns = [
     path("admin/", admin.site.urls),
-    path("graphql/", csrf_exempt(GraphQLView.as_view(graphiql=True))),
+    path("graphql/", csrf_exempt(FeedGraphQLView.as_view(graphiql=True))),
+    # Same API executed on the event loop; serve it with an ASGI server
+    path(
+        "graphql/async/",
+        csrf_exempt(AsyncGraphQLView.as_view(schema=async_schema)),
+    ),
     path("health/", health_check, name="health_check"),
+    path("metrics/", metrics_view, name="metrics"),
 ]
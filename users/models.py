@@ -1 +1,40 @@
-# Users models (none yet)
+from django.contrib.auth.models import User
+from django.db import models
+from django.db.models import F
+
+
+class Follow(models.Model):
+    follower = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="following"
+    )
+    followee = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="followers"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ["follower", "followee"]
+        indexes = [
+            models.Index(fields=["followee", "follower"]),
+        ]
+
+    def __str__(self):
+        return f"{self.follower_id} follows {self.followee_id}"
+
+
+class FollowStats(models.Model):
+    """Denormalized follow counters, used to pick the fan-out strategy"""
+
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name="follow_stats"
+    )
+    followers_count = models.IntegerField(default=0)
+    following_count = models.IntegerField(default=0)
+
+    @classmethod
+    def adjust(cls, user_id, **deltas):
+        """Atomically add deltas to a user's counters"""
+        cls.objects.get_or_create(user_id=user_id)
+        cls.objects.filter(pk=user_id).update(
+            **{field: F(field) + delta for field, delta in deltas.items()}
+        )
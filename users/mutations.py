@@ -5,6 +5,10 @@ from graphene_django import DjangoObjectType
 from django.contrib.auth.models import User
 from graphql_jwt.decorators import login_required
 from django.db import transaction
+from posts.cache_utils import CacheManager
+from posts.decorators import rate_limit
+from posts.timeline import backfill, remove_author
+from .models import Follow, FollowStats
 
 
 class UserType(DjangoObjectType):
@@ -75,9 +79,52 @@ class UpdateUser(graphene.Mutation):
         return UpdateUser(user=user)
 
 
+class FollowUser(graphene.Mutation):
+    """Follow or unfollow a user"""
+
+    user = graphene.Field(UserType)
+    following = graphene.Boolean()
+
+    class Arguments:
+        user_id = graphene.ID(required=True)
+
+    @login_required
+    @rate_limit(group="follow_user", rate="30/m")  # 30 follows per minute
+    @transaction.atomic
+    def mutate(self, info, user_id):
+        user = info.context.user
+
+        try:
+            followee = User.objects.get(pk=user_id)
+        except User.DoesNotExist:
+            raise Exception("User not found")
+
+        if followee == user:
+            raise Exception("You cannot follow yourself")
+
+        # Toggle follow
+        follow, created = Follow.objects.get_or_create(follower=user, followee=followee)
+
+        if created:
+            FollowStats.adjust(user.id, following_count=1)
+            FollowStats.adjust(followee.id, followers_count=1)
+            backfill(user, followee)
+            following = True
+        else:
+            follow.delete()
+            FollowStats.adjust(user.id, following_count=-1)
+            FollowStats.adjust(followee.id, followers_count=-1)
+            remove_author(user, followee)
+            following = False
+
+        CacheManager.invalidate_pull_authors(user.id)
+        return FollowUser(user=followee, following=following)
+
+
 class Mutation(graphene.ObjectType):
     register = RegisterUser.Field()
     update_user = UpdateUser.Field()
+    follow_user = FollowUser.Field()
 
     # JWT mutations
     token_auth = graphql_jwt.ObtainJSONWebToken.Field()